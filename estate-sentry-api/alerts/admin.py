@@ -1,16 +1,19 @@
 from django.contrib import admin
+from estate_sentry.admin_tools import LargeTableAdmin
 from .models import Alert
 
 
 @admin.register(Alert)
-class AlertAdmin(admin.ModelAdmin):
+class AlertAdmin(LargeTableAdmin):
     """Admin configuration for Alert model."""
 
     list_display = ['title', 'alert_type', 'severity', 'user', 'sensor', 'timestamp', 'acknowledged']
-    list_filter = ['alert_type', 'severity', 'acknowledged', 'timestamp']
-    search_fields = ['title', 'description', 'user__username', 'sensor__name']
+    list_filter = ['alert_type', 'severity', 'acknowledged']
+    list_select_related = ['user', 'sensor']
+    # Exact matches on the small users/sensors tables instead of LIKE scans over alerts
+    search_fields = ['=user__username', '=sensor__name']
+    autocomplete_fields = ['user', 'sensor', 'acknowledged_by']
     readonly_fields = ['timestamp', 'acknowledged_at']
-    date_hierarchy = 'timestamp'
 
     fieldsets = (
         ('Alert Information', {
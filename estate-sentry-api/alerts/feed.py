@@ -0,0 +1,86 @@
+"""
+Cursor-based stream of newly created alerts for background consumers.
+
+Consumers read alerts in ID order after their stored cursor, so nothing on
+the request path has to enqueue work. Alerts younger than
+ALERT_FEED_SETTLE_SECONDS are held back: IDs are allocated before commit,
+so a slow transaction can commit a lower ID after a higher one, and
+reading right up to the newest alert could skip it.
+
+With sharding, each shard has its own cursor, since ids only increase
+within a shard's block. Handlers run with the shard active, and rows they
+create on 'default' refer to alerts by id (load_alerts() finds them
+again).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from estate_sentry.sharding import shard_aliases, use_shard
+from .models import Alert, AlertFeedCursor
+
+
+def load_alerts(ids, *related):
+    """
+    Like Alert.objects.in_bulk(ids), but finds each alert on whichever
+    shard holds it (alert ids are unique across shards).
+    """
+    remaining, alerts = set(ids), {}
+    for alias in shard_aliases():
+        if not remaining:
+            break
+        with use_shard(alias):
+            found = Alert.objects.select_related(*related).in_bulk(remaining)
+        alerts.update(found)
+        remaining -= found.keys()
+    return alerts
+
+
+class AlertFeed:
+    """Reads new alerts for one named consumer."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def position(self, shard='default'):
+        cursor, _ = AlertFeedCursor.objects.get_or_create(name=self.name, shard=shard)
+        return cursor.last_alert_id
+
+    def consume(self, handle, limit=500, now=None):
+        """
+        Pass the next batch of settled alerts from each shard to
+        `handle(alerts)`, advancing the shard's cursor in the same transaction.
+
+        Returns:
+            Number of alerts consumed
+        """
+        now = now or timezone.now()
+        return sum(self.consume_shard(alias, handle, limit, now) for alias in shard_aliases())
+
+    @transaction.atomic
+    def consume_shard(self, alias, handle, limit, now):
+        cursor, _ = AlertFeedCursor.objects.get_or_create(name=self.name, shard=alias)
+        cursor = AlertFeedCursor.objects.select_for_update().get(pk=cursor.pk)
+
+        settled = now - timedelta(seconds=settings.ALERT_FEED_SETTLE_SECONDS)
+        with use_shard(alias):
+            candidates = (
+                Alert.objects.filter(id__gt=cursor.last_alert_id)
+                .select_related('user', 'sensor')
+                .order_by('id')[:limit]
+            )
+            alerts = []
+            for alert in candidates:
+                # Stop at the first unsettled alert so the cursor never passes it
+                if alert.timestamp > settled:
+                    break
+                alerts.append(alert)
+            if not alerts:
+                return 0
+
+            handle(alerts)
+        cursor.last_alert_id = alerts[-1].id
+        cursor.save(update_fields=['last_alert_id', 'updated_at'])
+        return len(alerts)
@@ -0,0 +1,97 @@
+"""
+Query-parameter filters for the alert list.
+
+Every supported combination is served by an index on Alert (see
+Meta.indexes and the query-plan tests in alerts/tests.py):
+
+    user + time range                 alerts_user_id_99b1a2_idx (user, -timestamp)
+    user + acknowledged=false         alerts_unack_user_ts_idx (partial)
+    user + alert_type (+ time range)  alerts_user_type_ts_idx
+    user + severity (+ time range)    alerts_user_sev_ts_idx
+    user + sensor (+ time range)      alerts_sensor_ts_idx
+"""
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Alert
+
+ALERT_TYPES = {choice for choice, _ in Alert.ALERT_TYPE_CHOICES}
+SEVERITIES = {choice for choice, _ in Alert.SEVERITY_CHOICES}
+
+
+def _list_param(params, name):
+    """Values of a parameter given as ?name=a,b and/or ?name=a&name=b."""
+    values = []
+    for raw in params.getlist(name):
+        values.extend(value.strip() for value in raw.split(',') if value.strip())
+    return values
+
+
+def _choice_param(params, name, choices):
+    values = [value.upper() for value in _list_param(params, name)]
+    invalid = sorted(set(values) - choices)
+    if invalid:
+        raise ValidationError({name: f"Unknown value(s): {', '.join(invalid)}"})
+    return values
+
+
+def _datetime_param(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    value = parse_datetime(raw)
+    if value is None:
+        date = parse_date(raw)
+        if date is None:
+            raise ValidationError({name: 'Expected an ISO 8601 date or datetime'})
+        value = timezone.datetime(date.year, date.month, date.day)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def filter_alerts(queryset, params):
+    """
+    Apply alert list filters from query parameters.
+
+    Supported parameters: severity, alert_type, sensor (comma-separated
+    lists), acknowledged (true/false), since and until (ISO 8601).
+    """
+    severities = _choice_param(params, 'severity', SEVERITIES)
+    if len(severities) == 1:
+        queryset = queryset.filter(severity=severities[0])
+    elif severities:
+        queryset = queryset.filter(severity__in=severities)
+
+    alert_types = _choice_param(params, 'alert_type', ALERT_TYPES)
+    if len(alert_types) == 1:
+        queryset = queryset.filter(alert_type=alert_types[0])
+    elif alert_types:
+        queryset = queryset.filter(alert_type__in=alert_types)
+
+    sensors = _list_param(params, 'sensor')
+    if sensors:
+        try:
+            sensor_ids = [int(value) for value in sensors]
+        except ValueError:
+            raise ValidationError({'sensor': 'Expected sensor IDs'})
+        if len(sensor_ids) == 1:
+            queryset = queryset.filter(sensor_id=sensor_ids[0])
+        else:
+            queryset = queryset.filter(sensor_id__in=sensor_ids)
+
+    acknowledged = params.get('acknowledged')
+    if acknowledged is not None:
+        is_acknowledged = acknowledged.lower() in ['true', '1', 'yes']
+        queryset = queryset.filter(acknowledged=is_acknowledged)
+
+    since = _datetime_param(params, 'since')
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+
+    until = _datetime_param(params, 'until')
+    if until:
+        queryset = queryset.filter(timestamp__lt=until)
+
+    return queryset
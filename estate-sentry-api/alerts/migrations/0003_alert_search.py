@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# The schema as of this migration, kept here rather than imported from
+# alerts.search so that later changes to that module cannot change it.
+CREATE_SCHEMA = {
+    'postgresql': [
+        """
+        ALTER TABLE alerts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+        """,
+        'CREATE INDEX IF NOT EXISTS alerts_search_vector_gin ON alerts USING GIN (search_vector)',
+    ],
+    'sqlite': [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS alerts_fts USING fts5(
+            title, description, content='alerts', content_rowid='id', tokenize='porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alerts_fts_insert AFTER INSERT ON alerts BEGIN
+            INSERT INTO alerts_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alerts_fts_delete AFTER DELETE ON alerts BEGIN
+            INSERT INTO alerts_fts(alerts_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alerts_fts_update AFTER UPDATE OF title, description ON alerts BEGIN
+            INSERT INTO alerts_fts(alerts_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO alerts_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+        """,
+        # Index the alerts that already exist
+        "INSERT INTO alerts_fts(alerts_fts) VALUES ('rebuild')",
+    ],
+}
+
+DROP_SCHEMA = {
+    'postgresql': [
+        'DROP INDEX IF EXISTS alerts_search_vector_gin',
+        'ALTER TABLE alerts DROP COLUMN IF EXISTS search_vector',
+    ],
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS alerts_fts_update',
+        'DROP TRIGGER IF EXISTS alerts_fts_delete',
+        'DROP TRIGGER IF EXISTS alerts_fts_insert',
+        'DROP TABLE IF EXISTS alerts_fts',
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for statement in CREATE_SCHEMA.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in DROP_SCHEMA.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0003_alert_search'),
+        ('sensors', '0003_sensor_heartbeat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='alerts_acknowl_046d76_idx',
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(condition=models.Q(('acknowledged', False)), fields=['user', '-timestamp'], name='alerts_unack_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['user', 'alert_type', '-timestamp'], name='alerts_user_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['user', 'severity', '-timestamp'], name='alerts_user_sev_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['sensor', '-timestamp'], name='alerts_sensor_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0004_alert_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertFeedCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Consumer name', max_length=100, unique=True)),
+                ('last_alert_id', models.BigIntegerField(default=0, help_text='Highest alert ID consumed')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Alert Feed Cursor',
+                'verbose_name_plural': 'Alert Feed Cursors',
+                'db_table': 'alert_feed_cursors',
+            },
+        ),
+    ]
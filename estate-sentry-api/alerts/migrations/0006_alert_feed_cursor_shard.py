@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0005_alert_feed_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertfeedcursor',
+            name='shard',
+            field=models.CharField(default='default', help_text='Database alias the alerts are read from', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='alertfeedcursor',
+            name='name',
+            field=models.CharField(help_text='Consumer name', max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='alertfeedcursor',
+            constraint=models.UniqueConstraint(fields=('name', 'shard'), name='alert_feed_cursor_per_shard'),
+        ),
+    ]
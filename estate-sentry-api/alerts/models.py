@@ -78,8 +78,39 @@ class Alert(models.Model):
         indexes = [
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['severity', '-timestamp']),
-            models.Index(fields=['acknowledged']),
+            # Per-user filter combinations used by the alert list (alerts/filters.py)
+            models.Index(
+                fields=['user', '-timestamp'],
+                condition=models.Q(acknowledged=False),
+                name='alerts_unack_user_ts_idx',
+            ),
+            models.Index(fields=['user', 'alert_type', '-timestamp'], name='alerts_user_type_ts_idx'),
+            models.Index(fields=['user', 'severity', '-timestamp'], name='alerts_user_sev_ts_idx'),
+            models.Index(fields=['sensor', '-timestamp'], name='alerts_sensor_ts_idx'),
         ]
 
     def __str__(self):
         return f"{self.get_severity_display()} - {self.title}"
+
+
+class AlertFeedCursor(models.Model):
+    """
+    Position of a background consumer (notifications, webhooks) in the
+    stream of created alerts.
+    """
+
+    name = models.CharField(max_length=100, help_text='Consumer name')
+    shard = models.CharField(max_length=100, default='default', help_text='Database alias the alerts are read from')
+    last_alert_id = models.BigIntegerField(default=0, help_text='Highest alert ID consumed')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'alert_feed_cursors'
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'shard'], name='alert_feed_cursor_per_shard'),
+        ]
+        verbose_name = 'Alert Feed Cursor'
+        verbose_name_plural = 'Alert Feed Cursors'
+
+    def __str__(self):
+        return f"{self.name} @ {self.shard}:{self.last_alert_id}"
@@ -0,0 +1,221 @@
+"""
+Ranked full-text search over alert titles and descriptions.
+
+The index lives in the database and is maintained on every write:
+
+- PostgreSQL: a generated, weighted tsvector column (`search_vector`) with a
+  GIN index
+- SQLite: an external-content FTS5 table (`alerts_fts`) kept in sync by
+  triggers
+
+Other backends raise SearchUnavailable; there is deliberately no LIKE
+fallback. Results are ordered by relevance (title matches weigh more than
+description matches) and paged with an opaque (score, id) cursor.
+"""
+import base64
+import json
+import re
+
+from django.db import connections, router
+
+from .models import Alert
+
+MAX_TERMS = 8
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+POSTGRESQL_SCHEMA = [
+    """
+    ALTER TABLE alerts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX IF NOT EXISTS alerts_search_vector_gin ON alerts USING GIN (search_vector)',
+]
+
+SQLITE_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS alerts_fts USING fts5(
+        title, description, content='alerts', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alerts_fts_insert AFTER INSERT ON alerts BEGIN
+        INSERT INTO alerts_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alerts_fts_delete AFTER DELETE ON alerts BEGIN
+        INSERT INTO alerts_fts(alerts_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alerts_fts_update AFTER UPDATE OF title, description ON alerts BEGIN
+        INSERT INTO alerts_fts(alerts_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO alerts_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+SQLITE_TRIGGERS = ('alerts_fts_insert', 'alerts_fts_delete', 'alerts_fts_update')
+
+REMOVE_SCHEMA = {
+    'postgresql': [
+        'DROP INDEX IF EXISTS alerts_search_vector_gin',
+        'ALTER TABLE alerts DROP COLUMN IF EXISTS search_vector',
+    ],
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS alerts_fts_update',
+        'DROP TRIGGER IF EXISTS alerts_fts_delete',
+        'DROP TRIGGER IF EXISTS alerts_fts_insert',
+        'DROP TABLE IF EXISTS alerts_fts',
+    ],
+}
+
+
+class SearchUnavailable(Exception):
+    """Raised when the database backend has no full-text index for alerts."""
+
+
+class InvalidSearch(ValueError):
+    """Raised for empty queries and malformed cursors."""
+
+
+def install_search_index(connection):
+    """
+    Create the search index if it is missing. Safe to run repeatedly.
+
+    On SQLite, Django rebuilds a table (dropping its triggers) for some
+    ALTERs, so repair_search_index() calls this after every migrate; the FTS
+    table is repopulated whenever the triggers had to be recreated.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRESQL_SCHEMA:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                SQLITE_TRIGGERS,
+            )
+            complete = cursor.fetchone()[0] == len(SQLITE_TRIGGERS)
+            for statement in SQLITE_SCHEMA:
+                cursor.execute(statement)
+            if not complete:
+                cursor.execute("INSERT INTO alerts_fts(alerts_fts) VALUES ('rebuild')")
+
+
+def repair_search_index(using, **kwargs):
+    """
+    post_migrate handler: recreate SQLite triggers lost in a table rebuild.
+
+    Only acts once the search migration has created alerts_fts.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and 'alerts_fts' in connection.introspection.table_names():
+        install_search_index(connection)
+
+
+def remove_search_index(connection):
+    with connection.cursor() as cursor:
+        for statement in REMOVE_SCHEMA.get(connection.vendor, []):
+            cursor.execute(statement)
+
+
+def parse_terms(query):
+    """Split a user query into at most MAX_TERMS lowercase word terms."""
+    terms = [term.lower() for term in TERM_RE.findall(query or '')][:MAX_TERMS]
+    if not terms:
+        raise InvalidSearch('Search query must contain at least one word')
+    return terms
+
+
+def encode_cursor(score, alert_id):
+    raw = json.dumps([score, alert_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, alert_id = json.loads(raw)
+        return float(score), int(alert_id)
+    except (ValueError, TypeError):
+        raise InvalidSearch('Invalid cursor')
+
+
+def _postgresql_sql(after):
+    keyset = 'WHERE score < %s OR (score = %s AND id < %s)' if after else ''
+    return f"""
+        SELECT id, score FROM (
+            SELECT a.id, ts_rank_cd(a.search_vector, query)::float8 AS score
+            FROM alerts a, to_tsquery('english', %s) query
+            WHERE a.user_id = %s AND a.search_vector @@ query
+        ) ranked
+        {keyset}
+        ORDER BY score DESC, id DESC
+        LIMIT %s
+    """
+
+
+def _sqlite_sql(after):
+    keyset = 'WHERE score < %s OR (score = %s AND id < %s)' if after else ''
+    # bm25() is lower-is-better; negate it so both backends sort descending
+    return f"""
+        SELECT id, score FROM (
+            SELECT a.id, -bm25(alerts_fts, 10.0, 1.0) AS score
+            FROM alerts_fts JOIN alerts a ON a.id = alerts_fts.rowid
+            WHERE alerts_fts MATCH %s AND a.user_id = %s
+        ) ranked
+        {keyset}
+        ORDER BY score DESC, id DESC
+        LIMIT %s
+    """
+
+
+def search_alerts(user, query, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Search a user's alerts.
+
+    Every term must match (as a word prefix), in the title or description.
+
+    Returns:
+        (alerts in rank order, cursor for the next page or None)
+    """
+    terms = parse_terms(query)
+    after = decode_cursor(cursor) if cursor else None
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    connection = connections[router.db_for_read(Alert) or 'default']
+    if connection.vendor == 'postgresql':
+        sql = _postgresql_sql(after)
+        match = ' & '.join(f'{term}:*' for term in terms)
+    elif connection.vendor == 'sqlite':
+        sql = _sqlite_sql(after)
+        match = ' '.join(f'"{term}"*' for term in terms)
+    else:
+        raise SearchUnavailable(f'Alert search is not supported on {connection.vendor}')
+
+    params = [match, user.pk]
+    if after:
+        params += [after[0], after[0], after[1]]
+    params.append(limit + 1)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    page = rows[:limit]
+    alerts = Alert.objects.using(connection.alias).select_related('sensor', 'acknowledged_by').in_bulk(
+        [alert_id for alert_id, _ in page]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        last_id, last_score = page[-1]
+        next_cursor = encode_cursor(last_score, last_id)
+    return [alerts[alert_id] for alert_id, _ in page if alert_id in alerts], next_cursor
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from estate_sentry.fast_serializers import RowSerializer, choice_labels, iso_datetime
 from .models import Alert
 
 
@@ -27,6 +28,29 @@ class AlertSerializer(serializers.ModelSerializer):
         ]
 
 
+class AlertRows(RowSerializer):
+    """Read-only AlertSerializer output built from values() rows."""
+
+    columns = (
+        ('id', 'id', None),
+        ('alert_type', 'alert_type', None),
+        ('alert_type_display', 'alert_type', choice_labels(Alert, 'alert_type')),
+        ('severity', 'severity', None),
+        ('severity_display', 'severity', choice_labels(Alert, 'severity')),
+        ('sensor', 'sensor', None),
+        ('sensor_name', 'sensor__name', None),
+        ('user', 'user', None),
+        ('timestamp', 'timestamp', iso_datetime),
+        ('title', 'title', None),
+        ('description', 'description', None),
+        ('acknowledged', 'acknowledged', None),
+        ('acknowledged_at', 'acknowledged_at', iso_datetime),
+        ('acknowledged_by', 'acknowledged_by', None),
+        ('acknowledged_by_username', 'acknowledged_by__username', None),
+        ('metadata', 'metadata', None),
+    )
+
+
 class AlertAcknowledgeSerializer(serializers.Serializer):
     """Serializer for acknowledging an alert."""
 
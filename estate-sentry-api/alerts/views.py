@@ -3,33 +3,34 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Count
+from estate_sentry.db_routers import ReplicaReadMixin
+from estate_sentry.fast_serializers import FastListMixin
+from estate_sentry.response_cache import cached_response, invalidate_user
+from estate_sentry.sharding import OwnerShardMixin
+from notifications.escalation import cancel_escalation
+from .filters import filter_alerts
 from .models import Alert
-from .serializers import AlertSerializer, AlertAcknowledgeSerializer
+from .search import DEFAULT_LIMIT, SearchUnavailable, search_alerts
+from .serializers import AlertSerializer, AlertAcknowledgeSerializer, AlertRows
 
 
-class AlertViewSet(viewsets.ReadOnlyModelViewSet):
+class AlertViewSet(OwnerShardMixin, ReplicaReadMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing and managing alerts.
     """
+    replica_actions = ('list', 'retrieve', 'statistics', 'search')
     serializer_class = AlertSerializer
+    row_serializer_class = AlertRows
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        """Return alerts for the current user."""
-        queryset = Alert.objects.filter(user=self.request.user)
+        """Return alerts for the current user, filtered by query parameters."""
+        queryset = Alert.objects.filter(user=self.request.user).select_related('sensor', 'acknowledged_by')
+        return filter_alerts(queryset, self.request.query_params)
 
-        # Filter by severity if provided
-        severity = self.request.query_params.get('severity')
-        if severity:
-            queryset = queryset.filter(severity=severity.upper())
-
-        # Filter by acknowledged status
-        acknowledged = self.request.query_params.get('acknowledged')
-        if acknowledged is not None:
-            is_acknowledged = acknowledged.lower() in ['true', '1', 'yes']
-            queryset = queryset.filter(acknowledged=is_acknowledged)
-
-        return queryset
+    @cached_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     @action(detail=True, methods=['patch'])
     def acknowledge(self, request, pk=None):
@@ -52,6 +53,8 @@ class AlertViewSet(viewsets.ReadOnlyModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         alert = serializer.save()
+        cancel_escalation(alert.pk)
+        invalidate_user(alert.user_id, using=alert._state.db)
 
         return Response(
             AlertSerializer(alert).data,
@@ -81,3 +84,33 @@ class AlertViewSet(viewsets.ReadOnlyModelViewSet):
         }
 
         return Response(stats)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over the user's alerts, most relevant first.
+        GET /api/alerts/search/?q=garage
+        """
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+            alerts, next_cursor = search_alerts(
+                request.user,
+                request.query_params.get('q', ''),
+                cursor=request.query_params.get('cursor'),
+                limit=limit,
+            )
+        except ValueError as exc:  # InvalidSearch or a bad limit
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except SearchUnavailable as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        next_url = None
+        if next_cursor:
+            params = request.query_params.copy()
+            params['cursor'] = next_cursor
+            next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+        return Response({
+            'next': next_url,
+            'results': AlertSerializer(alerts, many=True).data,
+        })
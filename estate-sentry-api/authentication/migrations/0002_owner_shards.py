@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerShard',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shard', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('alias', models.CharField(help_text='Database alias from DATABASE_SHARDS', max_length=100)),
+                ('moving', models.BooleanField(default=False, help_text='Set while move_owner_shard copies the data; writes are refused meanwhile')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Owner Shard',
+                'verbose_name_plural': 'Owner Shards',
+                'db_table': 'owner_shards',
+            },
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 import secrets
 
+from estate_sentry.sharding import sync_user_copy
+
 
 class User(AbstractUser):
     """
@@ -41,9 +43,43 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.get_auth_method_display()})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Shards keep a copy of their owners' rows (estate_sentry/sharding.py)
+        if self._state.db == 'default':
+            sync_user_copy(self)
+
     def generate_secure_token(self):
         """
         Generate a secure random token for API authentication.
         This is handled by Django REST Framework's token system.
         """
         return secrets.token_urlsafe(64)
+
+
+class OwnerShard(models.Model):
+    """
+    Directory entry: the database shard holding a user's sensors, readings
+    and alerts (see estate_sentry/sharding.py).
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shard'
+    )
+    alias = models.CharField(max_length=100, help_text='Database alias from DATABASE_SHARDS')
+    moving = models.BooleanField(
+        default=False,
+        help_text='Set while move_owner_shard copies the data; writes are refused meanwhile'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'owner_shards'
+        verbose_name = 'Owner Shard'
+        verbose_name_plural = 'Owner Shards'
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.alias}"
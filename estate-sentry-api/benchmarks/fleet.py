@@ -0,0 +1,356 @@
+"""
+Synthetic estate fleet for scale testing.
+
+Generates users, sensors, readings and, optionally, the alerts the
+registered handlers raise for those readings, deterministically from a
+seed. Users and sensors go through bulk_create. Readings and alerts, which
+are the volume, are written as raw rows: COPY on PostgreSQL, batched
+executemany on SQLite, one transaction per batch.
+
+Row ids are assigned here, continuing from each table's highest id, so an
+alert can name its reading and a sensor its newest reading without a
+round trip; the id sequences are reset past them at the end. Seed a
+database nothing else is writing to.
+
+Each sensor type follows its own pattern over the seeded period (UTC):
+contacts, motion detectors and cameras report events, mostly between
+06:00 and 23:00; the other types report at regular intervals with jitter
+and rare anomalies. Values are normalized and alerts detected by the
+sensor type's handler, exactly as at ingestion. Every sensor draws from
+its own random stream, so its readings depend only on the seed and its
+position in the fleet.
+"""
+import io
+import json
+import math
+import random
+import time
+from datetime import datetime, time as day_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from alerts.models import Alert
+from authentication.models import User
+from sensors.handlers import get_handler
+from sensors.models import Sensor, SensorReading
+
+# Sensor types in a seeded fleet: (relative frequency, relative reading rate)
+SEED_SENSOR_TYPES = {
+    'DOOR_CONTACT': (4, 1.0),
+    'WINDOW_CONTACT': (6, 0.3),
+    'MOTION': (3, 2.0),
+    'CAMERA': (2, 2.0),
+    'GLASS_BREAK': (1, 0.5),
+    'SMOKE': (2, 0.5),
+    'CO': (1, 0.5),
+    'WATER_LEAK': (1, 0.5),
+    'TEMPERATURE': (2, 1.0),
+    'CUSTOM': (1, 0.5),
+}
+EVENT_SENSOR_TYPES = {'DOOR_CONTACT', 'WINDOW_CONTACT', 'MOTION', 'CAMERA'}
+
+ROOMS = [
+    'Front Door', 'Back Door', 'Hallway', 'Kitchen', 'Living Room', 'Garage',
+    'Bedroom', 'Basement', 'Office', 'Garden', 'Porch', 'Utility Room',
+]
+
+READING_COLUMNS = ('id', 'sensor_id', 'timestamp', 'value', 'reading_type', 'processed')
+ALERT_COLUMNS = (
+    'id', 'alert_type', 'severity', 'sensor_id', 'user_id', 'timestamp', 'title', 'description',
+    'acknowledged', 'acknowledged_at', 'acknowledged_by_id', 'metadata',
+)
+
+HOUR_US = 3600 * 10 ** 6
+DAY_US = 24 * HOUR_US
+
+
+def default_end():
+    """Midnight UTC today, so runs on the same day generate identical data."""
+    return datetime.combine(datetime.now(dt_timezone.utc).date(), day_time.min, tzinfo=dt_timezone.utc)
+
+
+def sqlite_datetime(value):
+    # What the SQLite backend stores for an aware datetime: naive UTC text
+    return str(value.replace(tzinfo=None))
+
+
+def awake(offset_us):
+    return 6 <= (offset_us % DAY_US) // HOUR_US < 23
+
+
+def event_offsets(rng, count, span_us):
+    """Offsets of `count` events, about six in seven of them between 06:00 and 23:00."""
+    offsets = []
+    for _ in range(count):
+        offset = int(rng.random() * span_us)
+        if not awake(offset) and rng.random() < 0.8:
+            offset = int(rng.random() * span_us)
+        offsets.append(offset)
+    offsets.sort()
+    return offsets
+
+
+def periodic_offsets(rng, count, span_us):
+    interval = span_us / count
+    return [
+        min(max(int((index + 0.5 + rng.uniform(-0.2, 0.2)) * interval), 0), span_us - 1)
+        for index in range(count)
+    ]
+
+
+class SensorPattern:
+    """Generates one sensor's raw reading values, in timestamp order."""
+
+    def __init__(self, sensor_type, rng):
+        self.sensor_type = sensor_type
+        self.rng = rng
+        self.open = False
+        self.battery = rng.uniform(60, 100)
+
+    def value(self, offset_us, progress):
+        """Return (raw value, reading_type) for a reading at `offset_us` into the period."""
+        rng = self.rng
+        sensor_type = self.sensor_type
+        if sensor_type in ('DOOR_CONTACT', 'WINDOW_CONTACT'):
+            # Opened, then closed again; batteries drain over the period
+            self.open = not self.open
+            battery = max(int(self.battery - 15 * progress), 5)
+            return {'state': 'open' if self.open else 'closed', 'battery_level': battery}, 'contact_state'
+        if sensor_type == 'CAMERA':
+            motion = rng.random() < (0.3 if awake(offset_us) else 0.05)
+            return {
+                'motion_detected': motion,
+                'image_url': f"http://camera.local/frames/{rng.getrandbits(32):08x}.jpg",
+            }, 'image'
+        if sensor_type == 'MOTION':
+            return {'motion_detected': rng.random() < 0.9}, 'motion_detected'
+        if sensor_type == 'GLASS_BREAK':
+            detected = rng.random() < 0.0005
+            level = rng.uniform(95, 120) if detected else rng.gauss(38, 6)
+            return {'glass_break': detected, 'sound_level_db': round(level, 1)}, 'audio'
+        if sensor_type == 'SMOKE':
+            detected = rng.random() < 0.0002
+            obscuration = rng.uniform(4, 12) if detected else abs(rng.gauss(0.1, 0.05))
+            return {'smoke_detected': detected, 'obscuration_pct': round(obscuration, 2)}, 'smoke'
+        if sensor_type == 'CO':
+            ppm = rng.uniform(50, 150) if rng.random() < 0.0002 else abs(rng.gauss(1.5, 1.0))
+            return {'co_ppm': round(ppm, 1)}, 'co_level'
+        if sensor_type == 'WATER_LEAK':
+            detected = rng.random() < 0.0002
+            return {'leak_detected': detected, 'humidity': round(rng.gauss(45, 5), 1)}, 'water_leak'
+        if sensor_type == 'TEMPERATURE':
+            # Warmest mid-afternoon
+            hour = (offset_us % DAY_US) / HOUR_US
+            temperature = 21 + 2 * math.sin(2 * math.pi * (hour - 9) / 24) + rng.gauss(0, 0.3)
+            return {'temperature': round(temperature, 2)}, 'temperature'
+        return {'value': round(rng.gauss(0, 1), 4)}, 'custom'
+
+
+class SeedReading:
+    """The parts of a SensorReading that handlers read."""
+
+    __slots__ = ('id', 'timestamp', 'value')
+
+    def __init__(self, id, timestamp, value):
+        self.id = id
+        self.timestamp = timestamp
+        self.value = value
+
+
+def copy_text(rows):
+    """Rows in COPY text format."""
+    def field(value):
+        if value is None:
+            return '\\N'
+        if value is True or value is False:
+            return 't' if value else 'f'
+        return (
+            str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+        )
+
+    return ''.join('\t'.join(field(value) for value in row) + '\n' for row in rows)
+
+
+def write_rows(table, columns, rows):
+    """Insert rows into a table, with COPY on PostgreSQL and executemany otherwise."""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    column_list = ', '.join(quote(column) for column in columns)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            sql = f'COPY {quote(table)} ({column_list}) FROM STDIN'
+            raw = cursor.cursor
+            if hasattr(raw, 'copy'):  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(copy_text(rows))
+            else:
+                raw.copy_expert(sql, io.StringIO(copy_text(rows)))
+        else:
+            placeholders = ', '.join(['%s'] * len(columns))
+            cursor.executemany(f'INSERT INTO {quote(table)} ({column_list}) VALUES ({placeholders})', rows)
+
+
+class FleetSeeder:
+    """
+    Seeds one synthetic fleet.
+
+    Args:
+        users: Users to create
+        sensors_per_user: Sensors per user
+        readings_per_sensor: Mean readings per sensor; event sensors get
+            more than environmental ones (SEED_SENSOR_TYPES)
+        days: Length of the period the readings cover
+        end: End of the period (default: midnight UTC today)
+        alerts: Also write the alerts the handlers raise, and mark the
+            readings processed; otherwise they are left for
+            `replay_readings --apply`
+        seed: Seed for every random choice
+        prefix: Username prefix
+        batch_size: Readings per transaction
+    """
+
+    def __init__(self, users, sensors_per_user, readings_per_sensor, days=30, end=None, alerts=False,
+                 seed=0, prefix='fleet', batch_size=20000):
+        self.users = users
+        self.sensors_per_user = sensors_per_user
+        self.readings_per_sensor = readings_per_sensor
+        self.end = (end or default_end()).astimezone(dt_timezone.utc)
+        self.start = self.end - timedelta(days=days)
+        self.span_us = days * DAY_US
+        self.alerts = alerts
+        self.seed = seed
+        self.prefix = prefix
+        self.batch_size = batch_size
+
+        weights = [weight for weight, _ in SEED_SENSOR_TYPES.values()]
+        self.mean_rate = sum(weight * rate for weight, rate in SEED_SENSOR_TYPES.values()) / sum(weights)
+        self.counts = {'users': 0, 'sensors': 0, 'readings': 0, 'alerts': 0}
+        self.progress = None
+        self._readings, self._alerts, self._latest = [], [], []
+
+    def run(self, progress=None):
+        """
+        Seed the fleet; `progress(counts)` is called after every batch.
+
+        Returns:
+            Dict of rows written per table, elapsed seconds and rows/sec
+        """
+        if User.objects.filter(username__startswith=f'{self.prefix}-').exists():
+            raise ValueError(f"Users named {self.prefix}-* already exist; choose another prefix")
+        self.progress = progress
+        started = time.perf_counter()
+
+        sensors = self.create_sensors(self.create_users())
+        self.next_reading_id = (SensorReading.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+        self.next_alert_id = (Alert.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+        for index, sensor in enumerate(sensors):
+            self.seed_sensor(index, sensor)
+            if len(self._readings) >= self.batch_size:
+                self.flush()
+        self.flush()
+        self.finish()
+
+        elapsed = time.perf_counter() - started
+        rows = self.counts['readings'] + self.counts['alerts']
+        return {
+            **self.counts,
+            'elapsed': round(elapsed, 3),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def create_users(self):
+        # One hash for the whole fleet: hashing is deliberately slow
+        password = make_password(None)
+        users = User.objects.bulk_create([
+            User(
+                username=f'{self.prefix}-{index:06d}', email=f'{self.prefix}-{index:06d}@example.com',
+                password=password,
+            )
+            for index in range(self.users)
+        ], batch_size=1000)
+        self.counts['users'] = len(users)
+        return users
+
+    def create_sensors(self, users):
+        rng = random.Random(f'{self.seed}:sensors')
+        types = list(SEED_SENSOR_TYPES)
+        weights = [weight for weight, _ in SEED_SENSOR_TYPES.values()]
+        labels = dict(Sensor.SENSOR_TYPE_CHOICES)
+        sensors = []
+        for user in users:
+            for number in range(self.sensors_per_user):
+                sensor_type = rng.choices(types, weights)[0]
+                room = rng.choice(ROOMS)
+                sensors.append(Sensor(
+                    name=f'{room} {labels[sensor_type]} {number + 1}', sensor_type=sensor_type, location=room,
+                    owner=user,
+                ))
+        sensors = Sensor.objects.bulk_create(sensors, batch_size=1000)
+        self.counts['sensors'] = len(sensors)
+        return sensors
+
+    def seed_sensor(self, index, sensor):
+        rng = random.Random(f'{self.seed}:sensor:{index}')
+        rate = SEED_SENSOR_TYPES[sensor.sensor_type][1] / self.mean_rate
+        count = max(1, round(self.readings_per_sensor * rate * rng.uniform(0.5, 1.5)))
+        if sensor.sensor_type in EVENT_SENSOR_TYPES:
+            offsets = event_offsets(rng, count, self.span_us)
+        else:
+            offsets = periodic_offsets(rng, count, self.span_us)
+
+        pattern = SensorPattern(sensor.sensor_type, rng)
+        handler = get_handler(sensor)
+        # Cheaper than connection.ops.adapt_datetimefield_value() per row; timestamps are UTC
+        adapt = str if connection.vendor == 'postgresql' else sqlite_datetime
+        acknowledge_before = self.end - timedelta(days=1)
+        for offset in offsets:
+            timestamp = self.start + timedelta(microseconds=offset)
+            raw, reading_type = pattern.value(offset, offset / self.span_us)
+            value = handler.process_reading(raw) if handler else raw
+            reading_id = self.next_reading_id
+            self.next_reading_id += 1
+            self._readings.append(
+                (reading_id, sensor.pk, adapt(timestamp), json.dumps(value), reading_type, self.alerts)
+            )
+            if not (self.alerts and handler):
+                continue
+            for alert in handler.detect_threats(SeedReading(reading_id, timestamp, value)):
+                # Most alerts older than a day have been acknowledged by their owner
+                acknowledged = timestamp < acknowledge_before and rng.random() < 0.95
+                acknowledged_at = timestamp + timedelta(seconds=rng.uniform(30, 7200)) if acknowledged else None
+                self._alerts.append((
+                    self.next_alert_id, alert['alert_type'], alert['severity'], sensor.pk, sensor.owner_id,
+                    adapt(timestamp), alert['title'], alert['description'], acknowledged,
+                    adapt(acknowledged_at) if acknowledged else None, sensor.owner_id if acknowledged else None,
+                    json.dumps(alert.get('metadata', {})),
+                ))
+                self.next_alert_id += 1
+
+        reading_id, _, last_at, last_value, _, _ = self._readings[-1]
+        self._latest.append((reading_id, last_at, last_value, last_at, sensor.pk))
+
+    def flush(self):
+        with transaction.atomic():
+            write_rows(SensorReading._meta.db_table, READING_COLUMNS, self._readings)
+            write_rows(Alert._meta.db_table, ALERT_COLUMNS, self._alerts)
+        self.counts['readings'] += len(self._readings)
+        self.counts['alerts'] += len(self._alerts)
+        self._readings, self._alerts = [], []
+        if self.progress:
+            self.progress(self.counts)
+
+    def finish(self):
+        """Point sensors at their newest readings and move id sequences past the seeded rows."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {connection.ops.quote_name(Sensor._meta.db_table)} SET last_reading_id = %s, '
+                'last_reading_at = %s, last_reading_value = %s, last_seen = %s WHERE id = %s',
+                self._latest,
+            )
+            for sql in connection.ops.sequence_reset_sql(no_style(), [SensorReading, Alert]):
+                cursor.execute(sql)
+        self._latest = []
@@ -0,0 +1,110 @@
+"""
+Parse and serialize cost of the API formats, per reading.
+
+Measures the registered DRF parser and renderer classes directly (no HTTP,
+no database) on simulated reading submissions and reading-history
+responses, so the numbers isolate encoding cost and payload size.
+"""
+import io
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from estate_sentry import formats
+from .loadtest import FLEET_SENSOR_TYPES, reading_payload
+
+FORMAT_CLASSES = {
+    'json': (JSONParser, JSONRenderer),
+    'msgpack': (formats.MessagePackParser, formats.MessagePackRenderer),
+    'cbor': (formats.CBORParser, formats.CBORRenderer),
+}
+
+FORMAT_SETTINGS_NAMES = {'msgpack': 'MessagePack', 'cbor': 'CBOR'}
+
+
+def available_formats():
+    """Format names whose classes are registered in REST_FRAMEWORK."""
+    return ['json'] + [
+        name for name, setting_name in FORMAT_SETTINGS_NAMES.items()
+        if setting_name in settings.BINARY_API_FORMATS
+    ]
+
+
+def sample_documents(count, seed=0):
+    """
+    Return (submissions, stored) for `count` simulated readings.
+
+    Submissions are request bodies for POST /api/sensors/{id}/readings/;
+    stored readings are shaped like SensorReadingSerializer output.
+    """
+    rng = random.Random(seed)
+    types = [sensor_type for sensor_type, weight in FLEET_SENSOR_TYPES for _ in range(weight)]
+    started = timezone.now()
+    submissions, stored = [], []
+    for index in range(count):
+        sensor_type = rng.choice(types)
+        body = {**reading_payload(sensor_type, rng), 'idempotency_key': str(index)}
+        submissions.append(body)
+        stored.append({
+            'id': index + 1,
+            'sensor': rng.randint(1, 500),
+            'sensor_name': f"{sensor_type.replace('_', ' ').title()} {rng.randint(1, 99)}",
+            'timestamp': (started + timedelta(milliseconds=index)).isoformat().replace('+00:00', 'Z'),
+            'value': body['value'],
+            'reading_type': body['reading_type'],
+            'processed': True,
+            'idempotency_key': body['idempotency_key'],
+        })
+    return submissions, stored
+
+
+def _best_of(repeat, function):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_format(name, submissions, stored, batch_size=100, repeat=5):
+    """
+    Measure one format.
+
+    Single readings are encoded one document per reading (as sensors
+    submit them); history pages are lists of `batch_size` stored readings.
+
+    Returns:
+        Dict of bytes per reading and microseconds per reading to serialize
+        and parse, for single readings and history pages
+    """
+    parser_class, renderer_class = FORMAT_CLASSES[name]
+    parser, renderer = parser_class(), renderer_class()
+    media_type = renderer.media_type
+    pages = [stored[start:start + batch_size] for start in range(0, len(stored), batch_size)]
+
+    def serialize(documents):
+        return [renderer.render(document, media_type) for document in documents]
+
+    def parse(bodies):
+        for body in bodies:
+            parser.parse(io.BytesIO(body), media_type)
+
+    single_bodies = serialize(submissions)
+    page_bodies = serialize(pages)
+    per_reading = 1e6 / len(submissions)
+    return {
+        'format': name,
+        'single_bytes': sum(map(len, single_bodies)) / len(submissions),
+        'single_serialize_us': _best_of(repeat, lambda: serialize(submissions)) * per_reading,
+        'single_parse_us': _best_of(repeat, lambda: parse(single_bodies)) * per_reading,
+        'history_bytes': sum(map(len, page_bodies)) / len(stored),
+        'history_serialize_us': _best_of(repeat, lambda: serialize(pages)) * per_reading,
+        'history_parse_us': _best_of(repeat, lambda: parse(page_bodies)) * per_reading,
+    }
@@ -0,0 +1,127 @@
+"""
+Throughput benchmark for the TCP sensor gateway.
+
+A client process (so it does not compete with the gateway for the GIL)
+streams pre-encoded, signed frames over several pipelined TCP connections
+and waits for every acknowledgement. Since the gateway acknowledges a
+frame only after its batch is committed, readings/sec measures stored,
+threat-checked readings.
+"""
+import asyncio
+import multiprocessing
+import random
+import secrets
+import time
+
+from django.db import transaction
+
+from authentication.models import User
+from sensors.gateway import LENGTH, encode_frame
+from sensors.models import Sensor
+
+# Frames written per connection between flow-control waits
+WRITE_CHUNK = 500
+
+
+def prepare_gateway_fleet(sensors, prefix='gatewaybench'):
+    """
+    Create contact sensors with gateway keys.
+
+    Returns:
+        List of (sensor id, gateway key)
+    """
+    with transaction.atomic():
+        user, _ = User.objects.get_or_create(
+            username=f"{prefix}-user", defaults={'auth_method': 'username'}
+        )
+        Sensor.objects.bulk_create([
+            Sensor(
+                name=f"{prefix} sensor {number}",
+                sensor_type='DOOR_CONTACT',
+                location=f"Zone {number % 4}",
+                owner=user,
+                connection_config={'gateway_key': secrets.token_hex(16)},
+            )
+            for number in range(sensors)
+        ])
+        return [
+            (sensor.id, sensor.connection_config['gateway_key'])
+            for sensor in Sensor.objects.filter(owner=user).order_by('id')[:sensors]
+        ]
+
+
+def build_streams(devices, readings, connections, open_ratio=0.01, seed=0):
+    """
+    Pre-encode length-prefixed frames, split across connections.
+
+    Each device sends increasing sequence numbers; about `open_ratio` of
+    readings report an open door and so raise an alert.
+    """
+    rng = random.Random(seed)
+    sequence = {sensor_id: 0 for sensor_id, _ in devices}
+    streams = [[] for _ in range(connections)]
+    for index in range(readings):
+        sensor_id, key = devices[index % len(devices)]
+        sequence[sensor_id] += 1
+        state = 'open' if rng.random() < open_ratio else 'closed'
+        frame = encode_frame(sensor_id, key, {'seq': sequence[sensor_id], 'value': {'state': state}})
+        streams[index % connections].append(LENGTH.pack(len(frame)) + frame)
+    return streams
+
+
+async def _stream(address, frames):
+    reader, writer = await asyncio.open_connection(*address)
+
+    async def send():
+        for start in range(0, len(frames), WRITE_CHUNK):
+            writer.write(b''.join(frames[start:start + WRITE_CHUNK]))
+            await writer.drain()
+
+    sender = asyncio.ensure_future(send())
+    errors = 0
+    for _ in frames:
+        (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+        if b'"ok":true' not in await reader.readexactly(length):
+            errors += 1
+    await sender
+    writer.close()
+    return errors
+
+
+def _client(address, streams, results):
+    async def main():
+        started = time.perf_counter()
+        errors = await asyncio.gather(*(_stream(address, frames) for frames in streams))
+        return sum(errors), time.perf_counter() - started
+
+    try:
+        results.put(asyncio.run(main()))
+    except Exception as exc:
+        results.put(exc)
+
+
+async def run_gateway_benchmark(address, streams):
+    """
+    Stream all frames through a running gateway from a client process.
+
+    Returns:
+        Dict with readings, errors, elapsed seconds and readings/sec
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=_client, args=(address, streams, results), daemon=True)
+    process.start()
+    loop = asyncio.get_running_loop()
+    outcome = await loop.run_in_executor(None, results.get)
+    await loop.run_in_executor(None, process.join)
+    if isinstance(outcome, Exception):
+        raise RuntimeError(f'Benchmark client failed: {outcome!r}')
+    errors, elapsed = outcome
+
+    readings = sum(len(frames) for frames in streams)
+    return {
+        'readings': readings,
+        'errors': errors,
+        'elapsed': round(elapsed, 3),
+        'throughput': round(readings / elapsed, 1) if elapsed else 0.0,
+    }
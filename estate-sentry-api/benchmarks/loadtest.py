@@ -0,0 +1,312 @@
+"""
+HTTP load-test harness for the ingest and read APIs.
+
+Drives a weighted mix of reading submissions and dashboard reads from many
+simulated users and sensors over pooled keep-alive connections, then
+reports throughput and latency percentiles per endpoint.
+"""
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from django.test.utils import setup_databases, teardown_databases
+from rest_framework.authtoken.models import Token
+
+from authentication.models import User
+from estate_sentry.async_http import AsyncHTTPClient, HTTPError
+from sensors.models import Sensor
+
+DEFAULT_MIX = {
+    'reading_create': 60,
+    'reading_history': 15,
+    'alert_list': 15,
+    'alert_statistics': 10,
+}
+
+# Sensor types used for simulated fleets, with their relative frequency.
+FLEET_SENSOR_TYPES = [
+    ('DOOR_CONTACT', 4),
+    ('WINDOW_CONTACT', 3),
+    ('CAMERA', 2),
+    ('TEMPERATURE', 1),
+]
+
+
+def reading_payload(sensor_type, rng):
+    """Return a valid reading body for a sensor type."""
+    if sensor_type in ('DOOR_CONTACT', 'WINDOW_CONTACT'):
+        return {
+            'value': {'state': rng.choice(['open', 'closed', 'closed', 'closed']),
+                      'battery_level': rng.randint(20, 100)},
+            'reading_type': 'contact_state',
+        }
+    if sensor_type == 'CAMERA':
+        return {
+            'value': {'motion_detected': rng.random() < 0.2,
+                      'image_url': f"http://camera.local/frames/{rng.getrandbits(32):08x}.jpg"},
+            'reading_type': 'image',
+        }
+    return {
+        'value': {'temperature': round(rng.gauss(21.0, 2.0), 2)},
+        'reading_type': 'temperature',
+    }
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Point the default database at a fresh test database for the duration.
+
+    SQLite test databases are created as files, since in-memory ones
+    serialize badly across server threads.
+    """
+    connection = connections['default']
+    tmp_dir = None
+    if connection.vendor == 'sqlite':
+        tmp_dir = tempfile.mkdtemp()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp_dir, 'loadtest.sqlite3')
+
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+    try:
+        yield
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def prepare_fleet(users, sensors_per_user, prefix='loadtest', seed=0):
+    """
+    Create (or reuse) simulated users, sensors and API tokens.
+
+    Returns:
+        List of dicts with 'token' and 'sensors' [(id, sensor_type), ...]
+    """
+    rng = random.Random(seed)
+    types = [sensor_type for sensor_type, weight in FLEET_SENSOR_TYPES for _ in range(weight)]
+    fleet = []
+
+    with transaction.atomic():
+        for index in range(users):
+            user, _ = User.objects.get_or_create(
+                username=f"{prefix}-user-{index}",
+                defaults={'auth_method': 'username'}
+            )
+            token, _ = Token.objects.get_or_create(user=user)
+
+            existing = list(Sensor.objects.filter(owner=user).values_list('id', 'sensor_type'))
+            missing = sensors_per_user - len(existing)
+            if missing > 0:
+                Sensor.objects.bulk_create([
+                    Sensor(
+                        name=f"{prefix} sensor {index}.{number}",
+                        sensor_type=rng.choice(types),
+                        location=f"Zone {number % 4}",
+                        owner=user,
+                    )
+                    for number in range(len(existing), sensors_per_user)
+                ])
+                existing = list(Sensor.objects.filter(owner=user).values_list('id', 'sensor_type'))
+
+            fleet.append({'token': token.key, 'sensors': existing[:sensors_per_user]})
+
+    return fleet
+
+
+def percentile(sorted_values, pct):
+    """Return the pct-th percentile of pre-sorted values (linear interpolation)."""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize_latencies(latencies, errors, elapsed):
+    """Build a summary dict from latencies in seconds."""
+    ordered = sorted(latencies)
+    count = len(ordered)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput': round(count / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': ms(sum(ordered) / count) if count else None,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1]) if count else None,
+    }
+
+
+class LoadTest:
+    """
+    One load-test run against a running API server.
+
+    Args:
+        base_url: Server root, e.g. http://127.0.0.1:8000
+        fleet: Output of prepare_fleet()
+        mix: Mapping of endpoint name -> relative weight
+        concurrency: Number of concurrent in-flight requests
+        duration: Stop after this many seconds (if requests is not given)
+        requests: Stop after this many requests in total
+        seed: Seed for the request generator
+    """
+
+    def __init__(self, base_url, fleet, mix=None, concurrency=16, duration=10.0,
+                 requests=None, seed=0):
+        self.base_url = base_url.rstrip('/')
+        self.fleet = fleet
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        unknown = set(self.mix) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests = requests
+        self.seed = seed
+
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def _build_request(self, endpoint, rng):
+        member = rng.choice(self.fleet)
+        headers = {'Authorization': f"Token {member['token']}"}
+        sensor_id, sensor_type = rng.choice(member['sensors'])
+
+        if endpoint == 'reading_create':
+            return 'POST', f"/api/sensors/{sensor_id}/readings/", headers, reading_payload(sensor_type, rng)
+        if endpoint == 'reading_history':
+            return 'GET', f"/api/sensors/{sensor_id}/reading_history/", headers, None
+        if endpoint == 'alert_list':
+            return 'GET', '/api/alerts/', headers, None
+        return 'GET', '/api/alerts/statistics/', headers, None
+
+    async def _worker(self, client, worker_id, deadline, budget):
+        rng = random.Random(f"{self.seed}:{worker_id}")
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+
+        while time.monotonic() < deadline:
+            if budget is not None:
+                if budget[0] <= 0:
+                    return
+                budget[0] -= 1
+
+            endpoint = rng.choices(names, weights)[0]
+            method, path, headers, body = self._build_request(endpoint, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, json_body=body)
+            except (HTTPError, asyncio.TimeoutError) as exc:
+                self.errors[endpoint] += 1
+                self.statuses[endpoint][exc.__class__.__name__] += 1
+                continue
+
+            self.statuses[endpoint][str(response.status)] += 1
+            if response.status >= 400:
+                self.errors[endpoint] += 1
+            else:
+                self.latencies[endpoint].append(time.perf_counter() - started)
+
+    async def run_async(self):
+        budget = [self.requests] if self.requests is not None else None
+        deadline = time.monotonic() + (self.duration if self.requests is None else float('inf'))
+
+        async with AsyncHTTPClient(self.base_url, max_connections=self.concurrency) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                self._worker(client, worker_id, deadline, budget)
+                for worker_id in range(self.concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+
+        return self.results(elapsed)
+
+    def run(self):
+        """Run the load test and return the results dict."""
+        return asyncio.run(self.run_async())
+
+    def results(self, elapsed):
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        return {
+            'config': {
+                'base_url': self.base_url,
+                'users': len(self.fleet),
+                'sensors': sum(len(member['sensors']) for member in self.fleet),
+                'mix': self.mix,
+                'concurrency': self.concurrency,
+                'duration': None if self.requests is not None else self.duration,
+                'requests': self.requests,
+                'seed': self.seed,
+            },
+            'elapsed': round(elapsed, 3),
+            'total': summarize_latencies(all_latencies, sum(self.errors.values()), elapsed),
+            'endpoints': {
+                name: {
+                    **summarize_latencies(self.latencies[name], self.errors[name], elapsed),
+                    'statuses': dict(self.statuses[name]),
+                }
+                for name in self.mix
+            },
+        }
+
+
+def compare_to_baseline(results, baseline, tolerance=10.0):
+    """
+    Compare a run against a saved baseline.
+
+    A regression is a throughput drop or p95 latency increase of more than
+    `tolerance` percent on any endpoint present in both runs.
+
+    Returns:
+        List of dicts, one per endpoint, with the relative changes and a
+        'regression' flag
+    """
+    def change(new, old):
+        if new is None or not old:
+            return None
+        return round((new - old) / old * 100.0, 2)
+
+    rows = []
+    for name in ['total', *sorted(results['endpoints'])]:
+        current = results['total'] if name == 'total' else results['endpoints'][name]
+        previous = baseline['total'] if name == 'total' else baseline.get('endpoints', {}).get(name)
+        if not previous:
+            continue
+
+        throughput = change(current['throughput'], previous['throughput'])
+        p95 = change(current['p95_ms'], previous['p95_ms'])
+        rows.append({
+            'endpoint': name,
+            'throughput_change_pct': throughput,
+            'p95_change_pct': p95,
+            'regression': (throughput is not None and throughput < -tolerance)
+            or (p95 is not None and p95 > tolerance),
+        })
+    return rows
+
+
+def load_results(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_results(results, path):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
@@ -0,0 +1,49 @@
+"""
+Compare parse and serialize cost of the JSON, MessagePack and CBOR API formats.
+
+Examples:
+    python manage.py bench_formats
+    python manage.py bench_formats --readings 50000 --batch 100 --repeat 3
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.formats import available_formats, measure_format, sample_documents
+
+
+class Command(BaseCommand):
+    help = 'Measure per-reading parse and serialize cost and payload size of each API format.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, default=10000)
+        parser.add_argument('--batch', type=int, default=100, help='Readings per history page')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is kept)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['readings'] < 1 or options['batch'] < 1 or options['repeat'] < 1:
+            raise CommandError('--readings, --batch and --repeat must be positive')
+
+        names = available_formats()
+        submissions, stored = sample_documents(options['readings'], seed=options['seed'])
+        results = [
+            measure_format(name, submissions, stored, options['batch'], options['repeat'])
+            for name in names
+        ]
+
+        self.stdout.write(f"{options['readings']} readings, history pages of {options['batch']}; per reading:")
+        header = (
+            f"{'format':<8} {'single B':>9} {'ser us':>7} {'parse us':>9}"
+            f" {'history B':>10} {'ser us':>7} {'parse us':>9}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            self.stdout.write(
+                f"{row['format']:<8} {row['single_bytes']:>9.1f} {row['single_serialize_us']:>7.2f}"
+                f" {row['single_parse_us']:>9.2f} {row['history_bytes']:>10.1f}"
+                f" {row['history_serialize_us']:>7.2f} {row['history_parse_us']:>9.2f}"
+            )
+
+        missing = sorted({'json', 'msgpack', 'cbor'} - set(names))
+        if missing:
+            self.stdout.write(f"Not installed: {', '.join(missing)} (pip install msgpack cbor2)")
@@ -0,0 +1,63 @@
+"""
+Measure sustained readings/sec through the TCP sensor gateway.
+
+Runs the gateway in this process against a throwaway test database and
+streams signed frames to it from a separate client process.
+
+Examples:
+    python manage.py bench_gateway
+    python manage.py bench_gateway --readings 200000 --sensors 1000 --connections 16
+"""
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.gateway import build_streams, prepare_gateway_fleet, run_gateway_benchmark
+from benchmarks.loadtest import throwaway_database
+from sensors.gateway import SensorGateway
+from sensors.models import SensorReading
+
+
+class Command(BaseCommand):
+    help = 'Stream signed readings through the TCP gateway and report stored readings per second.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, default=100000)
+        parser.add_argument('--sensors', type=int, default=500)
+        parser.add_argument('--connections', type=int, default=8)
+        parser.add_argument(
+            '--open-ratio', type=float, default=0.01, help='Share of readings that raise an alert'
+        )
+        parser.add_argument('--batch-ms', type=int, help='Override GATEWAY_BATCH_MS')
+        parser.add_argument('--max-batch', type=int, help='Override GATEWAY_MAX_BATCH')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if min(options['readings'], options['sensors'], options['connections']) < 1:
+            raise CommandError('--readings, --sensors and --connections must be positive')
+
+        with throwaway_database():
+            devices = prepare_gateway_fleet(options['sensors'])
+            streams = build_streams(
+                devices, options['readings'], options['connections'], options['open_ratio'], options['seed']
+            )
+            gateway = SensorGateway(
+                host='127.0.0.1', tcp_port=0, batch_ms=options['batch_ms'], max_batch=options['max_batch']
+            )
+            results = asyncio.run(self._run(gateway, streams))
+            stored = SensorReading.objects.count()
+
+        self.stdout.write(
+            f"{results['readings']} readings from {options['sensors']} sensors over "
+            f"{options['connections']} connections in {results['elapsed']}s"
+        )
+        self.stdout.write(f"{results['throughput']:.0f} readings/sec stored and acknowledged")
+        if results['errors'] or stored != results['readings']:
+            raise CommandError(f"{results['errors']} frames rejected, {stored} readings stored")
+
+    async def _run(self, gateway, streams):
+        await gateway.start()
+        try:
+            return await run_gateway_benchmark(gateway.tcp_address, streams)
+        finally:
+            await gateway.stop()
@@ -0,0 +1,48 @@
+"""
+Compare rows/sec of the reading and alert list read paths: ModelSerializer
+vs values() rows, in a throwaway database.
+
+Examples:
+    python manage.py bench_serialization
+    python manage.py bench_serialization --readings 50000 --alerts 20000 --page 100
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.loadtest import throwaway_database
+from benchmarks.serialization import ENDPOINTS, measure_endpoint, prepare_rows
+
+
+class Command(BaseCommand):
+    help = 'Measure rows/sec of list serialization with ModelSerializers and with values() rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, default=20000)
+        parser.add_argument('--alerts', type=int, default=10000)
+        parser.add_argument('--page', type=int, default=50, help='Rows per page (PAGE_SIZE)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is kept)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if min(options['readings'], options['alerts'], options['page'], options['repeat']) < 1:
+            raise CommandError('--readings, --alerts, --page and --repeat must be positive')
+
+        with throwaway_database():
+            user = prepare_rows(options['readings'], options['alerts'], seed=options['seed'])
+            results = [
+                measure_endpoint(name, user, options['page'], options['repeat'])
+                for name in ENDPOINTS
+            ]
+
+        header = f"{'endpoint':<10} {'rows':>7} {'serializer/s':>13} {'fast/s':>10} {'speedup':>8}  identical"
+        self.stdout.write(f"Pages of {options['page']} rows, fetched and rendered to JSON:")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            self.stdout.write(
+                f"{row['endpoint']:<10} {row['rows']:>7} {row['serializer_rows_per_sec']:>13.0f}"
+                f" {row['fast_rows_per_sec']:>10.0f} {row['speedup']:>7.1f}x  {'yes' if row['identical'] else 'NO'}"
+            )
+
+        different = [row['endpoint'] for row in results if not row['identical']]
+        if different:
+            raise CommandError(f"Fast path output differs for: {', '.join(different)}")
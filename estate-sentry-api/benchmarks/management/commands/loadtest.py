@@ -0,0 +1,145 @@
+"""
+Run the HTTP load-test harness.
+
+Examples:
+    python manage.py loadtest --serve --duration 30 --output results.json
+    python manage.py loadtest --url http://localhost:8000 --baseline results.json
+"""
+import threading
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.test.testcases import QuietWSGIRequestHandler
+
+from benchmarks.loadtest import (
+    DEFAULT_MIX,
+    LoadTest,
+    compare_to_baseline,
+    load_results,
+    prepare_fleet,
+    save_results,
+    throwaway_database,
+)
+
+
+def parse_mix(value):
+    """Parse 'reading_create=60,alert_list=40' into a dict."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        try:
+            mix[name.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f"Invalid mix entry '{item}', expected name=weight")
+    return mix
+
+
+class Command(BaseCommand):
+    help = 'Load-test the ingest and read APIs and report throughput and latency percentiles.'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument('--url', help='Base URL of a running server sharing this database')
+        target.add_argument(
+            '--serve', action='store_true',
+            help='Start a threaded test server on a throwaway test database (default)'
+        )
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--sensors-per-user', type=int, default=5)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+        parser.add_argument('--requests', type=int, help='Stop after N requests instead of --duration')
+        parser.add_argument(
+            '--mix', type=parse_mix,
+            default=DEFAULT_MIX,
+            help='Endpoint weights, e.g. reading_create=60,reading_history=15,alert_list=15,alert_statistics=10'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write results as JSON to this path')
+        parser.add_argument('--baseline', help='Compare against a previously saved results file')
+        parser.add_argument(
+            '--tolerance', type=float, default=10.0,
+            help='Allowed throughput drop / p95 increase in percent before failing'
+        )
+
+    def handle(self, *args, **options):
+        if options['url']:
+            results = self._run(options['url'], options)
+        else:
+            results = self._run_with_test_server(options)
+
+        self._report(results)
+
+        if options['output']:
+            save_results(results, options['output'])
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            rows = compare_to_baseline(results, load_results(options['baseline']), options['tolerance'])
+            self._report_comparison(rows)
+            if any(row['regression'] for row in rows):
+                raise CommandError('Performance regression against baseline')
+
+    def _run(self, base_url, options):
+        fleet = prepare_fleet(options['users'], options['sensors_per_user'], seed=options['seed'])
+        load_test = LoadTest(
+            base_url,
+            fleet,
+            mix=options['mix'],
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            requests=options['requests'],
+            seed=options['seed'],
+        )
+        return load_test.run()
+
+    def _run_with_test_server(self, options):
+        with throwaway_database():
+            server = ThreadedWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler, allow_reuse_address=False)
+            server.set_app(WSGIHandler())
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                host, port = server.server_address
+                self.stdout.write(f"Test server listening on http://{host}:{port}")
+                return self._run(f"http://{host}:{port}", options)
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    def _report(self, results):
+        config = results['config']
+        self.stdout.write(
+            f"\n{config['users']} users, {config['sensors']} sensors, "
+            f"concurrency {config['concurrency']}, {results['elapsed']}s\n"
+        )
+        header = f"{'endpoint':<20}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        rows = [*results['endpoints'].items(), ('total', results['total'])]
+        for name, stats in rows:
+            self.stdout.write(
+                f"{name:<20}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput']:>10}"
+                f"{self._fmt(stats['p50_ms'])}{self._fmt(stats['p95_ms'])}{self._fmt(stats['p99_ms'])}"
+            )
+
+    def _report_comparison(self, rows):
+        self.stdout.write('\nAgainst baseline:')
+        for row in rows:
+            line = (
+                f"{row['endpoint']:<20} throughput {self._pct(row['throughput_change_pct'])}"
+                f"  p95 {self._pct(row['p95_change_pct'])}"
+            )
+            if row['regression']:
+                self.stdout.write(self.style.ERROR(f"{line}  REGRESSION"))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+
+    @staticmethod
+    def _fmt(value):
+        return f"{'-':>10}" if value is None else f"{value:>10.2f}"
+
+    @staticmethod
+    def _pct(value):
+        return 'n/a' if value is None else f"{value:+.1f}%"
@@ -0,0 +1,76 @@
+"""
+Seed a synthetic fleet of users, sensors, readings and alerts for scale
+testing (see benchmarks/fleet.py). Run it against a database nothing else
+is writing to.
+
+Examples:
+    python manage.py seed_fleet --users 1000 --sensors-per-user 10 --readings-per-sensor 10000 --alerts
+    python manage.py seed_fleet --users 50 --days 7 --end 2026-10-01 --seed 7 --prefix fleet7
+"""
+from datetime import datetime, time, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from benchmarks.fleet import FleetSeeder
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load a deterministic synthetic fleet: COPY on PostgreSQL, batched executemany on SQLite.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--sensors-per-user', type=int, default=8)
+        parser.add_argument(
+            '--readings-per-sensor', type=int, default=1000,
+            help='Mean per sensor; event sensors get more than environmental ones'
+        )
+        parser.add_argument('--days', type=int, default=30, help='Days the readings cover')
+        parser.add_argument('--end', help='Date (UTC) the period ends at (default: today)')
+        parser.add_argument(
+            '--alerts', action='store_true',
+            help='Also write the alerts the handlers raise and mark readings processed'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='fleet', help='Username prefix; must not be in use')
+        parser.add_argument('--batch-size', type=int, default=20000, help='Readings per transaction')
+
+    def handle(self, *args, **options):
+        sizes = ('users', 'sensors_per_user', 'readings_per_sensor', 'days', 'batch_size')
+        if min(options[name] for name in sizes) < 1:
+            raise CommandError('--users, --sensors-per-user, --readings-per-sensor, --days and --batch-size '
+                               'must be positive')
+        end = None
+        if options['end']:
+            day = parse_date(options['end'])
+            if day is None:
+                raise CommandError(f"Not a date: {options['end']!r}")
+            end = datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+        seeder = FleetSeeder(
+            users=options['users'],
+            sensors_per_user=options['sensors_per_user'],
+            readings_per_sensor=options['readings_per_sensor'],
+            days=options['days'],
+            end=end,
+            alerts=options['alerts'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+        )
+        try:
+            results = seeder.run(progress=self._progress)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        rows = results['readings'] + results['alerts']
+        self.stdout.write(
+            f"Seeded {results['users']} users, {results['sensors']} sensors, {results['readings']} readings "
+            f"and {results['alerts']} alerts in {results['elapsed']}s "
+            f"({results['rows_per_sec'] * 60:,.0f} rows/min)"
+        )
+        if not options['alerts'] and rows:
+            self.stdout.write('Readings are unprocessed: replay_readings --apply creates their alerts')
+
+    def _progress(self, counts):
+        self.stdout.write(f"  {counts['readings']:>12,} readings {counts['alerts']:>12,} alerts")
@@ -0,0 +1,118 @@
+"""
+Rows/sec of the list endpoints' read path: ModelSerializer vs values() rows.
+
+Each measurement fetches pages of readings or alerts the way the list
+endpoints do and renders them to JSON, with the regular serializer and
+JSONRenderer, then with the RowSerializer and FastJSONRenderer. The two
+outputs are compared byte for byte.
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from alerts.models import Alert
+from alerts.serializers import AlertRows, AlertSerializer
+from estate_sentry.fast_serializers import FastJSONRenderer
+from sensors.models import Sensor, SensorReading
+from sensors.serializers import SensorReadingRows, SensorReadingSerializer
+from .loadtest import prepare_fleet, reading_payload
+
+ENDPOINTS = {
+    'readings': (SensorReading, SensorReadingSerializer, SensorReadingRows),
+    'alerts': (Alert, AlertSerializer, AlertRows),
+}
+
+
+def prepare_rows(readings, alerts, sensors=20, seed=0):
+    """
+    Create one user's sensors with simulated readings and alerts.
+
+    A share of alerts is acknowledged, has no sensor, or has non-ASCII text,
+    so every column and conversion is exercised.
+    """
+    rng = random.Random(seed)
+    member = prepare_fleet(users=1, sensors_per_user=sensors, prefix='serializationbench', seed=seed)[0]
+    fleet = list(Sensor.objects.filter(pk__in=[sensor_id for sensor_id, _ in member['sensors']]))
+    user = fleet[0].owner
+    started = timezone.now()
+    severities = [value for value, _ in Alert.SEVERITY_CHOICES]
+    alert_types = [value for value, _ in Alert.ALERT_TYPE_CHOICES]
+
+    with transaction.atomic():
+        SensorReading.objects.bulk_create([
+            SensorReading(
+                sensor=sensor,
+                timestamp=started - timedelta(seconds=index),
+                processed=True,
+                idempotency_key=str(index) if index % 2 else None,
+                **reading_payload(sensor.sensor_type, rng),
+            )
+            for index, sensor in ((index, rng.choice(fleet)) for index in range(readings))
+        ], batch_size=1000)
+        Alert.objects.bulk_create([
+            Alert(
+                alert_type=rng.choice(alert_types),
+                severity=rng.choice(severities),
+                user=user,
+                sensor=None if index % 10 == 0 else rng.choice(fleet),
+                timestamp=started - timedelta(seconds=index),
+                title='Tür geöffnet' if index % 7 == 0 else 'Door opened',
+                description='Simulated alert for the serialization benchmark.',
+                acknowledged=index % 3 == 0,
+                acknowledged_at=started if index % 3 == 0 else None,
+                acknowledged_by=user if index % 3 == 0 else None,
+                metadata={'reading_id': index, 'confidence': rng.random()},
+            )
+            for index in range(alerts)
+        ], batch_size=1000)
+    return user
+
+
+def measure_endpoint(name, user, page_size=50, repeat=3):
+    """
+    Measure one endpoint over every page of the user's rows, in model order.
+
+    Returns:
+        Dict with row count, rows/sec for each path, speedup and whether
+        the rendered bytes were identical
+    """
+    model, serializer_class, rows_class = ENDPOINTS[name]
+    owned = model.objects.filter(user=user) if model is Alert else model.objects.filter(sensor__owner=user)
+    # Pages are selected by primary key, so the cost measured is fetching
+    # and serializing rows rather than sorting for OFFSET
+    ids = list(owned.values_list('pk', flat=True))
+    pages = [ids[start:start + page_size] for start in range(0, len(ids), page_size)]
+    renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+
+    def serializer_path(page):
+        # As the list endpoints query: alerts join their relations, readings do not
+        if model is Alert:
+            page = page.select_related('sensor', 'acknowledged_by')
+        return renderer.render(serializer_class(page, many=True).data)
+
+    def fast_path(page):
+        return fast_renderer.render(rows_class.serialize(rows_class.values(page)))
+
+    results = {}
+    for path_name, render in [('serializer', serializer_path), ('fast', fast_path)]:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            # Fresh querysets each run, so no results are reused
+            output = [render(model.objects.filter(pk__in=page)) for page in pages]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[path_name] = (len(ids) / best if best else 0.0, output)
+
+    return {
+        'endpoint': name,
+        'rows': len(ids),
+        'serializer_rows_per_sec': results['serializer'][0],
+        'fast_rows_per_sec': results['fast'][0],
+        'speedup': results['fast'][0] / results['serializer'][0] if results['serializer'][0] else 0.0,
+        'identical': results['serializer'][1] == results['fast'][1],
+    }
@@ -0,0 +1,145 @@
+from datetime import datetime, timezone
+
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+
+from alerts.models import Alert
+from sensors.models import Sensor, SensorReading
+from sensors.replay import replay_readings
+from .fleet import FleetSeeder
+from .formats import available_formats, measure_format, sample_documents
+from .loadtest import LoadTest, compare_to_baseline, percentile, prepare_fleet
+from .serialization import ENDPOINTS, measure_endpoint, prepare_rows
+
+
+class PercentileTestCase(SimpleTestCase):
+    """Test cases for latency summaries and baseline comparison."""
+
+    def test_percentile_interpolates(self):
+        """Test percentiles interpolate between ranked samples."""
+        values = [1.0, 2.0, 3.0, 4.0, 5.0]
+
+        self.assertEqual(percentile(values, 50), 3.0)
+        self.assertEqual(percentile(values, 95), 4.8)
+        self.assertIsNone(percentile([], 50))
+
+    def test_compare_flags_regressions(self):
+        """Test throughput drops and p95 increases beyond tolerance are flagged."""
+        baseline = {
+            'total': {'throughput': 100.0, 'p95_ms': 10.0},
+            'endpoints': {
+                'alert_list': {'throughput': 50.0, 'p95_ms': 10.0},
+                'reading_create': {'throughput': 50.0, 'p95_ms': 10.0},
+            },
+        }
+        results = {
+            'total': {'throughput': 95.0, 'p95_ms': 10.5},
+            'endpoints': {
+                'alert_list': {'throughput': 30.0, 'p95_ms': 10.0},
+                'reading_create': {'throughput': 50.0, 'p95_ms': 20.0},
+            },
+        }
+
+        rows = {row['endpoint']: row for row in compare_to_baseline(results, baseline, tolerance=10)}
+
+        self.assertFalse(rows['total']['regression'])
+        self.assertTrue(rows['alert_list']['regression'])
+        self.assertTrue(rows['reading_create']['regression'])
+        self.assertEqual(rows['reading_create']['p95_change_pct'], 100.0)
+
+
+class LoadTestRunTestCase(LiveServerTestCase):
+    """Test a short load-test run against a live server."""
+
+    def test_run_reports_every_endpoint(self):
+        """Test a run drives every endpoint in the mix and records readings."""
+        fleet = prepare_fleet(users=2, sensors_per_user=3)
+
+        results = LoadTest(self.live_server_url, fleet, concurrency=2, requests=40, seed=1).run()
+
+        self.assertEqual(results['total']['requests'] + results['total']['errors'], 40)
+        self.assertEqual(results['total']['errors'], 0)
+        self.assertEqual(set(results['endpoints']), {
+            'reading_create', 'reading_history', 'alert_list', 'alert_statistics'
+        })
+        created = results['endpoints']['reading_create']['requests']
+        self.assertEqual(SensorReading.objects.count(), created)
+
+
+class FormatBenchmarkTestCase(SimpleTestCase):
+    """Test cases for the API format benchmark."""
+
+    def test_measures_each_available_format(self):
+        """Test every registered format is measured on the same documents."""
+        submissions, stored = sample_documents(50, seed=1)
+        self.assertEqual(submissions, sample_documents(50, seed=1)[0])
+
+        for name in available_formats():
+            row = measure_format(name, submissions, stored, batch_size=10, repeat=1)
+            self.assertEqual(row['format'], name)
+            self.assertGreater(row['single_bytes'], 0)
+            self.assertGreater(row['history_parse_us'], 0)
+
+
+class SerializationBenchmarkTestCase(TestCase):
+    """Test cases for the list serialization benchmark."""
+
+    def test_fast_path_output_is_identical(self):
+        """Test both read paths are measured over every row and render the same bytes."""
+        user = prepare_rows(readings=120, alerts=60, sensors=4, seed=1)
+
+        for name in ENDPOINTS:
+            row = measure_endpoint(name, user, page_size=25, repeat=1)
+            self.assertEqual(row['endpoint'], name)
+            self.assertEqual(row['rows'], 120 if name == 'readings' else 60)
+            self.assertGreater(row['fast_rows_per_sec'], 0)
+            self.assertTrue(row['identical'])
+
+
+@override_settings(DATABASE_SHARDS=['default'])
+class FleetSeederTestCase(TestCase):
+    """Test cases for synthetic fleet seeding."""
+
+    end = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+    def seed(self, prefix, alerts=True):
+        return FleetSeeder(
+            users=2, sensors_per_user=6, readings_per_sensor=40, days=3, end=self.end, alerts=alerts,
+            seed=5, prefix=prefix, batch_size=100,
+        ).run()
+
+    def test_alerts_match_replay(self):
+        """Test seeded alerts are the ones replaying the seeded readings raises."""
+        results = self.seed('fleet')
+        self.assertEqual(results['readings'], SensorReading.objects.count())
+        self.assertEqual(results['alerts'], Alert.objects.count())
+        self.assertGreater(results['alerts'], 0)
+        self.assertTrue(all(SensorReading.objects.values_list('processed', flat=True)))
+
+        replay = replay_readings(workers=1)
+        self.assertEqual(replay['readings'], results['readings'])
+        self.assertEqual(replay['alerts'], results['alerts'])
+
+        for sensor in Sensor.objects.all():
+            newest = sensor.readings.order_by('-timestamp', '-id').first()
+            self.assertEqual(sensor.last_reading_id, newest.pk)
+            self.assertEqual(sensor.last_reading_value, newest.value)
+            self.assertLess(newest.timestamp, self.end)
+        # Ids continue after the seeded rows
+        sensor = Sensor.objects.first()
+        self.assertGreater(SensorReading.objects.create(sensor=sensor, value={}).pk, results['readings'])
+
+    def test_seed_is_deterministic(self):
+        """Test the same seed generates the same fleet, with unprocessed readings unless alerts are written."""
+        self.seed('first', alerts=False)
+        self.seed('second', alerts=False)
+        self.assertFalse(Alert.objects.exists())
+        self.assertFalse(SensorReading.objects.filter(processed=True).exists())
+
+        def fleet(prefix):
+            return list(
+                SensorReading.objects.filter(sensor__owner__username__startswith=prefix)
+                .order_by('id').values_list('sensor__name', 'timestamp', 'value')
+            )
+        self.assertEqual(fleet('first-'), fleet('second-'))
+        with self.assertRaises(ValueError):
+            self.seed('first')
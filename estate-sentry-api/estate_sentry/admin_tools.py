@@ -0,0 +1,166 @@
+"""
+Admin changelists for very large tables.
+
+The stock changelist runs an exact COUNT(*) (twice when unfiltered) and
+OFFSET pagination on every load, which gets slower with every page and every
+million rows. LargeTableAdmin replaces both:
+
+- counts come from the query planner (PostgreSQL) or a capped COUNT (other
+  backends), and are shown as approximate
+- with the default ordering, pages are fetched with a keyset cursor
+  (`?cursor=<timestamp>,<id>`), which costs the same on every page
+- clicking a column header to sort falls back to OFFSET paging, still with
+  approximate counts
+"""
+import json
+from datetime import datetime
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'cursor'
+
+# Below this estimate an exact count is cheap enough to run instead.
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimated_count(queryset, cap=EXACT_COUNT_THRESHOLD):
+    """
+    Return (count, exact) for a queryset without scanning large tables.
+
+    PostgreSQL uses pg_class.reltuples for unfiltered querysets and the
+    planner's row estimate otherwise. Other backends count at most `cap` + 1
+    rows and report anything larger as inexact.
+    """
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                estimate = row[0] if row else -1
+            else:
+                sql, params = queryset.order_by().values('pk').query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimate = plan[0]['Plan']['Plan Rows']
+        # reltuples is -1 for tables that were never analyzed
+        if estimate >= cap:
+            return estimate, False
+
+    count = queryset.order_by()[:cap + 1].count()
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+class ApproximatePaginator(Paginator):
+    """Paginator whose count comes from estimated_count()."""
+
+    @cached_property
+    def _estimate(self):
+        return estimated_count(self.object_list)
+
+    @cached_property
+    def count(self):
+        return self._estimate[0]
+
+    @property
+    def exact(self):
+        return self._estimate[1]
+
+    def validate_number(self, number):
+        # The estimate may be low; let the page come back empty instead of 404ing.
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.exact or int(number) < 1:
+                raise
+            return int(number)
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList that pages by (keyset_field, pk) when using the default ordering."""
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    @property
+    def keyset_field(self):
+        return self.model_admin.keyset_field
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            super().get_results(request)
+            self.result_count_exact = self.paginator.exact
+            self.keyset = False
+            return
+
+        field = self.keyset_field
+        queryset = self.queryset.order_by(f'-{field}', '-pk')
+        cursor = request.GET.get(CURSOR_VAR)
+        if cursor:
+            value, pk = self._decode_cursor(cursor)
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+
+        rows = list(queryset[:self.list_per_page + 1])
+        self.result_list = rows[:self.list_per_page]
+        self.next_cursor = None
+        if len(rows) > self.list_per_page:
+            last = self.result_list[-1]
+            self.next_cursor = f"{getattr(last, field).isoformat()},{last.pk}"
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.result_count_exact = self.paginator.exact
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(cursor or self.next_cursor)
+        self.keyset = True
+        self.cursor = cursor
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        value, _, pk = cursor.rpartition(',')
+        try:
+            return datetime.fromisoformat(value), int(pk)
+        except ValueError:
+            raise IncorrectLookupParameters
+
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR, PAGE_VAR])
+
+    def next_page_url(self):
+        return self.get_query_string({CURSOR_VAR: self.next_cursor}, remove=[PAGE_VAR])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin for tables too large for exact counts and OFFSET paging.
+
+    Set `keyset_field` to an indexed, mostly-unique datetime column that
+    the default changelist ordering is descending on.
+    """
+
+    keyset_field = 'timestamp'
+    paginator = ApproximatePaginator
+    show_full_result_count = False
+    change_list_template = 'admin/large_table_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
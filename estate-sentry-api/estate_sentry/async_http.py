@@ -0,0 +1,215 @@
+"""
+Minimal asyncio HTTP/1.1 client with pooled keep-alive connections.
+
+Used by tooling that needs many concurrent requests from one process
+without pulling in a third-party HTTP stack.
+"""
+import asyncio
+import json
+import ssl
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+
+class HTTPError(Exception):
+    """Raised when a request cannot be completed (connection or protocol error)."""
+
+
+class HTTPResponse:
+    """A fully read HTTP response."""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    def __repr__(self):
+        return f"<HTTPResponse {self.status}>"
+
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncHTTPClient:
+    """
+    Asyncio HTTP/1.1 client that keeps connections alive per origin.
+
+    Each origin (scheme, host, port) gets at most `max_connections` open
+    connections; idle ones are reused for subsequent requests.
+
+    `resolve`, if given, is awaited as resolve(host, port) before each new
+    connection and returns the address to connect to (TLS still verifies
+    the host name); an exception from it fails the request as HTTPError.
+    """
+
+    def __init__(self, base_url='', max_connections=10, timeout=10.0, headers=None, resolve=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.resolve = resolve
+        self._idle = defaultdict(deque)
+        self._limits = {}
+        self._ssl_context = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def request(self, method, url, body=None, headers=None, json_body=None):
+        """
+        Send a request and return the complete response.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL, or a path appended to base_url
+            body: Request body bytes
+            headers: Extra request headers
+            json_body: Object to send as JSON (sets Content-Type)
+
+        Returns:
+            HTTPResponse
+        """
+        if '://' not in url:
+            url = f"{self.base_url}{url}"
+        parts = urlsplit(url)
+        scheme = parts.scheme
+        host = parts.hostname
+        port = parts.port or (443 if scheme == 'https' else 80)
+        target = parts.path or '/'
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        request_headers = {**self.headers, **(headers or {})}
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            request_headers.setdefault('Content-Type', 'application/json')
+        body = body or b''
+
+        head = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}"]
+        head.extend(f"{name}: {value}" for name, value in request_headers.items())
+        head.append(f"Content-Length: {len(body)}")
+        payload = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+        origin = (scheme, host, port)
+        limit = self._limits.setdefault(origin, asyncio.Semaphore(self.max_connections))
+
+        async with limit:
+            for attempt in range(2):
+                conn = await self._acquire(origin)
+                try:
+                    response, keep_alive = await asyncio.wait_for(
+                        self._exchange(conn, payload, method), self.timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError) as exc:
+                    conn.close()
+                    # A reused keep-alive connection may have been closed by
+                    # the server in the meantime; retry once on a fresh one.
+                    if conn.reused and attempt == 0:
+                        continue
+                    raise HTTPError(str(exc) or exc.__class__.__name__) from exc
+                except BaseException:
+                    conn.close()
+                    raise
+
+                if keep_alive:
+                    conn.reused = True
+                    self._idle[origin].append(conn)
+                else:
+                    conn.close()
+                return response
+
+    async def _acquire(self, origin):
+        idle = self._idle[origin]
+        while idle:
+            conn = idle.pop()
+            if not conn.reader.at_eof():
+                return conn
+            conn.close()
+
+        scheme, host, port = origin
+        ssl_context = None
+        if scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        address = host
+        if self.resolve is not None:
+            try:
+                address = await self.resolve(host, port)
+            except (OSError, ValueError) as exc:
+                raise HTTPError(f"Cannot connect to {host}:{port}: {exc}") from exc
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    address, port, ssl=ssl_context, server_hostname=host if ssl_context else None
+                ),
+                self.timeout
+            )
+        except OSError as exc:
+            raise HTTPError(f"Cannot connect to {host}:{port}: {exc}") from exc
+        return _Connection(reader, writer)
+
+    async def _exchange(self, conn, payload, method):
+        conn.writer.write(payload)
+        await conn.writer.drain()
+
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed before response')
+        version, status, _ = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+
+        headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        status = int(status)
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(conn.reader)
+        elif 'content-length' in headers:
+            body = await conn.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await conn.reader.read()
+            headers['connection'] = 'close'
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+        return HTTPResponse(status, headers, body), keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';')[0].strip(), 16)
+            if size == 0:
+                # Skip optional trailers up to the terminating blank line.
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def close(self):
+        """Close all idle connections."""
+        for idle in self._idle.values():
+            while idle:
+                idle.pop().close()
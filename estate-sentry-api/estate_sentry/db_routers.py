@@ -0,0 +1,111 @@
+"""
+Database routing for read replicas.
+
+Reads only go to a replica inside views that opt in with ReplicaReadMixin,
+and never for a user who wrote recently: PrimaryPinningMiddleware pins a
+user to the primary for REPLICA_PIN_SECONDS after any unsafe request, so
+clients always read their own writes.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+_read_from_replica = contextvars.ContextVar('read_from_replica', default=False)
+
+PIN_KEY = 'db-primary-pin:{user_id}'
+
+
+def replica_aliases():
+    return settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def use_replica():
+    """Route reads in the enclosed block to a replica (if any are configured)."""
+    token = _read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def pin_to_primary(user_id):
+    """Send this user's reads to the primary for REPLICA_PIN_SECONDS."""
+    cache.set(PIN_KEY.format(user_id=user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return bool(cache.get(PIN_KEY.format(user_id=user_id)))
+
+
+class ReplicaRouter:
+    """Send opted-in reads to a randomly chosen replica; everything else to default."""
+
+    def choose_replica(self):
+        return random.choice(replica_aliases())
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get() and replica_aliases():
+            return self.choose_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        primary_and_replicas = {'default', *replica_aliases()}
+        if obj1._state.db in primary_and_replicas and obj2._state.db in primary_and_replicas:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    ViewSet mixin that serves safe requests for `replica_actions` from a replica.
+
+    Routing is decided after authentication, so users pinned to the primary
+    by a recent write keep reading from it.
+    """
+
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            and replica_aliases()
+            and not is_pinned_to_primary(request.user.pk)
+        ):
+            self._replica_token = _read_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _read_from_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PrimaryPinningMiddleware:
+    """Pin authenticated users to the primary after unsafe (writing) requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and replica_aliases():
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return response
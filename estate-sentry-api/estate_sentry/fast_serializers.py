@@ -0,0 +1,130 @@
+"""
+Serializer-free read path for list endpoints.
+
+Serializing a page through a ModelSerializer instantiates a model per row,
+walks DRF field objects, follows relations and calls get_FOO_display().
+For read-only list and history endpoints, a RowSerializer instead fetches
+exactly the needed columns with values() (joined names included), maps
+choice labels from dicts built once, and formats values the same way the
+DRF fields do. Its output is equal, key order included, to the
+ModelSerializer it replaces, so it renders to identical bytes in every
+format; FastJSONRenderer then skips the per-call encoder setup of
+JSONRenderer.
+
+Set FAST_READ_SERIALIZATION = False to serve these endpoints through the
+regular serializers.
+"""
+import json
+from functools import partial
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+def choice_labels(model, field_name):
+    """Map a choice field's stored values to their display labels, as get_FOO_display() does."""
+    return {value: str(label) for value, label in model._meta.get_field(field_name).flatchoices}
+
+
+def iso_datetime(value):
+    """Format a datetime as DRF's DateTimeField does (ISO 8601, 'Z' for UTC)."""
+    return format_datetime(value, timezone.get_current_timezone() if settings.USE_TZ else None)
+
+
+def format_datetime(value, tz):
+    if not value:
+        return None
+    if tz is not None:
+        value = value.astimezone(tz)
+    representation = value.isoformat()
+    if representation.endswith('+00:00'):
+        representation = representation[:-6] + 'Z'
+    return representation
+
+
+class RowSerializer:
+    """
+    Turns values() rows into the dicts a ModelSerializer would produce.
+
+    Subclasses list `columns` as (output name, values() path, converter)
+    in the serializer's field order; the converter may be None, a callable
+    applied to the value, or a dict of choice labels (for *_display fields,
+    falling back to the stored value like get_FOO_display()).
+    """
+
+    columns = ()
+
+    @classmethod
+    def paths(cls):
+        return list(dict.fromkeys(path for _, path, _ in cls.columns))
+
+    @classmethod
+    def values(cls, queryset):
+        """The queryset as values() rows with every column this serializer needs."""
+        return queryset.values(*cls.paths())
+
+    @classmethod
+    def serialize(cls, rows):
+        """List of output dicts for values() rows."""
+        # Look the current timezone up once, not per datetime
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        columns = []
+        for name, path, converter in cls.columns:
+            if converter is iso_datetime:
+                converter = partial(format_datetime, tz=tz)
+            is_choice = isinstance(converter, dict)
+            columns.append((name, path, converter.get if is_choice else converter, is_choice))
+        data = []
+        for row in rows:
+            item = {}
+            for name, path, convert, is_choice in columns:
+                value = row[path]
+                if convert is None:
+                    item[name] = value
+                elif is_choice:
+                    item[name] = convert(value, value)
+                else:
+                    item[name] = convert(value)
+            data.append(item)
+        return data
+
+
+class FastListMixin:
+    """
+    ViewSet mixin serving `list` through `row_serializer_class` (a
+    RowSerializer) when FAST_READ_SERIALIZATION is set.
+    """
+
+    row_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_READ_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        rows = self.row_serializer_class.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.row_serializer_class.serialize(page))
+        return Response(self.row_serializer_class.serialize(rows))
+
+
+_encoder = json.JSONEncoder(
+    ensure_ascii=JSONRenderer.ensure_ascii,
+    allow_nan=not JSONRenderer.strict,
+    separators=(',', ':'),
+    default=JSONRenderer.encoder_class().default,
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that reuses one compact encoder instead of building one per
+    response. Output is identical; indented rendering is left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = _encoder.encode(data)
+        return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
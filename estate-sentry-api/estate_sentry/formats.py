@@ -0,0 +1,86 @@
+"""
+Compact binary API formats: MessagePack and CBOR.
+
+Battery-powered sensors and gateways can send and receive the same
+documents as JSON in either format, chosen by Content-Type and Accept
+(or ?format=msgpack|cbor). Values JSON cannot represent natively
+(datetimes, decimals, UUIDs) are encoded as they would be in JSON, so a
+client sees the same structure in every format.
+
+Both libraries are optional; settings.py only registers the classes whose
+library is installed.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+_json_encoder = JSONEncoder()
+
+
+def _check_document(data):
+    if not isinstance(data, (dict, list)):
+        raise ParseError('Request body must be a map or an array')
+    return data
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack request bodies."""
+
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return _check_document(msgpack.unpackb(stream.read(), raw=False))
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders responses as MessagePack."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_json_encoder.default, use_bin_type=True)
+
+
+class CBORParser(BaseParser):
+    """Parses CBOR request bodies."""
+
+    media_type = 'application/cbor'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return _check_document(cbor2.loads(stream.read()))
+        except (ValueError, TypeError, cbor2.CBORDecodeError) as exc:
+            raise ParseError(f'CBOR parse error - {exc}')
+
+
+class CBORRenderer(BaseRenderer):
+    """Renders responses as CBOR."""
+
+    media_type = 'application/cbor'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return cbor2.dumps(data, default=lambda encoder, value: encoder.encode(_json_encoder.default(value)))
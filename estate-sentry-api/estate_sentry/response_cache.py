@@ -0,0 +1,114 @@
+"""
+Per-user versioned response cache for read endpoints.
+
+Dashboards poll the sensor and alert lists far more often than the data
+changes. Read actions decorated with `cached_response` store their
+serialized response data under a key made of the user, the view action,
+the request path and query string, and the user's data version. Writes
+that change what a user can read (sensor edits, new readings, alert
+creation or acknowledgement) call `invalidate_user()`, which bumps the
+version: old entries are simply never looked up again and age out, so
+invalidation is a single cache increment with no key scanning.
+
+Versions live in the default cache, so with a shared backend
+(CACHE_BACKEND) every process sees a bump at once. With the per-process
+local-memory default, bumps made by workers (gateway, escalations,
+replays) never reach the web processes, so RESPONSE_CACHE_SECONDS defaults
+to 0 unless the cache is shared. Response data is looked up in a bounded
+per-process local-memory cache first, then in the default cache.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from estate_sentry.sharding import current_shard
+from monitoring.metrics import RESPONSE_CACHE_REQUESTS
+
+VERSION_KEY = 'response-version:{user_id}'
+RESPONSE_KEY = 'response:{user_id}:{version}:{view}:{digest}'
+LOCAL_CACHE_ALIAS = 'responses-local'
+
+
+def data_version(user_id):
+    """Return the user's current data version, creating one if needed."""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock, so a version evicted from the cache is not
+        # reissued while responses cached under it may still exist
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate_user(*user_ids, using=None):
+    """
+    Invalidate cached responses for users once the current transaction on
+    `using` commits: the database the write went to, by default the
+    current shard or 'default'.
+
+    Bumping before the commit would let a concurrent request cache data
+    from before the write under the new version.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        transaction.on_commit(
+            lambda: [bump_data_version(user_id) for user_id in user_ids], using=using or current_shard()
+        )
+
+
+def response_cache_key(request, view_name, user_id, version):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    # The host is part of paginated responses' next/previous links
+    digest = hashlib.sha1(f'{request.get_host()}{request.path}?{query}'.encode()).hexdigest()
+    return RESPONSE_KEY.format(user_id=user_id, version=version, view=view_name, digest=digest)
+
+
+def cached_response(method):
+    """
+    Cache a read action's successful response data per user and data version.
+
+    Only the data is cached; it is rendered for each request, so content
+    negotiation still applies.
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_SECONDS or not request.user.is_authenticated:
+            return method(self, request, *args, **kwargs)
+
+        view_name = f'{self.__class__.__name__}.{method.__name__}'
+        key = response_cache_key(request, view_name, request.user.pk, data_version(request.user.pk))
+        local = caches[LOCAL_CACHE_ALIAS]
+
+        data = local.get(key)
+        if data is not None:
+            RESPONSE_CACHE_REQUESTS.labels(view_name, 'local').inc()
+            return Response(data)
+        data = cache.get(key)
+        if data is not None:
+            RESPONSE_CACHE_REQUESTS.labels(view_name, 'shared').inc()
+            local.set(key, data, settings.RESPONSE_CACHE_SECONDS)
+            return Response(data)
+
+        RESPONSE_CACHE_REQUESTS.labels(view_name, 'miss').inc()
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200 and response.data is not None:
+            local.set(key, response.data, settings.RESPONSE_CACHE_SECONDS)
+            cache.set(key, response.data, settings.RESPONSE_CACHE_SECONDS)
+        return response
+
+    return wrapper
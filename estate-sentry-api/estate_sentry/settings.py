@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
 
@@ -46,9 +47,14 @@ INSTALLED_APPS = [
     'authentication.apps.AuthenticationConfig',
     'sensors.apps.SensorsConfig',
     'alerts.apps.AlertsConfig',
+    'benchmarks.apps.BenchmarksConfig',
+    'monitoring.apps.MonitoringConfig',
+    'notifications.apps.NotificationsConfig',
+    'webhooks.apps.WebhooksConfig',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,14 +63,78 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'estate_sentry.db_routers.PrimaryPinningMiddleware',
 ]
 
+# Request profiling (opt-in): Server-Timing headers plus sampled profiles
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'False') == 'True'
+# Fraction of requests to profile with REQUEST_PROFILING_PROFILER
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', 0.0))
+# Dump stack samples for every request slower than this (0 disables)
+REQUEST_PROFILING_SLOW_MS = float(os.environ.get('REQUEST_PROFILING_SLOW_MS', 0))
+# 'cprofile' (deterministic, .prof files) or 'stack' (sampled, collapsed stacks)
+REQUEST_PROFILING_PROFILER = os.environ.get('REQUEST_PROFILING_PROFILER', 'cprofile')
+REQUEST_PROFILING_DIR = os.environ.get('REQUEST_PROFILING_DIR', BASE_DIR / 'profiles')
+
+if REQUEST_PROFILING:
+    MIDDLEWARE.insert(0, 'monitoring.middleware.ProfilingMiddleware')
+
+# Sensor liveness: expected seconds between check-ins (per-sensor
+# heartbeat_interval overrides it) and minimum seconds between last_seen writes
+SENSOR_HEARTBEAT_INTERVAL = int(os.environ.get('SENSOR_HEARTBEAT_INTERVAL', 300))
+SENSOR_LAST_SEEN_WRITE_INTERVAL = int(os.environ.get('SENSOR_LAST_SEEN_WRITE_INTERVAL', 30))
+
+# How often each process checks the owner's arming version row for zone
+# arming changes made by other processes (sensors/arming.py)
+ARMING_INDEX_CHECK_SECONDS = float(os.environ.get('ARMING_INDEX_CHECK_SECONDS', 1))
+
+# Recent reading idempotency keys remembered per process, so most retried
+# submissions are answered without a database round trip
+READING_IDEMPOTENCY_SENSORS = int(os.environ.get('READING_IDEMPOTENCY_SENSORS', 10000))
+READING_IDEMPOTENCY_KEYS_PER_SENSOR = int(os.environ.get('READING_IDEMPOTENCY_KEYS_PER_SENSOR', 32))
+
+# TCP/UDP sensor gateway (python manage.py run_gateway)
+GATEWAY_HOST = os.environ.get('GATEWAY_HOST', '0.0.0.0')
+GATEWAY_TCP_PORT = int(os.environ.get('GATEWAY_TCP_PORT', 7700))
+GATEWAY_UDP_PORT = int(os.environ.get('GATEWAY_UDP_PORT', 7701))
+# Readings are stored every GATEWAY_BATCH_MS, or as soon as GATEWAY_MAX_BATCH are waiting
+GATEWAY_BATCH_MS = int(os.environ.get('GATEWAY_BATCH_MS', 20))
+GATEWAY_MAX_BATCH = int(os.environ.get('GATEWAY_MAX_BATCH', 2000))
+GATEWAY_MAX_FRAME_BYTES = int(os.environ.get('GATEWAY_MAX_FRAME_BYTES', 16 * 1024))
+# Seconds before a sensor's gateway_key is re-read from the database
+GATEWAY_KEY_REFRESH_SECONDS = int(os.environ.get('GATEWAY_KEY_REFRESH_SECONDS', 60))
+# Ids of unknown sensors are remembered, at most GATEWAY_UNKNOWN_SENSORS of them for
+# GATEWAY_UNKNOWN_SENSOR_SECONDS each, so their frames are rejected without a lookup
+GATEWAY_UNKNOWN_SENSORS = int(os.environ.get('GATEWAY_UNKNOWN_SENSORS', 10000))
+GATEWAY_UNKNOWN_SENSOR_SECONDS = int(os.environ.get('GATEWAY_UNKNOWN_SENSOR_SECONDS', 30))
+# Frames carrying a "ts" further than this from the gateway's clock are rejected as replays
+GATEWAY_MAX_FRAME_AGE_SECONDS = int(os.environ.get('GATEWAY_MAX_FRAME_AGE_SECONDS', 300))
+
+# Replaying stored readings through the handlers (python manage.py replay_readings,
+# POST /api/sensors/replay/): worker processes, sensors sharded between them,
+# and rows fetched per round trip
+REPLAY_WORKERS = int(os.environ.get('REPLAY_WORKERS', os.cpu_count() or 1))
+REPLAY_CHUNK_SIZE = int(os.environ.get('REPLAY_CHUNK_SIZE', 2000))
+# The replay API runs within the request, so it refuses ranges with more readings
+REPLAY_API_MAX_READINGS = int(os.environ.get('REPLAY_API_MAX_READINGS', 50000))
+
+# Prometheus metrics (/metrics). With multi-process servers, point this at a
+# directory shared by all workers (and empty it on deploy).
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR') or None
+# Require 'Authorization: Bearer <token>' on /metrics when set. Without a
+# token, /metrics is refused unless unauthenticated scrapes are allowed
+# (the default only with DEBUG)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+METRICS_ALLOW_UNAUTHENTICATED = os.environ.get('METRICS_ALLOW_UNAUTHENTICATED', str(DEBUG)) == 'True'
+# Seconds a database-backed gauge (unprocessed readings) is reused between scrapes
+METRICS_GAUGE_CACHE_SECONDS = int(os.environ.get('METRICS_GAUGE_CACHE_SECONDS', 15))
+
 ROOT_URLCONF = 'estate_sentry.urls'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'estate_sentry' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -105,6 +175,111 @@ else:
         }
     }
 
+# SQLite production mode: WAL journal and tuned pragmas, plus a single writer
+# thread that group-commits ingest writes (see sensors/writer.py)
+SQLITE_PRODUCTION_MODE = os.environ.get('SQLITE_PRODUCTION_MODE', 'False') == 'True'
+
+if DATABASE_ENGINE != 'postgresql' and SQLITE_PRODUCTION_MODE:
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA busy_timeout=5000;'
+            'PRAGMA temp_store=MEMORY;'
+            'PRAGMA cache_size=-32000;'
+            'PRAGMA mmap_size=268435456;'
+        ),
+        # Take the write lock up front instead of failing to upgrade a read lock
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,
+    }
+
+SQLITE_WRITER_ENABLED = DATABASE_ENGINE != 'postgresql' and SQLITE_PRODUCTION_MODE
+# How long the writer collects queued writes before committing them together
+SQLITE_WRITER_BATCH_MS = float(os.environ.get('SQLITE_WRITER_BATCH_MS', 5))
+SQLITE_WRITER_MAX_BATCH = int(os.environ.get('SQLITE_WRITER_MAX_BATCH', 500))
+# Seconds a request waits for its write to be committed
+SQLITE_WRITER_TIMEOUT = float(os.environ.get('SQLITE_WRITER_TIMEOUT', 10))
+
+# Read replicas (optional). Safe reads from the heavy read endpoints go to a
+# replica; writes, and reads by users who wrote in the last
+# REPLICA_PIN_SECONDS, stay on the primary.
+DATABASE_REPLICAS = []
+
+if os.environ.get('DATABASE_REPLICA_ENABLED', 'False') == 'True':
+    if DATABASE_ENGINE == 'postgresql':
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ.get('POSTGRES_REPLICA_HOST', DATABASES['default']['HOST']),
+            'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        }
+    else:
+        # Defaults to the primary file, which exercises routing locally
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_REPLICA_PATH', DATABASES['default']['NAME']),
+        }
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS = ['replica']
+
+# Owner sharding (optional; estate_sentry/sharding.py). Each owner's sensors,
+# readings and alerts live on one of DATABASE_SHARDS; everything else stays on
+# default. Extra shards are SQLite files next to db.sqlite3, or PostgreSQL
+# databases named by POSTGRES_DB_<ALIAS> on POSTGRES_HOST_<ALIAS>.
+DATABASE_SHARDS = ['default']
+
+for alias in filter(None, (name.strip() for name in os.environ.get('DATABASE_SHARDS', '').split(','))):
+    if DATABASE_ENGINE == 'postgresql':
+        DATABASES[alias] = {
+            **DATABASES['default'],
+            'NAME': os.environ.get(f'POSTGRES_DB_{alias.upper()}', f"{DATABASES['default']['NAME']}_{alias}"),
+            'HOST': os.environ.get(f'POSTGRES_HOST_{alias.upper()}', DATABASES['default']['HOST']),
+        }
+    else:
+        DATABASES[alias] = {**DATABASES['default'], 'NAME': BASE_DIR / f'{alias}.sqlite3'}
+    DATABASE_SHARDS.append(alias)
+
+# How long each process uses its copy of an owner's shard directory entry
+# before reading it again; move_owner_shard waits this long for other
+# processes to see a move
+SHARD_DIRECTORY_CHECK_SECONDS = float(os.environ.get('SHARD_DIRECTORY_CHECK_SECONDS', 1))
+
+DATABASE_ROUTERS = ['estate_sentry.sharding.OwnerShardRouter', 'estate_sentry.db_routers.ReplicaRouter']
+
+# Read-your-writes window after a user's last write. The pin lives in the
+# default cache, so multi-process servers need a shared cache backend.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Default cache. The local-memory default is per process; set CACHE_BACKEND
+# (e.g. django.core.cache.backends.redis.RedisCache) and CACHE_LOCATION to
+# share it between server processes and workers.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+SHARED_CACHE = CACHE_BACKEND not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Per-user response cache for sensor and alert reads (estate_sentry/response_cache.py).
+# 0 disables it. Data versions and responses live in the default cache; the
+# bounded local-memory cache is a per-process L1 in front of it. Off unless
+# the default cache is shared, since workers' invalidations would not reach
+# the web processes otherwise.
+RESPONSE_CACHE_SECONDS = int(os.environ.get('RESPONSE_CACHE_SECONDS', 300 if SHARED_CACHE else 0))
+RESPONSE_CACHE_LOCAL_ENTRIES = int(os.environ.get('RESPONSE_CACHE_LOCAL_ENTRIES', 1000))
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    },
+    'responses-local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses-local',
+        'OPTIONS': {'MAX_ENTRIES': RESPONSE_CACHE_LOCAL_ENTRIES},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -147,6 +322,64 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Camera frame uploads (stored under MEDIA_ROOT/frames by content hash)
+CAMERA_FRAME_MAX_BYTES = int(os.environ.get('CAMERA_FRAME_MAX_BYTES', 10 * 1024 * 1024))
+# Frames within this many bits (of 64) of the last kept frame are near-duplicates
+CAMERA_FRAME_DUPLICATE_DISTANCE = int(os.environ.get('CAMERA_FRAME_DUPLICATE_DISTANCE', 5))
+# Keep one near-duplicate frame per camera every this many seconds
+CAMERA_FRAME_KEEP_INTERVAL = int(os.environ.get('CAMERA_FRAME_KEEP_INTERVAL', 60))
+# Disk budget for generated thumbnails/renditions (least recently used evicted first)
+CAMERA_RENDITION_CACHE_BYTES = int(os.environ.get('CAMERA_RENDITION_CACHE_BYTES', 512 * 1024 * 1024))
+
+# Alert consumers (notifications, webhooks) only read alerts at least this
+# old, so slow transactions cannot commit behind their cursor
+ALERT_FEED_SETTLE_SECONDS = float(os.environ.get('ALERT_FEED_SETTLE_SECONDS', 2))
+
+# Notifications (python manage.py run_notifications)
+# Enabled channels: email, sms, console, file
+NOTIFICATION_CHANNELS = [
+    name.strip() for name in os.environ.get('NOTIFICATION_CHANNELS', 'console').split(',') if name.strip()
+]
+# Alerts arriving within this many seconds are sent as one digest
+NOTIFICATION_DIGEST_SECONDS = int(os.environ.get('NOTIFICATION_DIGEST_SECONDS', 10))
+# Minimum seconds between messages to a user on one channel (CRITICAL alerts bypass this)
+NOTIFICATION_MIN_INTERVAL = int(os.environ.get('NOTIFICATION_MIN_INTERVAL', 300))
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 6))
+NOTIFICATION_RETRY_BASE_SECONDS = int(os.environ.get('NOTIFICATION_RETRY_BASE_SECONDS', 30))
+NOTIFICATION_SMS_GATEWAY_URL = os.environ.get('NOTIFICATION_SMS_GATEWAY_URL', 'http://localhost:9090/sms')
+NOTIFICATION_SMS_GATEWAY_TOKEN = os.environ.get('NOTIFICATION_SMS_GATEWAY_TOKEN', '')
+NOTIFICATION_FILE_PATH = os.environ.get('NOTIFICATION_FILE_PATH', BASE_DIR / 'notifications.jsonl')
+
+# Escalation of unacknowledged alerts (python manage.py run_escalations)
+# Severities that escalate
+ESCALATION_SEVERITIES = [
+    name.strip() for name in os.environ.get('ESCALATION_SEVERITIES', 'HIGH,CRITICAL').split(',') if name.strip()
+]
+# Seconds before each step: the first counted from the alert, the rest from the previous step
+ESCALATION_DELAYS = [
+    int(delay) for delay in os.environ.get('ESCALATION_DELAYS', '300,900').split(',') if delay.strip()
+]
+
+# Email (used by the email notification channel)
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'alerts@estate-sentry.local')
+
+# Outbound webhooks (python manage.py run_webhooks)
+# Requests in flight across all subscriptions, and open connections per endpoint host
+WEBHOOK_CONCURRENCY = int(os.environ.get('WEBHOOK_CONCURRENCY', 50))
+WEBHOOK_MAX_CONNECTIONS_PER_HOST = int(os.environ.get('WEBHOOK_MAX_CONNECTIONS_PER_HOST', 4))
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', 10))
+# Failed deliveries are retried with jittered backoff, then moved to the dead-letter table
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 8))
+WEBHOOK_RETRY_BASE_SECONDS = int(os.environ.get('WEBHOOK_RETRY_BASE_SECONDS', 10))
+# Webhook URLs must resolve to public addresses unless this is set (local development only)
+WEBHOOK_ALLOW_PRIVATE_NETWORKS = os.environ.get('WEBHOOK_ALLOW_PRIVATE_NETWORKS', 'False') == 'True'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -156,6 +389,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'authentication.User'
 
 # Django REST Framework
+# Compact binary request/response formats (application/msgpack, application/cbor),
+# registered when their optional libraries are installed
+BINARY_API_FORMATS = [
+    name for name, module in (('MessagePack', 'msgpack'), ('CBOR', 'cbor2'))
+    if importlib.util.find_spec(module)
+]
+
+# Serve reading and alert lists from values() rows instead of ModelSerializers
+# (estate_sentry/fast_serializers.py); the output is identical
+FAST_READ_SERIALIZATION = os.environ.get('FAST_READ_SERIALIZATION', 'True') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -166,8 +410,15 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        *[f'estate_sentry.formats.{name}Parser' for name in BINARY_API_FORMATS],
+    ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'estate_sentry.fast_serializers.FastJSONRenderer',
+        *[f'estate_sentry.formats.{name}Renderer' for name in BINARY_API_FORMATS],
     ],
 }
 
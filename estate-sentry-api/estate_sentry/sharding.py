@@ -0,0 +1,400 @@
+"""
+Owner-based horizontal sharding (optional).
+
+With more than one alias in DATABASE_SHARDS, each owner's sensors, readings,
+camera frames and alerts live together on one shard. Users, tokens,
+notifications, webhooks and the shard directory stay on 'default'; a shard
+also keeps copies of its owners' user rows, which its foreign keys point at.
+
+An owner's shard is recorded in the OwnerShard directory the first time it
+is needed: owners who already have data on 'default' stay there, new owners
+are placed by a stable hash of their id. Each process keeps a copy of the
+entries it uses and re-reads one (a primary-key query) when it is older
+than SHARD_DIRECTORY_CHECK_SECONDS, so every process sees a move within that
+time. move_owner() relocates an owner and updates the entry.
+
+Queries for sharded models go to the shard active in the current context.
+Views opt in with OwnerShardMixin; background code wraps its work in
+use_shard() or use_owner_shard(). Without one, they follow the database of
+the instance they relate to, and otherwise 'default'.
+
+Each shard hands out ids from its own block of SHARD_ID_BLOCK, so ids stay
+unique across shards and moved rows keep them (devices address sensors by
+id).
+"""
+import contextvars
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+SHARDED_MODELS = {
+    'sensors.zone', 'sensors.armingversion', 'sensors.sensor', 'sensors.sensorreading', 'sensors.cameraframe',
+    'alerts.alert',
+}
+
+# Ids of the shard at position i in DATABASE_SHARDS start above i * SHARD_ID_BLOCK
+SHARD_ID_BLOCK = 2 ** 40
+
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+
+
+class OwnerMoving(APIException):
+    """The owner's data is being moved to another shard; writes must wait."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your data is being moved. Try again shortly.'
+    default_code = 'owner_moving'
+
+
+def shard_aliases():
+    return settings.DATABASE_SHARDS
+
+
+def sharding_enabled():
+    return len(shard_aliases()) > 1
+
+
+def hash_shard(owner_id):
+    """The shard a new owner is placed on: stable while DATABASE_SHARDS is unchanged."""
+    aliases = shard_aliases()
+    return aliases[zlib.crc32(str(owner_id).encode()) % len(aliases)]
+
+
+def has_default_data(owner_id):
+    """Whether the owner has sensors or alerts on 'default' (from before sharding)."""
+    Sensor = apps.get_model('sensors', 'Sensor')
+    Alert = apps.get_model('alerts', 'Alert')
+    return (
+        Sensor.objects.using('default').filter(owner_id=owner_id).exists()
+        or Alert.objects.using('default').filter(user_id=owner_id).exists()
+    )
+
+
+def directory_entry(owner_id):
+    """
+    The owner's (alias, moving) directory entry, assigning a shard to an
+    owner seen for the first time.
+    """
+    OwnerShard = apps.get_model('authentication', 'OwnerShard')
+    row = OwnerShard.objects.filter(user_id=owner_id).values_list('alias', 'moving').first()
+    if row is None:
+        alias = 'default' if has_default_data(owner_id) else hash_shard(owner_id)
+        if alias != 'default':
+            copy_user(owner_id, alias)
+        shard, _ = OwnerShard.objects.get_or_create(user_id=owner_id, defaults={'alias': alias})
+        row = (shard.alias, shard.moving)
+    return tuple(row)
+
+
+class OwnerDirectory:
+    """Per-process copy of the directory entries in use."""
+
+    def __init__(self):
+        # owner id -> (alias, moving, checked)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def entry(self, owner_id):
+        cached = self._entries.get(owner_id)
+        if cached is not None and time.monotonic() - cached[2] < settings.SHARD_DIRECTORY_CHECK_SECONDS:
+            return cached[:2]
+        alias, moving = directory_entry(owner_id)
+        with self._lock:
+            self._entries[owner_id] = (alias, moving, time.monotonic())
+        return alias, moving
+
+    def discard(self, owner_id):
+        with self._lock:
+            self._entries.pop(owner_id, None)
+
+    def forget(self):
+        with self._lock:
+            self._entries.clear()
+
+
+owner_directory = OwnerDirectory()
+
+
+def shard_for_owner(owner_id, for_write=False):
+    """
+    The alias holding an owner's data.
+
+    Raises:
+        OwnerMoving: when writing while the owner is being moved
+    """
+    if not sharding_enabled():
+        return 'default'
+    alias, moving = owner_directory.entry(owner_id)
+    if moving and for_write:
+        raise OwnerMoving()
+    return alias
+
+
+def copy_user(user_id, alias):
+    """Create or refresh the copy of a user row on a shard."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    user = User.objects.using('default').filter(pk=user_id).first()
+    if user is not None:
+        sync_user(user, alias)
+
+
+def sync_user(user, alias):
+    fields = {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields if not field.primary_key
+    }
+    type(user)._base_manager.using(alias).update_or_create(pk=user.pk, defaults=fields)
+
+
+def sync_user_copy(user):
+    """Bring the shard copy of a user saved on 'default' up to date."""
+    if not sharding_enabled():
+        return
+    OwnerShard = apps.get_model('authentication', 'OwnerShard')
+    alias = OwnerShard.objects.filter(user_id=user.pk).values_list('alias', flat=True).first()
+    if alias not in (None, 'default'):
+        sync_user(user, alias)
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+@contextmanager
+def use_shard(alias):
+    """Route sharded models' queries in the enclosed block to a shard."""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+@contextmanager
+def use_owner_shard(owner_id, for_write=False):
+    """Route sharded models' queries in the enclosed block to an owner's shard."""
+    with use_shard(shard_for_owner(owner_id, for_write)) as alias:
+        yield alias
+
+
+def owner_id_of(instance):
+    """The owner of a user, sensor or alert instance, or None."""
+    if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+        return instance.pk
+    return getattr(instance, 'owner_id', None) or getattr(instance, 'user_id', None)
+
+
+class OwnerShardRouter:
+    """Send sharded models to the current or related owner's shard; run before ReplicaRouter."""
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints.get('instance'))
+
+    def _db_for(self, model, instance):
+        if not sharding_enabled():
+            return None
+        if model._meta.label_lower not in SHARDED_MODELS:
+            # Related lookups from a shard's rows (sensor.owner) read 'default', not the copy
+            if instance is not None and instance._state.db != 'default' and instance._state.db in shard_aliases():
+                return 'default'
+            return None
+        alias = current_shard() or self.shard_of(instance)
+        # 'default' is left to the next router, so replicas still serve it
+        return alias if alias != 'default' else None
+
+    @staticmethod
+    def shard_of(instance):
+        if instance is None:
+            return None
+        if instance._meta.label_lower in SHARDED_MODELS and instance._state.db in shard_aliases():
+            return instance._state.db
+        sensor_field = instance._meta.get_field('sensor') if hasattr(instance, 'sensor_id') else None
+        if sensor_field is not None and sensor_field.is_cached(instance):
+            return OwnerShardRouter.shard_of(sensor_field.get_cached_value(instance))
+        owner_id = owner_id_of(instance)
+        return shard_for_owner(owner_id) if owner_id is not None else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding_enabled():
+            return None
+        labels = {obj1._meta.label_lower, obj2._meta.label_lower}
+        if settings.AUTH_USER_MODEL.lower() in labels:
+            return True
+        if labels <= SHARDED_MODELS:
+            return obj1._state.db == obj2._state.db
+        if labels & SHARDED_MODELS:
+            # Rows on 'default' (deliveries, deadlines) refer to alerts by id, without a constraint
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class OwnerShardMixin:
+    """
+    View mixin that routes the request's sharded queries to the user's shard.
+
+    Unsafe requests are refused with 503 while the user's data is moving.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if sharding_enabled() and request.user.is_authenticated:
+            alias = shard_for_owner(request.user.pk, for_write=request.method not in SAFE_METHODS)
+            self._shard_token = _current_shard.set(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shard_token', None)
+        if token is not None:
+            _current_shard.reset(token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+# Ids
+
+def reserve_id_ranges(using, **kwargs):
+    """
+    post_migrate handler: start each sharded table's ids at its shard's
+    block, so rows never share an id with rows on another shard.
+    """
+    if using not in shard_aliases():
+        return
+    start = shard_aliases().index(using) * SHARD_ID_BLOCK
+    if not start:
+        return
+    connection = connections[using]
+    models = [apps.get_model(label) for label in sorted(SHARDED_MODELS)]
+    # Tables keyed by another row (e.g. the owner) have no sequence
+    tables = [model._meta.db_table for model in models if model._meta.pk.get_internal_type().endswith('AutoField')]
+    with connection.cursor() as cursor:
+        for table in tables:
+            if connection.vendor == 'sqlite':
+                cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s', [start, table, start])
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, start, table],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f'SELECT last_value FROM {sequence}')
+                if cursor.fetchone()[0] < start:
+                    cursor.execute('SELECT setval(%s, %s)', [sequence, start])
+
+
+# Moving owners
+
+# Copied parents first; each model with the lookup that selects an owner's rows
+MOVE_ORDER = [
+    ('sensors.zone', 'owner_id'),
+    ('sensors.armingversion', 'owner_id'),
+    ('sensors.sensor', 'owner_id'),
+    ('sensors.sensorreading', 'sensor__owner_id'),
+    ('sensors.cameraframe', 'sensor__owner_id'),
+    ('alerts.alert', 'user_id'),
+]
+
+
+def check_move(source, target):
+    """
+    Raise ValueError if rows cannot move from source to target.
+
+    SQLite numbers new rows after the largest id in the table, so rows
+    moved to a shard listed earlier would push its ids into the source's
+    block. PostgreSQL sequences are unaffected.
+    """
+    aliases = shard_aliases()
+    if target not in aliases:
+        raise ValueError(f"'{target}' is not in DATABASE_SHARDS")
+    if source == target:
+        raise ValueError(f"The owner is already on '{target}'")
+    if aliases.index(target) < aliases.index(source) and connections[target].vendor == 'sqlite':
+        raise ValueError(f"SQLite shards only accept owners from shards listed before them, not '{source}'")
+
+
+def move_owner(owner_id, target, chunk_size=2000, wait=5.0):
+    """
+    Move an owner's sensors, readings, frames and alerts to another shard.
+
+    The owner is marked as moving first: writes get 503 (API) or fail and
+    are retried (gateway) until the move finishes. Other processes may use
+    their copy of the directory entry for SHARD_DIRECTORY_CHECK_SECONDS
+    more, so the move waits that long plus `wait` seconds for requests
+    already in progress to complete. Rows are copied with their ids
+    in one transaction on the target, the directory is switched, then the
+    rows are deleted from the source.
+
+    Returns:
+        Dict with the source alias and the number of rows moved per model
+    """
+    OwnerShard = apps.get_model('authentication', 'OwnerShard')
+    source = shard_for_owner(owner_id)
+    check_move(source, target)
+    OwnerShard.objects.filter(user_id=owner_id).update(moving=True)
+    owner_directory.discard(owner_id)
+    try:
+        time.sleep(settings.SHARD_DIRECTORY_CHECK_SECONDS + wait)
+        copy_user(owner_id, target)
+        moved = copy_owner_rows(owner_id, source, target, chunk_size)
+        OwnerShard.objects.filter(user_id=owner_id).update(alias=target, updated_at=timezone.now())
+    finally:
+        OwnerShard.objects.filter(user_id=owner_id).update(moving=False)
+        owner_directory.discard(owner_id)
+    delete_owner_rows(owner_id, source, chunk_size)
+    return {'source': source, 'moved': moved}
+
+
+def copy_owner_rows(owner_id, source, target, chunk_size):
+    Sensor = apps.get_model('sensors', 'Sensor')
+    moved = {}
+    with transaction.atomic(using=target):
+        last_readings = {}
+        for label, lookup in MOVE_ORDER:
+            model = apps.get_model(label)
+            rows = model._base_manager.using(source).filter(**{lookup: owner_id}).order_by('pk')
+            batch, moved[label] = [], 0
+            for row in rows.iterator(chunk_size=chunk_size):
+                if label == 'sensors.sensor':
+                    # Readings are not there yet; pointed at them afterwards
+                    last_readings[row.pk], row.last_reading_id = row.last_reading_id, None
+                if label == 'alerts.alert' and row.acknowledged_by_id not in (None, owner_id):
+                    copy_user(row.acknowledged_by_id, target)
+                batch.append(row)
+                if len(batch) == chunk_size:
+                    moved[label] += len(model._base_manager.using(target).bulk_create(batch))
+                    batch = []
+            moved[label] += len(model._base_manager.using(target).bulk_create(batch))
+        for sensor_id, reading_id in last_readings.items():
+            if reading_id is not None:
+                Sensor._base_manager.using(target).filter(pk=sensor_id).update(last_reading_id=reading_id)
+    return moved
+
+
+def delete_owner_rows(owner_id, source, chunk_size):
+    """Delete a moved owner's rows from the source shard, children first."""
+    apps.get_model('sensors', 'Sensor')._base_manager.using(source).filter(owner_id=owner_id).update(
+        last_reading=None
+    )
+    for label, lookup in reversed(MOVE_ORDER):
+        model = apps.get_model(label)
+        rows = model._base_manager.using(source).filter(**{lookup: owner_id})
+        while True:
+            ids = list(rows.values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            model._base_manager.using(source).filter(pk__in=ids).delete()
@@ -9,4 +9,6 @@ urlpatterns = [
     path('api/auth/', include('authentication.urls')),
     path('api/', include('sensors.urls')),
     path('api/', include('alerts.urls')),
+    path('api/', include('webhooks.urls')),
+    path('', include('monitoring.urls')),
 ]
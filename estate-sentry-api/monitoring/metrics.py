@@ -0,0 +1,491 @@
+"""
+Low-overhead in-process metrics with Prometheus text exposition.
+
+Counters and histograms keep their samples in a value store. By default the
+store is a plain in-process dict. When METRICS_MULTIPROCESS_DIR is set, each
+process writes its samples to its own memory-mapped file in that directory
+instead, and /metrics sums the files of all processes, so counts are
+correct behind multi-process servers (gunicorn, uwsgi).
+"""
+import bisect
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+class LocalStore:
+    """Sample values for the current process only."""
+
+    def __init__(self):
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] += amount
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class MmapStore:
+    """
+    Sample values in a memory-mapped file owned by one process.
+
+    Layout: an 8-byte header holding the number of used bytes, followed by
+    entries of [uint32 key length][utf-8 key padded to 8 bytes][float64].
+    Values are updated in place, so increments never rewrite the file.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._positions = {}
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'a+b')
+        if not exists:
+            self._file.truncate(self.INITIAL_SIZE)
+        self._capacity = os.path.getsize(path)
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        if not exists:
+            struct.pack_into('Q', self._map, 0, 8)
+
+        for key, _, position in self._entries(self._map):
+            self._positions[key] = position
+
+    @staticmethod
+    def _entries(buffer):
+        used = struct.unpack_from('Q', buffer, 0)[0]
+        offset = 8
+        while offset < used:
+            length = struct.unpack_from('I', buffer, offset)[0]
+            key_start = offset + 4
+            key = bytes(buffer[key_start:key_start + length]).decode('utf-8')
+            value_at = key_start + length + (-(4 + length) % 8)
+            yield key, struct.unpack_from('d', buffer, value_at)[0], value_at
+            offset = value_at + 8
+
+    def _allocate(self, key):
+        encoded = key.encode('utf-8')
+        padding = -(4 + len(encoded)) % 8
+        size = 4 + len(encoded) + padding + 8
+        used = struct.unpack_from('Q', self._map, 0)[0]
+
+        if used + size > self._capacity:
+            capacity = self._capacity
+            while used + size > capacity:
+                capacity *= 2
+            self._map.close()
+            self._file.truncate(capacity)
+            self._capacity = capacity
+            self._map = mmap.mmap(self._file.fileno(), capacity)
+
+        struct.pack_into(f'I{len(encoded)}s{padding}xd', self._map, used, len(encoded), encoded, 0.0)
+        # Publish the entry only once it is fully written.
+        struct.pack_into('Q', self._map, 0, used + size)
+        position = used + 4 + len(encoded) + padding
+        self._positions[key] = position
+        return position
+
+    def inc(self, key, amount):
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._allocate(key)
+            value = struct.unpack_from('d', self._map, position)[0]
+            struct.pack_into('d', self._map, position, value + amount)
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, value, _ in self._entries(self._map)]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def read_multiprocess_dir(directory):
+    """Sum sample values across all process files in a directory."""
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(directory, 'metrics-*.db')):
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        if len(data) < 8:
+            continue
+        for key, value, _ in MmapStore._entries(data):
+            totals[key] += value
+    return list(totals.items())
+
+
+class _StoreHolder:
+    """Lazily opens the right store, and reopens it after fork()."""
+
+    def __init__(self):
+        self._store = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+
+    def get(self):
+        pid = os.getpid()
+        if self._store is None or self._pid != pid:
+            with self._lock:
+                if self._store is None or self._pid != pid:
+                    directory = self.directory
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                        self._store = MmapStore(os.path.join(directory, f'metrics-{pid}.db'))
+                    else:
+                        self._store = LocalStore()
+                    self._pid = pid
+        return self._store
+
+    def collect(self):
+        directory = self.directory
+        if directory:
+            self.get()
+            return read_multiprocess_dir(directory)
+        return self.get().items()
+
+    def reset(self):
+        with self._lock:
+            if isinstance(self._store, MmapStore):
+                self._store.close()
+            self._store = None
+            self._pid = None
+
+
+store = _StoreHolder()
+
+
+def _key(name, suffix, labelvalues, extra=None):
+    return json.dumps([name, suffix, list(labelvalues), extra], separators=(',', ':'))
+
+
+class Metric:
+    """Base class for registered metrics."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        registry.register(self)
+
+    def labels(self, *labelvalues):
+        """Return the child metric for these label values (cached)."""
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._children_lock:
+                child = self._children.setdefault(
+                    labelvalues, self._make_child(tuple(str(value) for value in labelvalues))
+                )
+        return child
+
+    def _make_child(self, labelvalues):
+        raise NotImplementedError
+
+    def samples(self, values):
+        """Yield (sample name, labels dict, value) from collected store values."""
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ('_key',)
+
+    def __init__(self, key):
+        self._key = key
+
+    def inc(self, amount=1):
+        store.get().inc(self._key, amount)
+
+
+class Counter(Metric):
+    """Monotonically increasing count, exposed as <name>_total."""
+
+    type = 'counter'
+
+    def _make_child(self, labelvalues):
+        return _CounterChild(_key(self.name, 'total', labelvalues))
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self, values):
+        for (suffix, labelvalues, _), value in values:
+            yield f"{self.name}_{suffix}", dict(zip(self.labelnames, labelvalues)), value
+
+
+class _HistogramChild:
+    __slots__ = ('_upper_bounds', '_bucket_keys', '_sum_key', '_count_key')
+
+    def __init__(self, name, labelvalues, upper_bounds):
+        self._upper_bounds = upper_bounds
+        self._bucket_keys = [_key(name, 'bucket', labelvalues, bound) for bound in upper_bounds]
+        self._sum_key = _key(name, 'sum', labelvalues)
+        self._count_key = _key(name, 'count', labelvalues)
+
+    def observe(self, value):
+        current = store.get()
+        current.inc(self._bucket_keys[bisect.bisect_left(self._upper_bounds, value)], 1)
+        current.inc(self._sum_key, value)
+        current.inc(self._count_key, 1)
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _make_child(self, labelvalues):
+        return _HistogramChild(self.name, labelvalues, self.upper_bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self, values):
+        series = defaultdict(lambda: {'buckets': defaultdict(float), 'sum': 0.0, 'count': 0.0})
+        for (suffix, labelvalues, bound), value in values:
+            entry = series[tuple(labelvalues)]
+            if suffix == 'bucket':
+                entry['buckets'][bound] += value
+            else:
+                entry[suffix] += value
+
+        for labelvalues, entry in sorted(series.items()):
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0.0
+            for bound in self.upper_bounds:
+                cumulative += entry['buckets'].get(bound, 0.0)
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, entry['sum']
+            yield f"{self.name}_count", labels, entry['count']
+
+
+class CallbackGauge(Metric):
+    """
+    Gauge whose value is computed when /metrics is scraped.
+
+    The callback returns either a number or a dict of label value tuples to
+    numbers. Nothing is stored, so it is cheap and multi-process safe. With
+    `cached`, a result is reused for METRICS_GAUGE_CACHE_SECONDS, for
+    callbacks that query the database.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, callback, labelnames=(), cached=False):
+        self.callback = callback
+        self.cached = cached
+        self._result = None
+        self._expires = 0.0
+        super().__init__(name, documentation, labelnames)
+
+    def _value(self):
+        if not self.cached:
+            return self.callback()
+        now = time.monotonic()
+        if now >= self._expires:
+            self._result = self.callback()
+            self._expires = now + settings.METRICS_GAUGE_CACHE_SECONDS
+        return self._result
+
+    def samples(self, values):
+        result = self._value()
+        if not isinstance(result, dict):
+            result = {(): result}
+        for labelvalues, value in sorted(result.items()):
+            yield self.name, dict(zip(self.labelnames, labelvalues)), value
+
+
+class Registry:
+    """Set of metrics rendered by the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        by_metric = defaultdict(list)
+        for key, value in store.collect():
+            name, suffix, labelvalues, extra = json.loads(key)
+            by_metric[name].append(((suffix, labelvalues, extra), value))
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for sample_name, labels, value in metric.samples(by_metric.get(name, [])):
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    rendered = ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        )
+        for name, value in labels.items()
+    )
+    return f"{{{rendered}}}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return f"{value:.1f}"
+    return repr(float(value))
+
+
+registry = Registry()
+
+
+def _unprocessed_readings():
+    from sensors.models import SensorReading
+    return SensorReading.objects.filter(processed=False).count()
+
+
+READINGS_INGESTED = Counter(
+    'estate_sentry_readings_ingested',
+    'Sensor readings accepted for storage.',
+    ['sensor_type'],
+)
+
+GATEWAY_FRAMES = Counter(
+    'estate_sentry_gateway_frames',
+    'Frames received by the TCP/UDP sensor gateway, per transport and outcome.',
+    ['transport', 'result'],
+)
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    'estate_sentry_response_cache_requests',
+    'Cacheable read requests, per view action and where they were answered from.',
+    ['view', 'result'],
+)
+
+READINGS_DEDUPLICATED = Counter(
+    'estate_sentry_readings_deduplicated',
+    'Retried reading submissions answered with the original reading, per lookup source.',
+    ['source'],
+)
+
+HANDLER_DURATION = Histogram(
+    'estate_sentry_handler_duration_seconds',
+    'Latency of sensor handler validate_reading/process_reading/detect_threats calls.',
+    ['handler', 'method'],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1),
+)
+
+DETECTIONS_SUPPRESSED = Counter(
+    'estate_sentry_detections_suppressed',
+    'Readings whose threat detection was skipped because their zone was disarmed, per sensor type and mode.',
+    ['sensor_type', 'mode'],
+)
+
+ALERTS_CREATED = Counter(
+    'estate_sentry_alerts_created',
+    'Alerts created by threat detection.',
+    ['alert_type', 'severity'],
+)
+
+UNPROCESSED_READINGS = CallbackGauge(
+    'estate_sentry_unprocessed_readings',
+    'Readings not yet processed for threat detection.',
+    _unprocessed_readings,
+    cached=True,
+)
+
+REQUEST_DURATION = Histogram(
+    'estate_sentry_request_duration_seconds',
+    'HTTP request latency per view.',
+    ['view', 'method'],
+)
+
+DB_QUERY_DURATION = Histogram(
+    'estate_sentry_db_query_duration_seconds',
+    'Total database query time per request, per view.',
+    ['view'],
+)
+
+DB_QUERIES = Counter(
+    'estate_sentry_db_queries',
+    'Database queries executed, per view.',
+    ['view'],
+)
+
+NOTIFICATIONS_SENT = Counter(
+    'estate_sentry_notifications_sent',
+    'Notification send attempts, per channel and outcome.',
+    ['channel', 'result'],
+)
+
+ALERT_ESCALATIONS = Counter(
+    'estate_sentry_alert_escalations',
+    'Escalation steps taken for unacknowledged alerts, per step.',
+    ['level'],
+)
+
+NOTIFICATION_SEND_DURATION = Histogram(
+    'estate_sentry_notification_send_duration_seconds',
+    'Mean time to send one notification in a channel batch.',
+    ['channel'],
+)
+
+WEBHOOKS_SENT = Counter(
+    'estate_sentry_webhooks_sent',
+    'Webhook delivery attempts, per outcome.',
+    ['result'],
+)
+
+WEBHOOK_SEND_DURATION = Histogram(
+    'estate_sentry_webhook_send_duration_seconds',
+    'Time to POST one webhook and read the response.',
+)
@@ -0,0 +1,145 @@
+"""
+Request profiling middleware.
+
+Enabled with REQUEST_PROFILING=True. Every response gets a Server-Timing
+header with SQL count/time, authentication, view, serializer, sensor
+handler and rendering time. A fraction of requests (and optionally every
+request slower than a threshold) is also profiled and dumped to disk.
+"""
+import cProfile
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from .metrics import DB_QUERIES, DB_QUERY_DURATION, REQUEST_DURATION
+from .profiling import (
+    QueryTimer,
+    RequestProfile,
+    activate,
+    deactivate,
+    install_drf_hooks,
+    stack_sampler,
+    timed_queries,
+)
+
+SLUG_RE = re.compile(r'[^A-Za-z0-9]+')
+
+
+class ProfilingMiddleware:
+    """
+    Collect per-request timings and write sampled profiles.
+
+    Settings:
+        REQUEST_PROFILING_SAMPLE_RATE: Fraction of requests to profile (0-1)
+        REQUEST_PROFILING_SLOW_MS: Also dump stack samples for any request
+            slower than this many milliseconds (0 disables)
+        REQUEST_PROFILING_PROFILER: 'cprofile' or 'stack' for sampled requests
+        REQUEST_PROFILING_DIR: Directory profiles are written to
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+        self.slow_ms = settings.REQUEST_PROFILING_SLOW_MS
+        self.profiler = settings.REQUEST_PROFILING_PROFILER
+        self.output_dir = Path(settings.REQUEST_PROFILING_DIR)
+        install_drf_hooks()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        request._profile = profile
+        token = activate(profile)
+
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        profiler = None
+        samples = None
+        thread_id = threading.get_ident()
+
+        if sampled and self.profiler == 'cprofile':
+            profiler = cProfile.Profile()
+        elif sampled or self.slow_ms:
+            samples = stack_sampler.start(thread_id)
+
+        try:
+            with timed_queries(profile.queries):
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+                    if samples is not None:
+                        stack_sampler.stop(thread_id)
+        finally:
+            deactivate(token)
+
+        finished = time.perf_counter()
+        total = finished - profile.started
+        if profile.view_started is not None and 'view' not in profile.sections:
+            profile.add('view', (profile.view_finished or finished) - profile.view_started)
+        response['Server-Timing'] = profile.server_timing(total)
+
+        slow = self.slow_ms and total * 1000 >= self.slow_ms
+        if profiler is not None:
+            self._dump(request, total, 'prof', profiler.dump_stats)
+        elif samples and (sampled or slow):
+            self._dump(request, total, 'folded', lambda path: self._write_folded(path, samples))
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profile.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        profile = request._profile
+        profile.view_finished = time.perf_counter()
+        if profile.view_started is not None:
+            profile.add('view', profile.view_finished - profile.view_started)
+
+        def rendered(response):
+            profile.add('render', time.perf_counter() - profile.view_finished)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def _dump(self, request, total, extension, write):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        slug = SLUG_RE.sub('-', request.path).strip('-') or 'root'
+        name = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{request.method}-{slug}-{total * 1000:.0f}ms"
+            f"-{threading.get_ident()}.{extension}"
+        )
+        write(str(self.output_dir / name))
+
+    @staticmethod
+    def _write_folded(path, samples):
+        with open(path, 'w') as handle:
+            for stack, count in samples.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+class MetricsMiddleware:
+    """Record request latency and database time per view for /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with timed_queries(QueryTimer()) as queries:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        REQUEST_DURATION.labels(view, request.method).observe(elapsed)
+        DB_QUERY_DURATION.labels(view).observe(queries.duration)
+        if queries.count:
+            DB_QUERIES.labels(view).inc(queries.count)
+
+        return response
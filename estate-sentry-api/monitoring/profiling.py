@@ -0,0 +1,211 @@
+"""
+Per-request timing and sampled profiling.
+
+A RequestProfile is bound to the current request (via a context variable)
+by ProfilingMiddleware. Code can attribute time to named sections with
+`span()`, which is a no-op when no profile is active.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_current_profile = contextvars.ContextVar('request_profile', default=None)
+
+# Server-Timing metric name -> description
+SECTIONS = {
+    'auth': 'Authentication',
+    'handler': 'Sensor handlers',
+    'serialize': 'Serializers',
+    'view': 'View',
+    'render': 'Response rendering',
+}
+
+
+class RequestProfile:
+    """Timings collected for a single request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = QueryTimer()
+        self.sections = defaultdict(float)
+        self.view_started = None
+        self.view_finished = None
+
+    def add(self, name, seconds):
+        self.sections[name] += seconds
+
+    def server_timing(self, total):
+        """Format collected timings as a Server-Timing header value."""
+        metrics = [f'sql;dur={self.queries.duration * 1000:.2f};desc="{self.queries.count} queries"']
+        for name, description in SECTIONS.items():
+            if name in self.sections:
+                metrics.append(f'{name};dur={self.sections[name] * 1000:.2f};desc="{description}"')
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+def current_profile():
+    """Return the active RequestProfile, or None outside profiled requests."""
+    return _current_profile.get()
+
+
+def activate(profile):
+    return _current_profile.set(profile)
+
+
+def deactivate(token):
+    _current_profile.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Attribute the wall time of the enclosed block to `name`."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+class QueryTimer:
+    """Database execute wrapper that counts queries and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+@contextmanager
+def timed_queries(timer):
+    """Install `timer` as an execute wrapper on every database connection."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        yield timer
+
+
+_drf_hooks_installed = False
+_drf_hooks_lock = threading.Lock()
+
+
+def install_drf_hooks():
+    """
+    Time DRF authentication and serializer output as 'auth' and 'serialize'.
+
+    Wraps APIView.perform_authentication and BaseSerializer.data once per
+    process. The wrappers only cost a context variable lookup when no
+    profile is active.
+    """
+    global _drf_hooks_installed
+
+    with _drf_hooks_lock:
+        if _drf_hooks_installed:
+            return
+
+        from rest_framework.serializers import BaseSerializer
+        from rest_framework.views import APIView
+
+        perform_authentication = APIView.perform_authentication
+
+        def timed_perform_authentication(self, request):
+            with span('auth'):
+                return perform_authentication(self, request)
+
+        APIView.perform_authentication = timed_perform_authentication
+
+        data_getter = BaseSerializer.data.fget
+
+        def timed_data(self):
+            with span('serialize'):
+                return data_getter(self)
+
+        BaseSerializer.data = property(timed_data)
+        _drf_hooks_installed = True
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+def collapse_stack(frame):
+    """Return a stack as 'outer;...;inner' for flame graph tools."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Background thread that periodically samples the stacks of tracked threads.
+
+    Samples are aggregated into collapsed-stack counters, the format used by
+    flamegraph.pl and speedscope. The thread only wakes up while at least
+    one thread is tracked.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id):
+        """Start sampling a thread and return the counter its samples go into."""
+        samples = Counter()
+        with self._lock:
+            self._tracked[thread_id] = samples
+            self._active.set()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='request-stack-sampler', daemon=True
+                )
+                self._thread.start()
+        return samples
+
+    def stop(self, thread_id):
+        with self._lock:
+            samples = self._tracked.pop(thread_id, Counter())
+            if not self._tracked:
+                self._active.clear()
+        return samples
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                tracked = list(self._tracked.items())
+            if not tracked:
+                continue
+            frames = sys._current_frames()
+            for thread_id, samples in tracked:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[collapse_stack(frame)] += 1
+
+
+stack_sampler = StackSampler()
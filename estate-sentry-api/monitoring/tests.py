@@ -0,0 +1,218 @@
+import os
+import shutil
+import sys
+import tempfile
+
+from django.test import TestCase, modify_settings, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from authentication.models import User
+from sensors.models import Sensor, SensorReading
+from . import profiling
+from .metrics import MmapStore, READINGS_INGESTED, UNPROCESSED_READINGS, registry, store
+from .profiling import RequestProfile, collapse_stack
+
+
+@modify_settings(MIDDLEWARE={'prepend': 'monitoring.middleware.ProfilingMiddleware'})
+class ProfilingMiddlewareTestCase(TestCase):
+    """Test cases for the request profiling middleware."""
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+        self.user = User.objects.create_user(username='profiled', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Back Door', sensor_type='DOOR_CONTACT', location='Kitchen', owner=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def timings(self, response):
+        entries = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0.0, REQUEST_PROFILING_SLOW_MS=0)
+    def test_server_timing_header(self):
+        """Test responses report SQL, auth, handler, serializer and view timings."""
+        response = self.client.post(
+            f'/api/sensors/{self.sensor.id}/readings/', {'value': {'state': 'open'}}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        timings = self.timings(response)
+        self.assertGreater(int(timings['sql']['desc'].strip('"').split()[0]), 0)
+        for name in ['auth', 'handler', 'serialize', 'view', 'render', 'total']:
+            self.assertIn(name, timings)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_sampled_request_writes_cprofile_dump(self):
+        """Test sampled requests are written as cProfile stats."""
+        with self.settings(
+            REQUEST_PROFILING_SAMPLE_RATE=1.0,
+            REQUEST_PROFILING_PROFILER='cprofile',
+            REQUEST_PROFILING_DIR=self.profile_dir,
+        ):
+            self.client.get('/api/alerts/')
+
+        dumps = os.listdir(self.profile_dir)
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].endswith('.prof'))
+        self.assertIn('GET-api-alerts', dumps[0])
+
+    def test_slow_request_writes_stack_samples(self):
+        """Test requests over the latency threshold dump collapsed stacks."""
+        with self.settings(
+            REQUEST_PROFILING_SAMPLE_RATE=0.0,
+            REQUEST_PROFILING_SLOW_MS=0.001,
+            REQUEST_PROFILING_DIR=self.profile_dir,
+        ):
+            original = profiling.stack_sampler.interval
+            profiling.stack_sampler.interval = 0.0005
+            self.addCleanup(setattr, profiling.stack_sampler, 'interval', original)
+            for _ in range(5):
+                self.client.get('/api/alerts/statistics/')
+
+        dumps = [name for name in os.listdir(self.profile_dir) if name.endswith('.folded')]
+        self.assertTrue(dumps)
+        with open(os.path.join(self.profile_dir, dumps[0])) as handle:
+            stack, count = handle.readline().rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertFalse(profiling.stack_sampler._active.is_set())
+
+
+class RequestProfileTestCase(TestCase):
+    """Test cases for profile formatting helpers."""
+
+    def test_server_timing_format(self):
+        """Test Server-Timing values use milliseconds with descriptions."""
+        profile = RequestProfile()
+        profile.queries.count = 3
+        profile.queries.duration = 0.0125
+        profile.add('handler', 0.002)
+
+        header = profile.server_timing(0.05)
+
+        self.assertEqual(
+            header,
+            'sql;dur=12.50;desc="3 queries", handler;dur=2.00;desc="Sensor handlers", total;dur=50.00'
+        )
+
+    def test_collapse_stack(self):
+        """Test stacks are collapsed outermost-first."""
+        stack = collapse_stack(sys._getframe())
+        self.assertTrue(stack.endswith('monitoring.tests:test_collapse_stack'))
+
+
+def sample_value(text, sample):
+    """Return the value of an exact sample line from /metrics output."""
+    for line in text.splitlines():
+        name, _, value = line.rpartition(' ')
+        if name == sample:
+            return float(value)
+    return 0.0
+
+
+@override_settings(METRICS_ALLOW_UNAUTHENTICATED=True)
+class MetricsEndpointTestCase(TestCase):
+    """Test cases for the Prometheus metrics endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='metered', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Garage Door', sensor_type='DOOR_CONTACT', location='Garage', owner=self.user
+        )
+        self.client = APIClient()
+        # Gauges cached by earlier scrapes are recomputed
+        UNPROCESSED_READINGS._expires = 0.0
+
+    def scrape(self, **headers):
+        response = self.client.get('/metrics', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content.decode()
+
+    def test_ingest_and_detection_metrics(self):
+        """Test readings, handler latency, alerts and per-view DB time are exported."""
+        before = self.scrape()
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            f'/api/sensors/{self.sensor.id}/readings/', {'value': {'state': 'open'}}, format='json'
+        )
+        after = self.scrape()
+
+        for sample in [
+            'estate_sentry_readings_ingested_total{sensor_type="DOOR_CONTACT"}',
+            'estate_sentry_alerts_created_total{alert_type="DOOR_OPEN",severity="MEDIUM"}',
+            'estate_sentry_handler_duration_seconds_count{handler="ContactHandler",method="validate_reading"}',
+            'estate_sentry_handler_duration_seconds_count{handler="ContactHandler",method="detect_threats"}',
+            'estate_sentry_db_query_duration_seconds_count{view="sensors:sensor-readings"}',
+        ]:
+            self.assertEqual(sample_value(after, sample) - sample_value(before, sample), 1.0, sample)
+        self.assertIn('estate_sentry_unprocessed_readings 0.0', after)
+
+    @override_settings(METRICS_TOKEN='s3cret', METRICS_ALLOW_UNAUTHENTICATED=False)
+    def test_token_required_when_configured(self):
+        """Test /metrics requires the bearer token when METRICS_TOKEN is set."""
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.scrape(HTTP_AUTHORIZATION='Bearer s3cret')
+
+    @override_settings(METRICS_TOKEN=None, METRICS_ALLOW_UNAUTHENTICATED=False)
+    def test_refused_without_token(self):
+        """Test /metrics is refused when no token is configured outside development."""
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_GAUGE_CACHE_SECONDS=60)
+    def test_database_gauge_is_cached(self):
+        """Test the unprocessed-readings count is not recomputed on every scrape."""
+        self.assertIn('estate_sentry_unprocessed_readings 0.0', self.scrape())
+        SensorReading.objects.create(sensor=self.sensor, value={'state': 'open'}, processed=False)
+        with self.assertNumQueries(0):
+            self.assertIn('estate_sentry_unprocessed_readings 0.0', self.scrape())
+        UNPROCESSED_READINGS._expires = 0.0
+        self.assertIn('estate_sentry_unprocessed_readings 1.0', self.scrape())
+
+
+class MultiprocessStoreTestCase(TestCase):
+    """Test cases for aggregating metrics across worker processes."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        override = override_settings(METRICS_MULTIPROCESS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        store.reset()
+        self.addCleanup(store.reset)
+
+    def test_values_are_summed_across_process_files(self):
+        """Test samples written by several processes are aggregated on scrape."""
+        READINGS_INGESTED.labels('CAMERA').inc(2)
+        other_worker = MmapStore(os.path.join(self.directory, 'metrics-999999.db'))
+        self.addCleanup(other_worker.close)
+        other_worker.inc(READINGS_INGESTED.labels('CAMERA')._key, 3)
+
+        output = registry.render()
+
+        self.assertEqual(
+            sample_value(output, 'estate_sentry_readings_ingested_total{sensor_type="CAMERA"}'), 5.0
+        )
+
+    def test_store_grows_and_reopens(self):
+        """Test the mapped file grows past its initial size and can be reopened."""
+        path = os.path.join(self.directory, 'metrics-1.db')
+        worker = MmapStore(path)
+        for index in range(2000):
+            worker.inc(f'key-{index:05d}-' + 'x' * 40, index)
+        worker.close()
+
+        reopened = MmapStore(path)
+        self.addCleanup(reopened.close)
+        reopened.inc('key-01999-' + 'x' * 40, 1)
+
+        values = dict(reopened.items())
+        self.assertEqual(len(values), 2000)
+        self.assertEqual(values['key-01999-' + 'x' * 40], 2000.0)
+        self.assertGreater(os.path.getsize(path), MmapStore.INITIAL_SIZE)
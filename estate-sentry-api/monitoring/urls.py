@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import metrics
+
+app_name = 'monitoring'
+
+urlpatterns = [
+    path('metrics', metrics, name='metrics'),
+]
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from .metrics import registry
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """
+    Expose metrics in the Prometheus text format.
+    GET /metrics
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.METRICS_ALLOW_UNAUTHENTICATED:
+            return HttpResponse(status=403)
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse(status=401)
+
+    return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
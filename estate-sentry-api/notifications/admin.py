@@ -0,0 +1,35 @@
+from django.contrib import admin
+from estate_sentry.admin_tools import LargeTableAdmin
+from .models import EscalationContact, EscalationDeadline, NotificationMessage
+
+
+@admin.register(NotificationMessage)
+class NotificationMessageAdmin(LargeTableAdmin):
+    """Admin configuration for NotificationMessage model."""
+
+    keyset_field = 'created_at'
+    list_display = ['user', 'contact', 'channel', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'channel']
+    list_select_related = ['user', 'contact']
+    search_fields = ['=user__username']
+    autocomplete_fields = ['user', 'contact']
+    readonly_fields = ['alert_ids', 'attempts', 'last_error', 'created_at', 'sent_at']
+
+
+@admin.register(EscalationContact)
+class EscalationContactAdmin(admin.ModelAdmin):
+    """Admin configuration for EscalationContact model."""
+
+    list_display = ['name', 'user', 'email', 'phone_number', 'level', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['name', '=user__username']
+    autocomplete_fields = ['user']
+
+
+@admin.register(EscalationDeadline)
+class EscalationDeadlineAdmin(admin.ModelAdmin):
+    """Admin configuration for EscalationDeadline model."""
+
+    list_display = ['alert', 'level', 'due_at']
+    ordering = ['due_at']
+    raw_id_fields = ['alert']
@@ -0,0 +1,189 @@
+"""
+Notification delivery channels.
+
+A channel decides which users it can reach (`accepts`) and sends a batch of
+rendered messages (`send_many`), reusing one connection for the batch where
+the transport allows it. Channels are enabled by name in
+NOTIFICATION_CHANNELS.
+"""
+import http.client
+import json
+import sys
+import threading
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+
+class ChannelError(Exception):
+    """A message could not be delivered (and should be retried)."""
+
+
+class Channel:
+    """Base class for notification channels."""
+
+    name = None
+
+    def accepts(self, user):
+        """Return True if this channel can reach the user."""
+        return True
+
+    def send(self, user, subject, body):
+        raise NotImplementedError
+
+    def send_many(self, items):
+        """
+        Send (user, subject, body) items.
+
+        Returns:
+            One entry per item: None on success, or the exception raised
+        """
+        results = []
+        for user, subject, body in items:
+            try:
+                self.send(user, subject, body)
+                results.append(None)
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    def close(self):
+        pass
+
+
+class EmailChannel(Channel):
+    """Email through Django's configured EMAIL_BACKEND, one connection per batch."""
+
+    name = 'email'
+
+    def accepts(self, user):
+        return bool(user.email)
+
+    def send_many(self, items):
+        try:
+            connection = get_connection()
+            connection.open()
+        except Exception as exc:
+            # Connecting or logging in to the SMTP server failed: retry the whole batch
+            return [exc] * len(items)
+
+        results = []
+        try:
+            for user, subject, body in items:
+                try:
+                    EmailMessage(
+                        subject, body, settings.DEFAULT_FROM_EMAIL, [user.email], connection=connection
+                    ).send()
+                    results.append(None)
+                except Exception as exc:
+                    results.append(exc)
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        return results
+
+
+class SMSGatewayChannel(Channel):
+    """
+    SMS through an HTTP gateway: POST {"to": ..., "message": ...} as JSON to
+    NOTIFICATION_SMS_GATEWAY_URL, over one keep-alive connection per batch.
+    """
+
+    name = 'sms'
+
+    def __init__(self, url=None, token=None, timeout=10):
+        self.url = urlsplit(url or settings.NOTIFICATION_SMS_GATEWAY_URL)
+        self.token = token if token is not None else settings.NOTIFICATION_SMS_GATEWAY_TOKEN
+        self.timeout = timeout
+
+    def accepts(self, user):
+        return bool(user.phone_number)
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.url.netloc, timeout=self.timeout)
+
+    def send_many(self, items):
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        path = self.url.path or '/'
+
+        results = []
+        connection = self._connect()
+        try:
+            for user, subject, body in items:
+                payload = json.dumps({'to': user.phone_number, 'message': subject})
+                try:
+                    connection.request('POST', path, body=payload, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status >= 300:
+                        raise ChannelError(f"SMS gateway returned {response.status}")
+                    results.append(None)
+                except Exception as exc:
+                    results.append(exc)
+                    # Start the next item on a fresh connection
+                    connection.close()
+                    connection = self._connect()
+        finally:
+            connection.close()
+        return results
+
+
+class ConsoleChannel(Channel):
+    """Writes messages to stdout; for development."""
+
+    name = 'console'
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def send(self, user, subject, body):
+        with self._lock:
+            self.stream.write(f"To: {user.username}\nSubject: {subject}\n\n{body}\n{'-' * 40}\n")
+            self.stream.flush()
+
+
+class FileChannel(Channel):
+    """Appends messages as JSON lines to NOTIFICATION_FILE_PATH; for tests and audits."""
+
+    name = 'file'
+
+    def __init__(self, path=None):
+        self.path = path or settings.NOTIFICATION_FILE_PATH
+        self._lock = threading.Lock()
+
+    def send_many(self, items):
+        lines = [
+            json.dumps({
+                'user': user.username,
+                'subject': subject,
+                'body': body,
+                'sent_at': timezone.now().isoformat(),
+            })
+            for user, subject, body in items
+        ]
+        with self._lock, open(self.path, 'a') as handle:
+            handle.write('\n'.join(lines) + '\n')
+        return [None] * len(items)
+
+
+CHANNEL_CLASSES = {
+    channel.name: channel
+    for channel in (EmailChannel, SMSGatewayChannel, ConsoleChannel, FileChannel)
+}
+
+
+def load_channels(names=None):
+    """Instantiate the enabled channels, keyed by name."""
+    names = settings.NOTIFICATION_CHANNELS if names is None else names
+    try:
+        return {name: CHANNEL_CLASSES[name]() for name in names}
+    except KeyError as exc:
+        raise ValueError(f"Unknown notification channel {exc}") from None
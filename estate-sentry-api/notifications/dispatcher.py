@@ -0,0 +1,228 @@
+"""
+Notification dispatcher: turns new alerts into rate-limited digests.
+
+Runs in a worker (`manage.py run_notifications`), never on the request
+path. Each cycle has two steps:
+
+collect  Read settled alerts from the 'notifications' alert feed. For each
+         user with notification_enabled and each channel that can reach
+         them, merge the alerts into the user's pending message that no
+         worker has claimed yet, or create one due after
+         NOTIFICATION_DIGEST_SECONDS, and no sooner than
+         NOTIFICATION_MIN_INTERVAL after the last message sent to them.
+         CRITICAL alerts make the message due immediately.
+deliver  Claim due messages, render them, send them in per-channel batches
+         and record the outcome. Failures are retried with jittered
+         exponential backoff up to NOTIFICATION_MAX_ATTEMPTS.
+
+Escalation messages (notifications/escalation.py) are queued directly, due
+at once and unmerged; those with a `contact` go to that secondary contact.
+"""
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from alerts.feed import AlertFeed, load_alerts
+from monitoring.metrics import NOTIFICATION_SEND_DURATION, NOTIFICATIONS_SENT
+from .channels import load_channels
+from .models import NotificationMessage
+
+FEED_NAME = 'notifications'
+
+# A claimed message is retried by another worker if not finished by then.
+CLAIM_SECONDS = 120
+
+SEVERITY_ORDER = ['INFO', 'LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+
+
+def retry_delay(attempts, base=None, cap=3600):
+    """Backoff before attempt `attempts + 1`: exponential, with equal jitter."""
+    base = base or settings.NOTIFICATION_RETRY_BASE_SECONDS
+    delay = min(base * 2 ** (attempts - 1), cap)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def render_message(alerts):
+    """Return (subject, body) for one alert or a digest of several."""
+    if len(alerts) == 1:
+        alert = alerts[0]
+        subject = f"[Estate Sentry] {alert.get_severity_display()}: {alert.title}"
+        if 'escalation_level' in alert.metadata and not alert.acknowledged:
+            subject = f"[Estate Sentry] Unacknowledged {alert.get_severity_display()}: {alert.title}"
+        body = alert.description
+        if alert.sensor_id:
+            body += f"\n\nSensor: {alert.sensor.name} ({alert.sensor.location})"
+        body += f"\nTime: {timezone.localtime(alert.timestamp):%Y-%m-%d %H:%M:%S}"
+        return subject, body
+
+    worst = max(alerts, key=lambda alert: SEVERITY_ORDER.index(alert.severity))
+    subject = f"[Estate Sentry] {len(alerts)} new alerts (highest: {worst.get_severity_display()})"
+    lines = [
+        f"- {timezone.localtime(alert.timestamp):%H:%M:%S} [{alert.severity}] {alert.title}"
+        + (f" ({alert.sensor.name})" if alert.sensor_id else '')
+        for alert in alerts
+    ]
+    return subject, '\n'.join(lines)
+
+
+class NotificationDispatcher:
+    """Collects alerts into outbox messages and delivers them."""
+
+    def __init__(self, channels=None, batch_size=100):
+        self.channels = load_channels() if channels is None else channels
+        self.batch_size = batch_size
+        self.feed = AlertFeed(FEED_NAME)
+
+    def run_once(self, now=None):
+        """
+        Run one collect + deliver cycle.
+
+        Returns:
+            (alerts collected, messages delivered or failed)
+        """
+        collected = self.collect(now)
+        return collected, self.deliver(now)
+
+    def collect(self, now=None):
+        now = now or timezone.now()
+        total = 0
+        while True:
+            consumed = self.feed.consume(lambda alerts: self.enqueue(alerts, now), limit=self.batch_size * 10, now=now)
+            total += consumed
+            if not consumed:
+                return total
+
+    @transaction.atomic
+    def enqueue(self, alerts, now):
+        """Merge alerts into per-user, per-channel pending messages."""
+        by_user = defaultdict(list)
+        users = {}
+        for alert in alerts:
+            if alert.user.notification_enabled:
+                by_user[alert.user_id].append(alert)
+                users[alert.user_id] = alert.user
+        if not by_user or not self.channels:
+            return
+
+        # A claimed message is sent with the alerts it had when claimed, so
+        # nothing is merged into it; locked rows are being claimed right now
+        unclaimed = NotificationMessage.objects.filter(
+            user_id__in=by_user, contact=None, status='PENDING', attempts=0, claimed_until=None,
+            channel__in=self.channels
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            unclaimed = unclaimed.select_for_update(skip_locked=True)
+        pending = {(message.user_id, message.channel): message for message in unclaimed}
+        last_sent = {
+            (row['user_id'], row['channel']): row['last_sent']
+            for row in NotificationMessage.objects.filter(user_id__in=by_user, contact=None, status='SENT')
+            .values('user_id', 'channel')
+            .annotate(last_sent=Max('sent_at'))
+        }
+
+        digest = timedelta(seconds=settings.NOTIFICATION_DIGEST_SECONDS)
+        min_interval = timedelta(seconds=settings.NOTIFICATION_MIN_INTERVAL)
+        created, updated = [], []
+        for user_id, user_alerts in by_user.items():
+            alert_ids = [alert.id for alert in user_alerts]
+            urgent = any(alert.severity == 'CRITICAL' for alert in user_alerts)
+            for name, channel in self.channels.items():
+                if not channel.accepts(users[user_id]):
+                    continue
+                message = pending.get((user_id, name))
+                if message is not None:
+                    message.alert_ids = message.alert_ids + alert_ids
+                    if urgent:
+                        message.next_attempt_at = min(message.next_attempt_at, now)
+                    updated.append(message)
+                    continue
+
+                due = now if urgent else now + digest
+                sent = last_sent.get((user_id, name))
+                if sent and not urgent:
+                    due = max(due, sent + min_interval)
+                created.append(NotificationMessage(
+                    user_id=user_id, channel=name, alert_ids=alert_ids, next_attempt_at=due
+                ))
+
+        NotificationMessage.objects.bulk_create(created)
+        NotificationMessage.objects.bulk_update(updated, ['alert_ids', 'next_attempt_at'])
+
+    def _claim(self, now):
+        """Lease due messages to this worker so concurrent workers skip them."""
+        with transaction.atomic():
+            due = NotificationMessage.objects.filter(
+                status='PENDING', next_attempt_at__lte=now, channel__in=self.channels
+            ).order_by('next_attempt_at')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            messages = list(due.select_related('user', 'contact')[:self.batch_size])
+            lease = now + timedelta(seconds=CLAIM_SECONDS)
+            NotificationMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+                next_attempt_at=lease, claimed_until=lease
+            )
+        return messages
+
+    def deliver(self, now=None):
+        """
+        Send due messages.
+
+        Returns:
+            Number of messages attempted
+        """
+        now = now or timezone.now()
+        messages = self._claim(now)
+        if not messages:
+            return 0
+
+        alerts = load_alerts({alert_id for message in messages for alert_id in message.alert_ids}, 'sensor')
+        by_channel = defaultdict(list)
+        for message in messages:
+            by_channel[message.channel].append(message)
+
+        for name, channel_messages in by_channel.items():
+            items = []
+            for message in channel_messages:
+                message_alerts = [alerts[alert_id] for alert_id in message.alert_ids if alert_id in alerts]
+                recipient = message.contact or message.user
+                items.append((recipient, *render_message(message_alerts)) if message_alerts else None)
+
+            to_send = [item for item in items if item is not None]
+            started = time.perf_counter()
+            try:
+                results = iter(self.channels[name].send_many(to_send))
+            except Exception as exc:
+                # A channel that fails as a whole fails each of its messages
+                results = iter([exc] * len(to_send))
+            if to_send:
+                NOTIFICATION_SEND_DURATION.labels(name).observe((time.perf_counter() - started) / len(to_send))
+
+            for message, item in zip(channel_messages, items):
+                # Messages whose alerts were all deleted count as sent
+                error = next(results) if item is not None else None
+                self._record(message, error, name)
+
+        return len(messages)
+
+    def _record(self, message, error, channel):
+        now = timezone.now()
+        message.attempts += 1
+        message.claimed_until = None
+        if error is None:
+            message.status = 'SENT'
+            message.sent_at = now
+            message.last_error = ''
+        elif message.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            message.status = 'FAILED'
+            message.last_error = str(error)
+        else:
+            message.next_attempt_at = now + timedelta(seconds=retry_delay(message.attempts))
+            message.last_error = str(error)
+        message.save(update_fields=['attempts', 'status', 'sent_at', 'next_attempt_at', 'claimed_until', 'last_error'])
+        NOTIFICATIONS_SENT.labels(channel, 'ok' if error is None else 'error').inc()
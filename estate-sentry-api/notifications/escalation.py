@@ -0,0 +1,193 @@
+"""
+Escalation of unacknowledged alerts.
+
+Runs in a worker (`manage.py run_escalations`), never on the request path.
+Alerts of ESCALATION_SEVERITIES read from the 'escalations' alert feed get
+a deadline ESCALATION_DELAYS[0] seconds after they were raised. Each step
+that comes due raises the alert's severity one level (up to CRITICAL),
+queues an immediate message to its owner and to their secondary contacts
+from the contact's level on, and schedules the next step. Acknowledging
+the alert deletes its deadline.
+
+Deadlines are rows in one table indexed by due time, so they survive
+restarts and a tick never scans alerts. The worker keeps the deadlines due
+within `horizon` seconds in a heap and reloads that window from the index
+every `horizon` seconds. A tick pops only the entries that are due and
+claims their rows; an entry whose row was deleted by an acknowledgement
+or advanced by another worker no longer matches and is dropped, so
+cancelling never touches the heap.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, router, transaction
+from django.utils import timezone
+
+from alerts.feed import AlertFeed, load_alerts
+from alerts.models import Alert
+from estate_sentry.response_cache import invalidate_user
+from monitoring.metrics import ALERT_ESCALATIONS
+from .channels import load_channels
+from .dispatcher import SEVERITY_ORDER
+from .models import EscalationContact, EscalationDeadline, NotificationMessage
+
+FEED_NAME = 'escalations'
+
+
+def cancel_escalation(*alert_ids):
+    """Stop escalating these alerts (call when they are acknowledged)."""
+    EscalationDeadline.objects.filter(alert_id__in=alert_ids).delete()
+
+
+def escalated_severity(severity):
+    return SEVERITY_ORDER[min(SEVERITY_ORDER.index(severity) + 1, len(SEVERITY_ORDER) - 1)]
+
+
+class EscalationScheduler:
+    """Registers escalation deadlines for new alerts and takes the steps that are due."""
+
+    def __init__(self, channels=None, batch_size=100, horizon=300):
+        self.channels = load_channels() if channels is None else channels
+        self.batch_size = batch_size
+        self.horizon = timedelta(seconds=horizon)
+        self.feed = AlertFeed(FEED_NAME)
+        # (due_at, alert_id) for deadlines due before _loaded_until
+        self._heap = []
+        self._loaded_until = None
+
+    def run_once(self, now=None):
+        """
+        Run one register + escalate cycle.
+
+        Returns:
+            (alerts registered, escalation steps taken)
+        """
+        now = now or timezone.now()
+        if self._loaded_until is None or now >= self._loaded_until:
+            self.load(now)
+        return self.collect(now), self.escalate(now)
+
+    def load(self, now):
+        """Replace the heap with the deadlines due within the horizon."""
+        until = now + self.horizon
+        # Rows come sorted, and a sorted list is a heap
+        self._heap = list(
+            EscalationDeadline.objects.filter(due_at__lt=until).order_by('due_at').values_list('due_at', 'alert_id')
+        )
+        self._loaded_until = until
+
+    def next_due(self):
+        """When the earliest known deadline is due, or None."""
+        return self._heap[0][0] if self._heap else None
+
+    def _schedule(self, due_at, alert_id):
+        # Later deadlines are picked up by the next load()
+        if self._loaded_until is None or due_at < self._loaded_until:
+            heapq.heappush(self._heap, (due_at, alert_id))
+
+    def collect(self, now=None):
+        now = now or timezone.now()
+        total = 0
+        while True:
+            consumed = self.feed.consume(self.register, limit=self.batch_size * 10, now=now)
+            total += consumed
+            if not consumed:
+                return total
+
+    def register(self, alerts):
+        """Create the first deadline for each alert that escalates."""
+        if not settings.ESCALATION_DELAYS:
+            return
+        first = timedelta(seconds=settings.ESCALATION_DELAYS[0])
+        deadlines = [
+            EscalationDeadline(alert_id=alert.id, due_at=alert.timestamp + first)
+            for alert in alerts
+            if alert.severity in settings.ESCALATION_SEVERITIES and not alert.acknowledged
+        ]
+        EscalationDeadline.objects.bulk_create(deadlines, ignore_conflicts=True)
+        for deadline in deadlines:
+            self._schedule(deadline.due_at, deadline.alert_id)
+
+    def escalate(self, now=None):
+        """
+        Take the escalation steps that are due.
+
+        Returns:
+            Number of steps taken
+        """
+        now = now or timezone.now()
+        total = 0
+        while self._heap and self._heap[0][0] <= now:
+            alert_ids = []
+            while self._heap and self._heap[0][0] <= now and len(alert_ids) < self.batch_size:
+                alert_ids.append(heapq.heappop(self._heap)[1])
+            total += self._escalate(alert_ids, now)
+        return total
+
+    @transaction.atomic
+    def _escalate(self, alert_ids, now):
+        due = EscalationDeadline.objects.filter(alert_id__in=alert_ids, due_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        deadlines = list(due)
+        if not deadlines:
+            return 0
+
+        alerts = load_alerts([deadline.alert_id for deadline in deadlines], 'user')
+        delays = settings.ESCALATION_DELAYS
+        escalated, advanced, finished = [], [], []
+        for deadline in deadlines:
+            alert = alerts.get(deadline.alert_id)
+            if alert is None or alert.acknowledged:
+                # Deleted, or acknowledged without cancel_escalation(), e.g. in the admin
+                finished.append(deadline.pk)
+                continue
+            alert.severity = escalated_severity(alert.severity)
+            alert.metadata = {**alert.metadata, 'escalation_level': deadline.level, 'escalated_at': now.isoformat()}
+            escalated.append(alert)
+            if deadline.level < len(delays):
+                deadline.due_at = now + timedelta(seconds=delays[deadline.level])
+                deadline.level += 1
+                advanced.append(deadline)
+            else:
+                finished.append(deadline.pk)
+
+        by_shard = defaultdict(list)
+        for alert in escalated:
+            by_shard[router.db_for_write(Alert, instance=alert)].append(alert)
+        for alias, shard_alerts in by_shard.items():
+            Alert.objects.using(alias).bulk_update(shard_alerts, ['severity', 'metadata'])
+            invalidate_user(*{alert.user_id for alert in shard_alerts}, using=alias)
+        EscalationDeadline.objects.bulk_update(advanced, ['level', 'due_at'])
+        EscalationDeadline.objects.filter(pk__in=finished).delete()
+        self.notify(escalated, now)
+
+        for deadline in advanced:
+            self._schedule(deadline.due_at, deadline.alert_id)
+        for alert in escalated:
+            ALERT_ESCALATIONS.labels(str(alert.metadata['escalation_level'])).inc()
+        return len(escalated)
+
+    def notify(self, alerts, now):
+        """Queue messages due now to each alert's owner and the contacts its step has reached."""
+        if not alerts or not self.channels:
+            return
+        contacts = defaultdict(list)
+        for contact in EscalationContact.objects.filter(user_id__in={alert.user_id for alert in alerts}):
+            contacts[contact.user_id].append(contact)
+
+        messages = []
+        for alert in alerts:
+            level = alert.metadata['escalation_level']
+            recipients = [(alert.user, None)] if alert.user.notification_enabled else []
+            recipients += [(contact, contact) for contact in contacts[alert.user_id] if contact.level <= level]
+            for recipient, contact in recipients:
+                for name, channel in self.channels.items():
+                    if channel.accepts(recipient):
+                        messages.append(NotificationMessage(
+                            user_id=alert.user_id, contact=contact, channel=name, alert_ids=[alert.id],
+                            next_attempt_at=now
+                        ))
+        NotificationMessage.objects.bulk_create(messages)
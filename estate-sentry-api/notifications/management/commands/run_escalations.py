@@ -0,0 +1,72 @@
+"""
+Run the escalation scheduler for unacknowledged alerts. The messages it
+queues are delivered by run_notifications.
+
+Examples:
+    python manage.py run_escalations
+    python manage.py run_escalations --once
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from notifications.channels import load_channels
+from notifications.escalation import EscalationScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Escalate alerts that stay unacknowledged: raise their severity and notify again.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run until nothing is due, then exit')
+        parser.add_argument('--poll', type=float, default=1.0, help='Most seconds to sleep when idle')
+        parser.add_argument('--batch', type=int, default=100, help='Deadlines claimed per batch')
+        parser.add_argument(
+            '--horizon', type=float, default=300.0,
+            help='Seconds of upcoming deadlines held in memory; the window is reloaded this often'
+        )
+        parser.add_argument(
+            '--channels', help='Comma-separated channels, overriding NOTIFICATION_CHANNELS'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            names = options['channels'].split(',') if options['channels'] else None
+            channels = load_channels(names)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        scheduler = EscalationScheduler(channels=channels, batch_size=options['batch'], horizon=options['horizon'])
+        self.stdout.write(f"Escalating via: {', '.join(channels) or 'no channels'}")
+
+        total = 0
+        while True:
+            close_old_connections()
+            try:
+                registered, escalated = scheduler.run_once()
+            except Exception:
+                if options['once']:
+                    raise
+                # Keep the worker alive; the failed batch is retried on a later cycle
+                logger.exception('Escalation cycle failed')
+                time.sleep(options['poll'])
+                continue
+            total += escalated
+            if escalated:
+                self.stdout.write(f"Escalated {escalated} alerts")
+
+            if options['once'] and not registered and not escalated:
+                self.stdout.write(f"{total} escalation steps taken")
+                return
+            if not registered and not escalated:
+                # Wake for the next deadline rather than a full poll
+                next_due = scheduler.next_due()
+                delay = options['poll']
+                if next_due is not None:
+                    delay = min(delay, max((next_due - timezone.now()).total_seconds(), 0))
+                time.sleep(delay)
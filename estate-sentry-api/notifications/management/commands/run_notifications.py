@@ -0,0 +1,73 @@
+"""
+Run the notification dispatcher.
+
+Examples:
+    python manage.py run_notifications
+    python manage.py run_notifications --once
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from notifications.channels import load_channels
+from notifications.dispatcher import NotificationDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Turn new alerts into rate-limited notification digests and deliver them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run until nothing is due, then exit')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument('--batch', type=int, default=100, help='Messages claimed per delivery batch')
+        parser.add_argument(
+            '--channels', help='Comma-separated channels, overriding NOTIFICATION_CHANNELS'
+        )
+        parser.add_argument(
+            '--report', type=float, default=60.0, help='Seconds between throughput reports'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            names = options['channels'].split(',') if options['channels'] else None
+            channels = load_channels(names)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        dispatcher = NotificationDispatcher(channels=channels, batch_size=options['batch'])
+        self.stdout.write(f"Delivering via: {', '.join(channels) or 'no channels'}")
+
+        started = window_started = time.perf_counter()
+        total = window = 0
+        while True:
+            close_old_connections()
+            try:
+                collected, delivered = dispatcher.run_once()
+            except Exception:
+                if options['once']:
+                    raise
+                # Keep the worker alive; the failed batch is retried on a later cycle
+                logger.exception('Notification cycle failed')
+                time.sleep(options['poll'])
+                continue
+            total += delivered
+            window += delivered
+
+            now = time.perf_counter()
+            if now - window_started >= options['report']:
+                self._report(window, now - window_started)
+                window, window_started = 0, now
+
+            if options['once'] and not collected and not delivered:
+                self._report(total, now - started)
+                return
+            if not collected and not delivered:
+                time.sleep(options['poll'])
+
+    def _report(self, messages, elapsed):
+        rate = messages / elapsed if elapsed else 0.0
+        self.stdout.write(f"{messages} messages in {elapsed:.1f}s ({rate:.1f} msgs/sec)")
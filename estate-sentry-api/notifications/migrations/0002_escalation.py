@@ -0,0 +1,53 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0005_alert_feed_cursor'),
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscalationDeadline',
+            fields=[
+                ('alert', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='escalation', serialize=False, to='alerts.alert')),
+                ('level', models.PositiveSmallIntegerField(default=1, help_text='Escalation step due next, from 1')),
+                ('due_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Escalation Deadline',
+                'verbose_name_plural': 'Escalation Deadlines',
+                'db_table': 'escalation_deadlines',
+            },
+        ),
+        migrations.CreateModel(
+            name='EscalationContact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(blank=True, default='', max_length=254)),
+                ('phone_number', models.CharField(blank=True, default='', max_length=20)),
+                ('level', models.PositiveSmallIntegerField(default=1, help_text='First escalation step that notifies this contact')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escalation_contacts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Escalation Contact',
+                'verbose_name_plural': 'Escalation Contacts',
+                'db_table': 'escalation_contacts',
+                'ordering': ['level', 'name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='notificationmessage',
+            name='contact',
+            field=models.ForeignKey(blank=True, help_text='Secondary contact this escalation message goes to instead of the user', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='notifications.escalationcontact'),
+        ),
+    ]
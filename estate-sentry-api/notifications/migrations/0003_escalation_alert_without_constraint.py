@@ -0,0 +1,20 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0006_alert_feed_cursor_shard'),
+        ('notifications', '0002_escalation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='escalationdeadline',
+            name='alert',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='escalation', serialize=False, to='alerts.alert'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_escalation_alert_without_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationmessage',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text='Set while a worker sends the message; new alerts are no longer merged into it', null=True),
+        ),
+    ]
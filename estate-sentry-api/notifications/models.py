@@ -0,0 +1,122 @@
+from django.db import models
+from django.conf import settings
+
+
+class NotificationMessage(models.Model):
+    """
+    Outbox entry: one message to one user over one channel.
+
+    New alerts for a user are merged into their pending message until a
+    worker claims it for sending, so a burst of alerts becomes a single
+    digest.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    contact = models.ForeignKey(
+        'EscalationContact',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notifications',
+        help_text='Secondary contact this escalation message goes to instead of the user'
+    )
+    channel = models.CharField(max_length=20, help_text='Channel name, e.g. email or sms')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+
+    alert_ids = models.JSONField(default=list, help_text='Alerts included in this message')
+
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(help_text='When the message is next due to be sent')
+    claimed_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Set while a worker sends the message; new alerts are no longer merged into it'
+    )
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'notification_messages'
+        verbose_name = 'Notification Message'
+        verbose_name_plural = 'Notification Messages'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['user', 'channel', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.user} ({len(self.alert_ids)} alerts, {self.status})"
+
+
+class EscalationContact(models.Model):
+    """
+    Secondary contact notified when a user's alert escalates without being
+    acknowledged (see notifications/escalation.py).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='escalation_contacts'
+    )
+    name = models.CharField(max_length=100)
+    email = models.EmailField(blank=True, default='')
+    phone_number = models.CharField(max_length=20, blank=True, default='')
+    level = models.PositiveSmallIntegerField(
+        default=1,
+        help_text='First escalation step that notifies this contact'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'escalation_contacts'
+        verbose_name = 'Escalation Contact'
+        verbose_name_plural = 'Escalation Contacts'
+        ordering = ['level', 'name']
+
+    def __str__(self):
+        return f"{self.name} for {self.user} (from step {self.level})"
+
+    @property
+    def username(self):
+        # Channels address recipients by username, email and phone_number
+        return self.name
+
+
+class EscalationDeadline(models.Model):
+    """
+    Queue entry: when an unacknowledged alert takes its next escalation
+    step. Deleted when the alert is acknowledged or has no steps left.
+    """
+
+    # Alerts may live on a shard database, so no constraint
+    alert = models.OneToOneField(
+        'alerts.Alert',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_constraint=False,
+        related_name='escalation'
+    )
+    level = models.PositiveSmallIntegerField(default=1, help_text='Escalation step due next, from 1')
+    due_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'escalation_deadlines'
+        verbose_name = 'Escalation Deadline'
+        verbose_name_plural = 'Escalation Deadlines'
+
+    def __str__(self):
+        return f"Alert {self.alert_id} step {self.level} at {self.due_at}"
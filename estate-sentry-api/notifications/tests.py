@@ -0,0 +1,272 @@
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from alerts.models import Alert
+from authentication.models import User
+from sensors.models import Sensor
+from .channels import Channel, ChannelError, EmailChannel, FileChannel
+from .dispatcher import NotificationDispatcher, retry_delay
+from .escalation import EscalationScheduler
+from .models import EscalationContact, EscalationDeadline, NotificationMessage
+
+
+class RecordingChannel(Channel):
+    """Channel that records sent messages and can be made to fail."""
+
+    name = 'recording'
+
+    def __init__(self):
+        self.sent = []
+        self.failing = False
+
+    def send(self, user, subject, body):
+        if self.failing:
+            raise ChannelError('gateway down')
+        self.sent.append((user.username, subject, body))
+
+
+@override_settings(
+    ALERT_FEED_SETTLE_SECONDS=0,
+    NOTIFICATION_DIGEST_SECONDS=10,
+    NOTIFICATION_MIN_INTERVAL=300,
+    NOTIFICATION_MAX_ATTEMPTS=3,
+    NOTIFICATION_RETRY_BASE_SECONDS=30,
+)
+class NotificationDispatcherTestCase(TestCase):
+    """Test cases for alert digests, rate limiting and retries."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='notifyuser', password='testpass')
+        self.muted = User.objects.create_user(
+            username='muteduser', password='testpass', notification_enabled=False
+        )
+        self.sensor = Sensor.objects.create(
+            name='Front Door', sensor_type='DOOR_CONTACT', location='Entry', owner=self.user
+        )
+        self.channel = RecordingChannel()
+        self.dispatcher = NotificationDispatcher(channels={'recording': self.channel})
+
+    def alert(self, user=None, severity='MEDIUM', title='Door Opened'):
+        return Alert.objects.create(
+            alert_type='DOOR_OPEN', severity=severity, user=user or self.user, sensor=self.sensor,
+            title=title, description='The entry door was opened.'
+        )
+
+    def test_burst_is_digested(self):
+        """Test a burst of alerts becomes one digest sent after the digest window."""
+        for index in range(3):
+            self.alert(title=f'Door Opened {index}')
+        self.alert(user=self.muted)
+        now = timezone.now()
+
+        self.assertEqual(self.dispatcher.run_once(now), (4, 0))
+        self.alert(title='Door Opened 3')
+        self.assertEqual(self.dispatcher.run_once(now + timedelta(seconds=5)), (1, 0))
+        self.assertEqual(self.channel.sent, [])
+
+        self.dispatcher.deliver(now + timedelta(seconds=11))
+        self.assertEqual(len(self.channel.sent), 1)
+        username, subject, body = self.channel.sent[0]
+        self.assertEqual(username, 'notifyuser')
+        self.assertIn('4 new alerts', subject)
+        self.assertEqual(body.count('\n'), 3)
+        self.assertEqual(NotificationMessage.objects.get().status, 'SENT')
+
+    def test_rate_limit_and_critical_bypass(self):
+        """Test follow-up messages wait for the minimum interval unless critical."""
+        self.alert()
+        now = timezone.now()
+        self.dispatcher.run_once(now)
+        self.dispatcher.deliver(now + timedelta(seconds=10))
+        self.assertEqual(len(self.channel.sent), 1)
+
+        self.alert(title='Door Opened Again')
+        self.dispatcher.run_once(now + timedelta(seconds=20))
+        message = NotificationMessage.objects.get(status='PENDING')
+        self.assertGreaterEqual(message.next_attempt_at, timezone.now() + timedelta(seconds=250))
+
+        self.alert(severity='CRITICAL', title='Glass Broken')
+        self.dispatcher.collect(now + timedelta(seconds=30))
+        self.dispatcher.deliver(now + timedelta(seconds=30))
+        self.assertEqual(len(self.channel.sent), 2)
+        self.assertIn('2 new alerts (highest: Critical)', self.channel.sent[1][1])
+
+    def test_failures_retry_with_backoff(self):
+        """Test failed sends are retried with backoff, then marked failed."""
+        self.alert()
+        now = timezone.now()
+        self.dispatcher.collect(now)
+        self.channel.failing = True
+
+        at = now + timedelta(seconds=10)
+        for attempt in range(1, 4):
+            self.assertEqual(self.dispatcher.deliver(at), 1)
+            message = NotificationMessage.objects.get()
+            self.assertEqual(message.attempts, attempt)
+            self.assertEqual(message.last_error, 'gateway down')
+            at = message.next_attempt_at
+
+        self.assertEqual(message.status, 'FAILED')
+        self.assertEqual(self.dispatcher.deliver(at + timedelta(days=1)), 0)
+
+        for attempts in range(1, 6):
+            delay = retry_delay(attempts, base=30)
+            self.assertGreaterEqual(delay, 30 * 2 ** (attempts - 1) / 2)
+            self.assertLessEqual(delay, 30 * 2 ** (attempts - 1))
+
+    def test_alerts_collected_during_a_send_are_not_lost(self):
+        """Test alerts collected while another worker sends a message go into a new message."""
+        self.alert()
+        now = timezone.now()
+        self.dispatcher.collect(now)
+        other_worker = NotificationDispatcher(channels={'recording': self.channel})
+        send = self.channel.send
+
+        def send_while_collecting(user, subject, body):
+            self.alert(severity='CRITICAL', title='Glass Broken')
+            other_worker.collect(now + timedelta(seconds=10))
+            send(user, subject, body)
+
+        with mock.patch.object(self.channel, 'send', send_while_collecting):
+            self.assertEqual(self.dispatcher.deliver(now + timedelta(seconds=10)), 1)
+        self.assertEqual(self.dispatcher.deliver(now + timedelta(seconds=10)), 1)
+
+        self.assertEqual(
+            [subject for _, subject, _ in self.channel.sent],
+            ['[Estate Sentry] Medium: Door Opened', '[Estate Sentry] Critical: Glass Broken']
+        )
+        self.assertFalse(NotificationMessage.objects.exclude(status='SENT').exists())
+
+    def test_email_connection_failure_is_retried(self):
+        """Test an SMTP connect or login failure fails the batch's messages instead of the worker."""
+        self.user.email = 'owner@example.com'
+        self.user.save()
+        dispatcher = NotificationDispatcher(channels={'email': EmailChannel()})
+        self.alert(severity='CRITICAL')
+
+        with mock.patch('notifications.channels.get_connection') as get_connection:
+            get_connection.return_value.open.side_effect = smtplib.SMTPAuthenticationError(535, b'bad credentials')
+            dispatcher.run_once(timezone.now())
+
+        message = NotificationMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), ('PENDING', 1))
+        self.assertIn('bad credentials', message.last_error)
+
+    def test_file_sink(self):
+        """Test the file channel writes one JSON line per message."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'notifications.jsonl')
+        dispatcher = NotificationDispatcher(channels={'file': FileChannel(path)})
+
+        self.alert(severity='CRITICAL', title='Smoke Detected')
+        dispatcher.run_once(timezone.now())
+
+        with open(path) as handle:
+            lines = [json.loads(line) for line in handle]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['user'], 'notifyuser')
+        self.assertIn('Critical: Smoke Detected', lines[0]['subject'])
+
+
+class ContactChannel(RecordingChannel):
+    """Recording channel that, like email, only reaches recipients with an address."""
+
+    def accepts(self, user):
+        return bool(user.email)
+
+
+@override_settings(
+    ALERT_FEED_SETTLE_SECONDS=0,
+    ESCALATION_SEVERITIES=['HIGH'],
+    ESCALATION_DELAYS=[300, 900],
+    DATABASE_SHARDS=['default'],
+)
+class EscalationSchedulerTestCase(TestCase):
+    """Test cases for escalating unacknowledged alerts."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='escalateuser', password='testpass', email='owner@example.com')
+        self.sensor = Sensor.objects.create(
+            name='Back Door', sensor_type='DOOR_CONTACT', location='Garden', owner=self.user
+        )
+        self.contact = EscalationContact.objects.create(
+            user=self.user, name='Neighbour', email='neighbour@example.com', level=2
+        )
+        self.channel = ContactChannel()
+        self.scheduler = EscalationScheduler(channels={'recording': self.channel})
+
+    def alert(self, severity='HIGH'):
+        return Alert.objects.create(
+            alert_type='DOOR_OPEN', severity=severity, user=self.user, sensor=self.sensor,
+            title='Door Opened', description='The back door was opened.'
+        )
+
+    def test_unacknowledged_alert_escalates(self):
+        """Test each step raises severity and notifies the owner, then the contact."""
+        alert = self.alert()
+        self.alert(severity='MEDIUM')
+        now = timezone.now()
+        self.assertEqual(self.scheduler.run_once(now), (2, 0))
+        self.assertEqual(EscalationDeadline.objects.get().alert, alert)
+        self.assertEqual(self.scheduler.run_once(now + timedelta(seconds=290)), (0, 0))
+
+        first = now + timedelta(seconds=301)
+        self.assertEqual(self.scheduler.run_once(first), (0, 1))
+        alert.refresh_from_db()
+        self.assertEqual(alert.severity, 'CRITICAL')
+        self.assertEqual(alert.metadata['escalation_level'], 1)
+        message = NotificationMessage.objects.get()
+        self.assertEqual((message.contact, message.alert_ids, message.next_attempt_at), (None, [alert.id], first))
+
+        self.assertEqual(self.scheduler.run_once(first + timedelta(seconds=901)), (0, 1))
+        self.assertCountEqual(
+            NotificationMessage.objects.values_list('contact', flat=True), [None, None, self.contact.pk]
+        )
+        self.assertFalse(EscalationDeadline.objects.exists())
+        self.assertEqual(self.scheduler.run_once(first + timedelta(days=1)), (0, 0))
+
+        NotificationDispatcher(channels={'recording': self.channel}).deliver(first + timedelta(days=1))
+        self.assertIn(('Neighbour', '[Estate Sentry] Unacknowledged Critical: Door Opened'),
+                      [(name, subject) for name, subject, _ in self.channel.sent])
+
+    def test_acknowledge_cancels_escalation(self):
+        """Test acknowledging an alert deletes its deadline, so it never escalates."""
+        alert = self.alert()
+        now = timezone.now()
+        self.scheduler.run_once(now)
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.patch(f'/api/alerts/{alert.id}/acknowledge/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(EscalationDeadline.objects.exists())
+
+        self.assertEqual(self.scheduler.run_once(now + timedelta(seconds=301)), (0, 0))
+        alert.refresh_from_db()
+        self.assertEqual(alert.severity, 'HIGH')
+        self.assertFalse(NotificationMessage.objects.exists())
+
+    def test_tick_only_touches_due_deadlines(self):
+        """Test a tick with nothing due runs no queries, and deadlines survive a restart."""
+        alert = self.alert()
+        now = timezone.now()
+        self.scheduler.run_once(now)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.scheduler.escalate(now + timedelta(seconds=290)), 0)
+
+        restarted = EscalationScheduler(channels={'recording': self.channel}, horizon=60)
+        restarted.load(now)
+        self.assertIsNone(restarted.next_due())
+        self.assertEqual(restarted.run_once(now + timedelta(seconds=301)), (0, 1))
+        alert.refresh_from_db()
+        self.assertEqual(alert.severity, 'CRITICAL')
@@ -1,39 +1,52 @@
 from django.contrib import admin
-from .models import Sensor, SensorReading
+from estate_sentry.admin_tools import LargeTableAdmin
+from .models import Sensor, SensorReading, CameraFrame, Zone
 
 
 @admin.register(Sensor)
 class SensorAdmin(admin.ModelAdmin):
     """Admin configuration for Sensor model."""
 
-    list_display = ['name', 'sensor_type', 'location', 'status', 'owner', 'created_at']
+    list_display = ['name', 'sensor_type', 'location', 'status', 'owner', 'last_seen', 'created_at']
     list_filter = ['sensor_type', 'status', 'created_at']
     search_fields = ['name', 'location', 'owner__username']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['last_seen', 'created_at', 'updated_at']
 
     fieldsets = (
         ('Basic Information', {
-            'fields': ('name', 'sensor_type', 'location', 'status', 'owner')
+            'fields': ('name', 'sensor_type', 'location', 'status', 'owner', 'zone')
         }),
         ('Configuration', {
-            'fields': ('handler_class', 'connection_config', 'metadata')
+            'fields': ('handler_class', 'connection_config', 'metadata', 'heartbeat_interval')
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('last_seen', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
 
 
+@admin.register(Zone)
+class ZoneAdmin(admin.ModelAdmin):
+    """Admin configuration for Zone model."""
+
+    list_display = ['name', 'owner', 'mode', 'updated_at']
+    list_filter = ['mode']
+    search_fields = ['name', 'owner__username']
+    readonly_fields = ['created_at', 'updated_at']
+
+
 @admin.register(SensorReading)
-class SensorReadingAdmin(admin.ModelAdmin):
+class SensorReadingAdmin(LargeTableAdmin):
     """Admin configuration for SensorReading model."""
 
     list_display = ['sensor', 'timestamp', 'reading_type', 'processed']
-    list_filter = ['processed', 'timestamp', 'sensor__sensor_type']
-    search_fields = ['sensor__name']
+    list_filter = ['processed', 'sensor__sensor_type']
+    list_select_related = ['sensor']
+    # Exact match on the (small) sensors table, then the sensor_id index
+    search_fields = ['=sensor__name']
+    autocomplete_fields = ['sensor']
     readonly_fields = ['timestamp']
-    date_hierarchy = 'timestamp'
 
     fieldsets = (
         ('Reading Information', {
@@ -43,3 +56,15 @@ class SensorReadingAdmin(admin.ModelAdmin):
             'fields': ('timestamp',)
         }),
     )
+
+
+@admin.register(CameraFrame)
+class CameraFrameAdmin(admin.ModelAdmin):
+    """Admin configuration for CameraFrame model."""
+
+    list_display = ['sensor', 'content_hash', 'size', 'upload_count', 'last_uploaded_at']
+    list_select_related = ['sensor']
+    readonly_fields = [
+        'sensor', 'content_hash', 'perceptual_hash', 'content_type', 'size',
+        'width', 'height', 'upload_count', 'created_at', 'last_uploaded_at'
+    ]
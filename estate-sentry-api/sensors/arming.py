@@ -0,0 +1,196 @@
+"""
+Zone arming state and the in-process index that threat detection consults.
+
+A zone's mode is its scheduled mode while a schedule entry covers the
+current local time (TIME_ZONE), and its own `mode` otherwise. In a disarmed
+zone, detection is skipped for intrusion sensors; in stay mode, only for
+interior ones. Life-safety sensors, and sensors outside any zone, always
+alert.
+
+ArmingIndex keeps each owner's zones and sensor assignments in memory, so
+a suppressed detection costs dict lookups and no query. Writes to zones or
+sensor assignments call `invalidate_arming()`, which bumps the owner's
+ArmingVersion row in the same transaction. The version lives in the
+database, not a cache, so the gateway, workers and every server process
+see it: each compares its copy with the row at most every
+ARMING_INDEX_CHECK_SECONDS (one primary-key query per owner) and reloads
+when it changed.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from estate_sentry.sharding import use_owner_shard
+from .models import ArmingVersion, Sensor, Zone
+
+# Sensor types whose detection each mode skips
+SUPPRESSED_SENSOR_TYPES = {
+    'ARMED': frozenset(),
+    # Occupants move around inside; doors, windows and glass stay armed
+    'STAY': frozenset({'MOTION', 'CAMERA'}),
+    'DISARMED': frozenset({'DOOR_CONTACT', 'WINDOW_CONTACT', 'GLASS_BREAK', 'MOTION', 'CAMERA'}),
+}
+SUPPRESSIBLE_SENSOR_TYPES = frozenset().union(*SUPPRESSED_SENSOR_TYPES.values())
+
+
+def parse_minute(value):
+    hours, _, minutes = str(value).partition(':')
+    if not (hours.isdigit() and minutes.isdigit() and int(hours) < 24 and int(minutes) < 60):
+        raise ValueError(f"Invalid time {value!r}, expected HH:MM")
+    return int(hours) * 60 + int(minutes)
+
+
+def compile_schedule(schedule):
+    """
+    Validate a zone schedule and convert it for mode_at().
+
+    Raises:
+        ValueError: describing the first invalid entry
+
+    Returns:
+        Tuple of (days, start minute, end minute, mode); an entry whose end
+        is before its start runs past midnight into the next day
+    """
+    if not isinstance(schedule, list):
+        raise ValueError('Schedule must be a list of entries')
+    modes = {mode for mode, _ in Zone.MODE_CHOICES}
+    compiled = []
+    for number, entry in enumerate(schedule, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f'Entry {number} must be an object')
+        days = entry.get('days')
+        if not isinstance(days, list) or not days or not all(day in range(7) for day in days):
+            raise ValueError(f'Entry {number}: days must be a non-empty list of 0 (Monday) to 6 (Sunday)')
+        if entry.get('mode') not in modes:
+            raise ValueError(f"Entry {number}: mode must be one of {', '.join(sorted(modes))}")
+        try:
+            start, end = parse_minute(entry.get('start')), parse_minute(entry.get('end'))
+        except ValueError as exc:
+            raise ValueError(f'Entry {number}: {exc}')
+        if start == end:
+            raise ValueError(f'Entry {number}: start and end must differ')
+        compiled.append((frozenset(days), start, end, entry['mode']))
+    return tuple(compiled)
+
+
+def mode_at(mode, schedule, at):
+    """The mode of a zone with this mode and compiled schedule at datetime `at`; first matching entry wins."""
+    if not schedule:
+        return mode
+    local = timezone.localtime(at)
+    minute = local.hour * 60 + local.minute
+    weekday = local.weekday()
+    for days, start, end, entry_mode in schedule:
+        if start < end:
+            if weekday in days and start <= minute < end:
+                return entry_mode
+        elif (weekday in days and minute >= start) or ((weekday - 1) % 7 in days and minute < end):
+            return entry_mode
+    return mode
+
+
+def arming_version(owner_id):
+    with use_owner_shard(owner_id):
+        return ArmingVersion.objects.filter(owner_id=owner_id).values_list('version', flat=True).first() or 0
+
+
+def bump_arming_version(owner_id):
+    with use_owner_shard(owner_id, for_write=True):
+        if not ArmingVersion.objects.filter(owner_id=owner_id).update(version=F('version') + 1):
+            _, created = ArmingVersion.objects.get_or_create(owner_id=owner_id, defaults={'version': 1})
+            if not created:
+                ArmingVersion.objects.filter(owner_id=owner_id).update(version=F('version') + 1)
+
+
+def invalidate_arming(*owner_ids):
+    """
+    Bump the owners' arming versions in the current transaction, so the
+    change and the bump commit together; every process reloads within
+    ARMING_INDEX_CHECK_SECONDS, this one as soon as the transaction commits.
+    """
+    owner_ids = {owner_id for owner_id in owner_ids if owner_id is not None}
+    for owner_id in owner_ids:
+        bump_arming_version(owner_id)
+    if owner_ids:
+        transaction.on_commit(lambda: [arming_index.discard(owner_id) for owner_id in owner_ids])
+
+
+class OwnerArming:
+    """One owner's zones and sensor assignments, as loaded at `version`."""
+
+    __slots__ = ('version', 'checked', 'zones', 'sensor_zones')
+
+    def __init__(self, version, zones, sensor_zones):
+        self.version = version
+        self.checked = time.monotonic()
+        # zone id -> (mode, compiled schedule)
+        self.zones = zones
+        # sensor id -> zone id, for zoned sensors only
+        self.sensor_zones = sensor_zones
+
+
+class ArmingIndex:
+    """Per-process index of each owner's arming state."""
+
+    def __init__(self):
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def suppressing_mode(self, sensor, at=None):
+        """
+        The mode in which the sensor's detection is skipped at `at` (default
+        now), or None if the sensor is armed.
+        """
+        if sensor.sensor_type not in SUPPRESSIBLE_SENSOR_TYPES:
+            return None
+        arming = self._owner(sensor.owner_id)
+        zone = arming.zones.get(arming.sensor_zones.get(sensor.pk))
+        if zone is None:
+            return None
+        mode, schedule = zone
+        mode = mode_at(mode, schedule, at or timezone.now())
+        return mode if sensor.sensor_type in SUPPRESSED_SENSOR_TYPES[mode] else None
+
+    def _owner(self, owner_id):
+        arming = self._owners.get(owner_id)
+        if arming is not None and time.monotonic() - arming.checked < settings.ARMING_INDEX_CHECK_SECONDS:
+            return arming
+        version = arming_version(owner_id)
+        if arming is not None and arming.version == version:
+            arming.checked = time.monotonic()
+            return arming
+        arming = self._load(owner_id, version)
+        with self._lock:
+            self._owners[owner_id] = arming
+        return arming
+
+    @staticmethod
+    def _load(owner_id, version):
+        zones = {}
+        with use_owner_shard(owner_id):
+            rows = Zone.objects.filter(owner_id=owner_id).values_list('id', 'mode', 'schedule')
+            for zone_id, mode, schedule in rows:
+                try:
+                    zones[zone_id] = (mode, compile_schedule(schedule))
+                except ValueError:
+                    # Saved around the API's validation: fall back to the zone's own mode
+                    zones[zone_id] = (mode, ())
+            sensor_zones = dict(
+                Sensor.objects.filter(owner_id=owner_id, zone__isnull=False).values_list('id', 'zone_id')
+            )
+        return OwnerArming(version, zones, sensor_zones)
+
+    def discard(self, owner_id):
+        with self._lock:
+            self._owners.pop(owner_id, None)
+
+    def forget(self):
+        with self._lock:
+            self._owners.clear()
+
+
+arming_index = ArmingIndex()
@@ -0,0 +1,82 @@
+"""
+Dashboard summary: what the home screen shows, in one response.
+
+Sensors with their status, latest reading and unacknowledged alert count,
+alert totals and the most recent alerts, in three queries however many
+sensors the user has:
+
+1. the user's sensors, with the latest reading copied onto each at
+   ingestion and the unacknowledged alert count from a correlated subquery
+2. alert totals, as conditional aggregates
+3. the most recent alerts
+"""
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from alerts.models import Alert
+from alerts.serializers import AlertRows
+from estate_sentry.fast_serializers import RowSerializer, choice_labels, iso_datetime
+from .models import Sensor
+
+RECENT_ALERTS = 10
+
+
+class DashboardSensorRows(RowSerializer):
+    """A sensor's dashboard entry, from values() rows of dashboard_sensors()."""
+
+    columns = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('sensor_type', 'sensor_type', None),
+        ('sensor_type_display', 'sensor_type', choice_labels(Sensor, 'sensor_type')),
+        ('location', 'location', None),
+        ('status', 'status', None),
+        ('status_display', 'status', choice_labels(Sensor, 'status')),
+        ('last_seen', 'last_seen', iso_datetime),
+        ('unacknowledged_alerts', 'unacknowledged_alerts', None),
+        ('last_reading', 'last_reading', None),
+        ('last_reading_at', 'last_reading_at', iso_datetime),
+        ('last_reading_value', 'last_reading_value', None),
+    )
+
+
+def dashboard_sensors(user):
+    """The user's sensors, annotated with their unacknowledged alert count."""
+    unacknowledged = (
+        Alert.objects.filter(sensor=OuterRef('pk'), acknowledged=False)
+        .order_by().values('sensor').annotate(count=Count('pk')).values('count')
+    )
+    return Sensor.objects.filter(owner=user).annotate(
+        unacknowledged_alerts=Coalesce(Subquery(unacknowledged, output_field=IntegerField()), 0),
+    )
+
+
+def dashboard_summary(user):
+    """
+    Build the dashboard response data for a user.
+
+    Returns:
+        Dict with 'sensors' and 'alerts' (totals, counts by severity and
+        the recent alerts)
+    """
+    sensors = DashboardSensorRows.serialize(DashboardSensorRows.values(dashboard_sensors(user)))
+
+    user_alerts = Alert.objects.filter(user=user)
+    severities = [severity for severity, _ in Alert.SEVERITY_CHOICES]
+    totals = user_alerts.aggregate(
+        total=Count('pk'),
+        unacknowledged=Count('pk', filter=Q(acknowledged=False)),
+        **{severity: Count('pk', filter=Q(severity=severity)) for severity in severities},
+    )
+    recent = AlertRows.values(user_alerts.order_by('-timestamp')[:RECENT_ALERTS])
+
+    return {
+        'sensors': sensors,
+        'alerts': {
+            'total': totals['total'],
+            'unacknowledged': totals['unacknowledged'],
+            # As in /api/alerts/statistics/, only severities that occur
+            'by_severity': {severity: totals[severity] for severity in severities if totals[severity]},
+            'recent': AlertRows.serialize(recent),
+        },
+    }
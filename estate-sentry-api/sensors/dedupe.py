@@ -0,0 +1,67 @@
+"""
+Recently seen reading idempotency keys.
+
+Clients that retry a reading submission send the same idempotency key (or
+device sequence number). The (sensor, idempotency_key) unique constraint on
+SensorReading is what guarantees a reading is stored once; this cache only
+saves the database round trip for the common case of a retry arriving at
+the process that stored the original, a few seconds later.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class RecentReadings:
+    """
+    Bounded per-sensor LRU of idempotency key -> stored reading.
+
+    Holds up to `keys_per_sensor` keys for each of the `max_sensors` most
+    recently active sensors. Readings are kept (not just keys) so that a
+    duplicate can be answered with the original reading.
+    """
+
+    def __init__(self, max_sensors, keys_per_sensor):
+        self.max_sensors = max_sensors
+        self.keys_per_sensor = keys_per_sensor
+        self._sensors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sensor_id, key):
+        """Return the reading stored under this key, or None if not remembered."""
+        with self._lock:
+            keys = self._sensors.get(sensor_id)
+            if keys is None or key not in keys:
+                return None
+            self._sensors.move_to_end(sensor_id)
+            keys.move_to_end(key)
+            return keys[key]
+
+    def remember(self, sensor_id, key, reading):
+        with self._lock:
+            keys = self._sensors.get(sensor_id)
+            if keys is None:
+                keys = self._sensors[sensor_id] = OrderedDict()
+                if len(self._sensors) > self.max_sensors:
+                    self._sensors.popitem(last=False)
+            else:
+                self._sensors.move_to_end(sensor_id)
+            keys[key] = reading
+            keys.move_to_end(key)
+            if len(keys) > self.keys_per_sensor:
+                keys.popitem(last=False)
+
+    def forget(self, sensor_id=None):
+        """Drop remembered keys for one sensor, or for all of them."""
+        with self._lock:
+            if sensor_id is None:
+                self._sensors.clear()
+            else:
+                self._sensors.pop(sensor_id, None)
+
+
+recent_readings = RecentReadings(
+    max_sensors=settings.READING_IDEMPOTENCY_SENSORS,
+    keys_per_sensor=settings.READING_IDEMPOTENCY_KEYS_PER_SENSOR,
+)
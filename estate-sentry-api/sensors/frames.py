@@ -0,0 +1,269 @@
+"""
+Content-addressed storage for camera frames.
+
+Frames are streamed to disk in chunks and stored under their SHA-256 hash,
+so identical frames (from any camera) share a single file. A 64-bit
+difference hash is computed for every frame so that near-duplicate frames
+from the same camera can be dropped before they are stored or analysed.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import CameraFrame
+
+FRAME_CHUNK_SIZE = 64 * 1024
+FRAMES_DIR = 'frames'
+
+
+class FrameTooLarge(Exception):
+    """Raised when an uploaded frame exceeds CAMERA_FRAME_MAX_BYTES."""
+
+
+class InvalidFrame(Exception):
+    """Raised when the uploaded bytes are not a readable image."""
+
+
+def frames_root():
+    """Return the directory holding content-addressed frames."""
+    return Path(settings.MEDIA_ROOT) / FRAMES_DIR
+
+
+def frame_relative_path(content_hash):
+    """Return the path of a frame relative to MEDIA_ROOT."""
+    return f"{FRAMES_DIR}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+
+def frame_path(content_hash):
+    """Return the absolute path of a stored frame."""
+    return Path(settings.MEDIA_ROOT) / frame_relative_path(content_hash)
+
+
+def spool_stream(stream, max_bytes=None):
+    """
+    Copy a file-like stream to a temporary file in chunks while hashing it.
+
+    Args:
+        stream: Object with a read(size) method (e.g. the request body)
+        max_bytes: Abort with FrameTooLarge once this many bytes were read
+
+    Returns:
+        Tuple of (content_hash, temp_path, size)
+    """
+    tmp_dir = frames_root() / 'tmp'
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = stream.read(FRAME_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise FrameTooLarge(f"Frame exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                tmp.write(chunk)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+    return digest.hexdigest(), Path(tmp_name), size
+
+
+def difference_hash(path):
+    """
+    Compute a 64-bit difference hash (dHash) of an image.
+
+    The image is reduced to a 9x8 grayscale thumbnail and each bit records
+    whether a pixel is brighter than its right-hand neighbour, which makes
+    the hash stable across re-encoding and small lighting changes.
+
+    Returns:
+        Tuple of (hash as 16-char hex string, width, height)
+    """
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            image.draft('L', (9 * 8, 8 * 8))
+            pixels = list(image.convert('L').resize((9, 8), Image.BILINEAR).getdata())
+    except (UnidentifiedImageError, OSError) as exc:
+        raise InvalidFrame(str(exc)) from exc
+
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+
+    return f"{value:016x}", width, height
+
+
+def hamming_distance(hash_a, hash_b):
+    """Return the number of differing bits between two hex hashes."""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+def commit_spooled_frame(tmp_path, content_hash):
+    """
+    Move a spooled frame into its content-addressed location.
+
+    If a frame with the same hash is already on disk the temporary file is
+    discarded instead, so exact duplicates are stored once.
+
+    Returns:
+        True if a new file was written, False if it already existed
+    """
+    target = frame_path(content_hash)
+    if target.exists():
+        tmp_path.unlink()
+        return False
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, target)
+    return True
+
+
+class NearDuplicateFilter:
+    """
+    Per-camera filter that drops frames too similar to the last kept one.
+
+    A frame within `max_distance` bits of the previously kept frame is
+    dropped, unless `keep_interval` seconds have passed since that frame was
+    kept, so a static scene is downsampled to one frame per interval rather
+    than dropped entirely.
+    """
+
+    def __init__(self, max_distance, keep_interval):
+        self.max_distance = max_distance
+        self.keep_interval = keep_interval
+        self._last_kept = {}
+        self._lock = threading.Lock()
+
+    def check(self, sensor_id, perceptual_hash, now=None, fallback=None):
+        """
+        Decide whether a frame should be kept, recording it if so.
+
+        Args:
+            sensor_id: Camera sensor primary key
+            perceptual_hash: Hex difference hash of the new frame
+            now: Monotonic timestamp (defaults to time.monotonic())
+            fallback: Callable returning the last kept hash for the camera
+                when this process has not seen it yet (e.g. after restart)
+
+        Returns:
+            Tuple of (keep: bool, distance: int or None)
+        """
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            last = self._last_kept.get(sensor_id)
+
+        if last is None and fallback is not None:
+            previous_hash = fallback()
+            if previous_hash:
+                last = (previous_hash, now)
+
+        if last is None:
+            distance = None
+        else:
+            last_hash, kept_at = last
+            distance = hamming_distance(last_hash, perceptual_hash)
+            if distance <= self.max_distance and now - kept_at < self.keep_interval:
+                with self._lock:
+                    self._last_kept.setdefault(sensor_id, last)
+                return False, distance
+
+        with self._lock:
+            self._last_kept[sensor_id] = (perceptual_hash, now)
+        return True, distance
+
+    def forget(self, sensor_id=None):
+        """Drop remembered state for one camera, or for all of them."""
+        with self._lock:
+            if sensor_id is None:
+                self._last_kept.clear()
+            else:
+                self._last_kept.pop(sensor_id, None)
+
+
+near_duplicate_filter = NearDuplicateFilter(
+    max_distance=settings.CAMERA_FRAME_DUPLICATE_DISTANCE,
+    keep_interval=settings.CAMERA_FRAME_KEEP_INTERVAL,
+)
+
+
+def store_frame(sensor, stream, content_type):
+    """
+    Store an uploaded camera frame unless it is a near-duplicate.
+
+    Args:
+        sensor: Camera Sensor instance
+        stream: File-like request body
+        content_type: MIME type declared by the client
+
+    Returns:
+        Tuple of (frame: CameraFrame or None, kept: bool, distance: int or None).
+        When the frame is dropped, `frame` is the last kept frame.
+    """
+    content_hash, tmp_path, size = spool_stream(
+        stream, max_bytes=settings.CAMERA_FRAME_MAX_BYTES
+    )
+
+    try:
+        perceptual_hash, width, height = difference_hash(tmp_path)
+    except InvalidFrame:
+        tmp_path.unlink()
+        raise
+
+    def last_kept_hash():
+        return (
+            CameraFrame.objects.filter(sensor=sensor)
+            .order_by('-last_uploaded_at')
+            .values_list('perceptual_hash', flat=True)
+            .first()
+        )
+
+    keep, distance = near_duplicate_filter.check(
+        sensor.pk, perceptual_hash, fallback=last_kept_hash
+    )
+
+    if not keep:
+        tmp_path.unlink()
+        frame = CameraFrame.objects.filter(sensor=sensor).order_by('-last_uploaded_at').first()
+        return frame, False, distance
+
+    commit_spooled_frame(tmp_path, content_hash)
+
+    now = timezone.now()
+    frame, created = CameraFrame.objects.get_or_create(
+        sensor=sensor,
+        content_hash=content_hash,
+        defaults={
+            'perceptual_hash': perceptual_hash,
+            'content_type': content_type,
+            'size': size,
+            'width': width,
+            'height': height,
+            'last_uploaded_at': now,
+        },
+    )
+    if not created:
+        CameraFrame.objects.filter(pk=frame.pk).update(
+            upload_count=F('upload_count') + 1,
+            last_uploaded_at=now,
+        )
+        frame.refresh_from_db()
+
+    return frame, True, distance
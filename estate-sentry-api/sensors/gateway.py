@@ -0,0 +1,460 @@
+"""
+Sensor gateway: signed readings over raw TCP or UDP, without the HTTP stack.
+
+For high-frequency contact and motion sensors, middleware, authentication,
+content negotiation and serializers cost far more than the reading itself.
+`manage.py run_gateway` runs an asyncio server that accepts compact binary
+frames, validates them with the same handlers as the readings endpoint and
+stores them in batches with ingest_readings(), so they go through the same
+de-duplication and threat detection.
+
+Frame layout (network byte order):
+
+    sensor id   8 bytes   unsigned integer
+    format      1 byte    0 = JSON body, 1 = MessagePack body
+    signature   32 bytes  HMAC-SHA256 of sensor id + format + body, keyed
+                          with the sensor's connection_config["gateway_key"]
+    body                  {"value": ..., "reading_type": ..., "seq": ..., "ts": ...}
+
+Over UDP each datagram is one frame and nothing is sent back. Over TCP each
+frame is preceded by its 4-byte length, and every frame is answered, in
+order and only once its batch is committed, with a length-prefixed JSON
+acknowledgement: {"seq": ..., "ok": true} or {"seq": ..., "ok": false,
+"error": "..."}. "seq" becomes the reading's idempotency_key, so a device
+that resends unacknowledged frames has each reading stored once.
+
+A body must carry "seq", "ts" (unix seconds) or both, so that a captured
+frame cannot be replayed to store a reading again: a repeated "seq" is
+stored once, and a "ts" more than GATEWAY_MAX_FRAME_AGE_SECONDS from the
+gateway's clock is rejected (without "seq", "ts" is the idempotency key).
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import struct
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from estate_sentry.formats import msgpack
+from estate_sentry.sharding import shard_aliases
+from monitoring.metrics import GATEWAY_FRAMES
+from .handlers import get_handler
+from .ingest import InvalidReading, clean_reading_value, ingest_readings
+from .models import Sensor
+
+HEADER = struct.Struct('!QB')
+LENGTH = struct.Struct('!I')
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+PREFIX_SIZE = HEADER.size + SIGNATURE_SIZE
+
+# Bytes read from a TCP connection at a time; every frame they complete is handled together
+READ_SIZE = 64 * 1024
+
+FORMAT_JSON = 0
+FORMAT_MSGPACK = 1
+
+# Keys shorter than this are treated as unset
+MIN_KEY_LENGTH = 16
+
+BODY_ERRORS = (ValueError, TypeError) + ((msgpack.UnpackException,) if msgpack is not None else ())
+
+
+class FrameError(Exception):
+    """A frame was malformed, wrongly signed or rejected."""
+
+
+def encode_body(document, fmt=FORMAT_JSON):
+    if fmt == FORMAT_MSGPACK:
+        return msgpack.packb(document, use_bin_type=True)
+    return json.dumps(document, separators=(',', ':')).encode()
+
+
+def encode_frame(sensor_id, key, document, fmt=FORMAT_JSON):
+    """Build a signed frame (without the TCP length prefix) for a reading."""
+    header = HEADER.pack(sensor_id, fmt)
+    body = encode_body(document, fmt)
+    signature = hmac.digest(key.encode(), header + body, 'sha256')
+    return header + signature + body
+
+
+def encode_ack(ack):
+    return json.dumps(ack, separators=(',', ':')).encode()
+
+
+def decode_body(fmt, body):
+    try:
+        if fmt == FORMAT_JSON:
+            document = json.loads(body)
+        elif fmt == FORMAT_MSGPACK and msgpack is not None:
+            document = msgpack.unpackb(body, raw=False)
+        else:
+            raise FrameError(f'Unsupported body format {fmt}')
+    except BODY_ERRORS as exc:
+        raise FrameError(f'Malformed body: {exc}')
+    if not isinstance(document, dict) or 'value' not in document:
+        raise FrameError("Body must be a map with a 'value'")
+    return document
+
+
+class Device:
+    """A sensor that may send frames, with its key and handler."""
+
+    __slots__ = ('sensor', 'key', 'handler')
+
+    def __init__(self, sensor=None, key=None):
+        self.sensor = sensor
+        self.key = key
+        self.handler = get_handler(sensor) if sensor else None
+
+    @classmethod
+    def for_sensor(cls, sensor):
+        """A Device for `sensor`, or an unknown one if it has no usable key."""
+        key = (sensor.connection_config or {}).get('gateway_key')
+        if not isinstance(key, str) or len(key) < MIN_KEY_LENGTH:
+            return cls()
+        return cls(sensor, key.encode())
+
+
+class SensorGateway:
+    """
+    Asyncio TCP/UDP server feeding readings to the database in batches.
+
+    Network I/O, signature checks and handler validation run on the event
+    loop. Database work (key loading and batch inserts) runs on a single
+    thread, so the next batch accumulates while the previous one commits.
+    Keys for every sensor with a gateway_key are loaded at start and
+    reloaded every GATEWAY_KEY_REFRESH_SECONDS; other sensor ids are looked
+    up when they first send a frame. Ids that turn out to be unknown are
+    kept in a bounded LRU for GATEWAY_UNKNOWN_SENSOR_SECONDS, so random ids
+    can neither grow memory nor hit the database on every frame.
+    """
+
+    def __init__(self, host=None, tcp_port=None, udp_port=None, batch_ms=None, max_batch=None):
+        self.host = host or settings.GATEWAY_HOST
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.batch_seconds = (batch_ms or settings.GATEWAY_BATCH_MS) / 1000
+        self.max_batch = max_batch or settings.GATEWAY_MAX_BATCH
+        self.max_pending = self.max_batch * 10
+        self.key_refresh = settings.GATEWAY_KEY_REFRESH_SECONDS
+        self.max_unknown = settings.GATEWAY_UNKNOWN_SENSORS
+        self.unknown_seconds = settings.GATEWAY_UNKNOWN_SENSOR_SECONDS
+        self.max_frame_age = settings.GATEWAY_MAX_FRAME_AGE_SECONDS
+        self.stats = {'frames': 0, 'stored': 0, 'rejected': 0, 'dropped': 0}
+
+        self._devices = {}
+        # Unknown sensor id -> monotonic time it may be looked up again, oldest first
+        self._unknown = OrderedDict()
+        self._lookups = {}
+        # Readings waiting to be stored, and one future per max_batch of them
+        self._pending = []
+        self._batches = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gateway-db')
+        self._tcp_server = None
+        self._udp_transport = None
+        self._tasks = []
+        self._connections = set()
+
+    @property
+    def tcp_address(self):
+        return self._tcp_server.sockets[0].getsockname()[:2] if self._tcp_server else None
+
+    @property
+    def udp_address(self):
+        return self._udp_transport.get_extra_info('sockname')[:2] if self._udp_transport else None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._devices = await loop.run_in_executor(self._executor, self._load_devices)
+        self._tasks = [loop.create_task(self._flush_loop()), loop.create_task(self._refresh_loop())]
+        if self.tcp_port is not None:
+            self._tcp_server = await asyncio.start_server(self._serve_tcp, self.host, self.tcp_port)
+        if self.udp_port is not None:
+            self._udp_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramProtocol(self), local_addr=(self.host, self.udp_port)
+            )
+
+    async def stop(self):
+        """Stop accepting frames, store what is pending and release the database thread."""
+        if self._tcp_server:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+        if self._udp_transport:
+            self._udp_transport.close()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        while self._pending:
+            await self._flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, connections.close_all)
+        self._executor.shutdown()
+
+    # Sensor keys
+
+    @staticmethod
+    def _load_devices():
+        close_old_connections()
+        devices = {}
+        for alias in shard_aliases():
+            sensors = Sensor.objects.using(alias).filter(connection_config__has_key='gateway_key')
+            devices.update((sensor.pk, Device.for_sensor(sensor)) for sensor in sensors.iterator())
+        return devices
+
+    @staticmethod
+    def _load_device(sensor_id):
+        close_old_connections()
+        for alias in shard_aliases():
+            sensor = Sensor.objects.using(alias).filter(pk=sensor_id).first()
+            if sensor:
+                return Device.for_sensor(sensor)
+        return Device()
+
+    async def _refresh_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.key_refresh)
+            try:
+                self._devices = await loop.run_in_executor(self._executor, self._load_devices)
+            except Exception:
+                # Keep serving with the keys already loaded
+                pass
+
+    async def _lookup(self, sensor_id):
+        """Load a sensor that was not among the preloaded keys."""
+        lookup = self._lookups.get(sensor_id)
+        if lookup is None:
+            lookup = self._lookups[sensor_id] = asyncio.get_running_loop().run_in_executor(
+                self._executor, self._load_device, sensor_id
+            )
+            lookup.add_done_callback(lambda _: self._lookups.pop(sensor_id, None))
+        try:
+            device = await asyncio.shield(lookup)
+        except Exception:
+            # Left unloaded: the frame is rejected and the next one retries
+            return
+        if device.key is None:
+            self._unknown[sensor_id] = time.monotonic() + self.unknown_seconds
+            self._unknown.move_to_end(sensor_id)
+            while len(self._unknown) > self.max_unknown:
+                self._unknown.popitem(last=False)
+        else:
+            self._devices[sensor_id] = device
+            self._unknown.pop(sensor_id, None)
+
+    def _needs_lookup(self, frame):
+        if len(frame) < HEADER.size:
+            return False
+        sensor_id = HEADER.unpack_from(frame)[0]
+        if sensor_id in self._devices:
+            return False
+        retry_at = self._unknown.get(sensor_id)
+        return retry_at is None or retry_at <= time.monotonic()
+
+    # Frame intake
+
+    def receive(self, frame, transport='tcp'):
+        """
+        Accept one frame. The sensor should already be loaded (see _lookup).
+
+        Returns:
+            The acknowledgement dict for a rejected frame, or a (seq, batch)
+            pair whose batch future resolves to None once stored (or to an
+            error message)
+        """
+        self.stats['frames'] += 1
+        if len(frame) < PREFIX_SIZE:
+            return self._reject(transport, None, 'Frame too short')
+
+        sensor_id, fmt = HEADER.unpack_from(frame)
+        device = self._devices.get(sensor_id)
+        if device is None or device.key is None:
+            return self._reject(transport, None, 'Unknown sensor')
+        body = frame[PREFIX_SIZE:]
+        expected = hmac.digest(device.key, frame[:HEADER.size] + body, 'sha256')
+        if not hmac.compare_digest(frame[HEADER.size:PREFIX_SIZE], expected):
+            return self._reject(transport, None, 'Bad signature')
+
+        seq = None
+        try:
+            document = decode_body(fmt, body)
+            seq = document.get('seq')
+            ts = document.get('ts')
+            if ts is not None:
+                if type(ts) not in (int, float):
+                    raise FrameError("'ts' must be unix seconds")
+                if abs(time.time() - ts) > self.max_frame_age:
+                    raise FrameError('Stale frame')
+            elif seq is None:
+                raise FrameError("Body must carry 'seq' or 'ts'")
+            reading_type = document.get('reading_type')
+            if reading_type is not None and (not isinstance(reading_type, str) or len(reading_type) > 100):
+                raise FrameError('Invalid reading_type')
+            fields = {'value': clean_reading_value(device.sensor, document['value'], device.handler)}
+        except (FrameError, InvalidReading) as exc:
+            return self._reject(transport, seq, str(exc))
+
+        if reading_type:
+            fields['reading_type'] = reading_type
+        fields['idempotency_key'] = str(seq)[:100] if seq is not None else f'ts:{ts!r}'
+
+        if len(self._pending) % self.max_batch == 0:
+            self._batches.append(asyncio.get_running_loop().create_future())
+        self._pending.append((device.sensor, fields, transport))
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        if len(self._pending) >= self.max_pending:
+            self._space.clear()
+        return seq, self._batches[-1]
+
+    def _reject(self, transport, seq, error):
+        self.stats['rejected'] += 1
+        GATEWAY_FRAMES.labels(transport, 'rejected').inc()
+        return {'seq': seq, 'ok': False, 'error': error}
+
+    # Batching
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.batch_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                await self._flush()
+
+    async def _flush(self):
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        future = self._batches.pop(0)
+        if len(self._pending) < self.max_pending:
+            self._space.set()
+
+        items = [(sensor, fields) for sensor, fields, _ in batch]
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._store, items)
+            error = None
+        except Exception as exc:
+            error = f'Storage failed: {exc}'
+
+        result = 'stored' if error is None else 'failed'
+        for transport, count in Counter(transport for _, _, transport in batch).items():
+            GATEWAY_FRAMES.labels(transport, result).inc(count)
+        if error is None:
+            self.stats['stored'] += len(batch)
+        future.set_result(error)
+
+    @staticmethod
+    def _store(items):
+        close_old_connections()
+        return ingest_readings(items)
+
+    # Transports
+
+    async def _serve_tcp(self, reader, writer):
+        # asyncio (before 3.12) keeps no reference to connection handler
+        # tasks, so an idle one could be garbage collected with its socket
+        task = asyncio.current_task()
+        self._connections.add(task)
+        acks = asyncio.Queue()
+        ack_writer = asyncio.ensure_future(self._write_acks(writer, acks))
+        max_frame = settings.GATEWAY_MAX_FRAME_BYTES
+        buffer = b''
+        try:
+            while True:
+                try:
+                    data = await reader.read(READ_SIZE)
+                except ConnectionError:
+                    break
+                if not data:
+                    break
+                buffer += data
+
+                # Every complete frame in the buffer; acks for them are written together
+                slots, offset, too_large = [], 0, False
+                while len(buffer) - offset >= LENGTH.size:
+                    (length,) = LENGTH.unpack_from(buffer, offset)
+                    if length > max_frame:
+                        slots.append(self._reject('tcp', None, 'Frame too large'))
+                        too_large = True
+                        break
+                    end = offset + LENGTH.size + length
+                    if end > len(buffer):
+                        break
+                    frame = buffer[offset + LENGTH.size:end]
+                    if self._needs_lookup(frame):
+                        await self._lookup(HEADER.unpack_from(frame)[0])
+                    slots.append(self.receive(frame, 'tcp'))
+                    offset = end
+                buffer = buffer[offset:]
+                if slots:
+                    acks.put_nowait(slots)
+                if too_large:
+                    break
+                if not self._space.is_set():
+                    await self._space.wait()
+        finally:
+            acks.put_nowait(None)
+            await ack_writer
+            writer.close()
+            self._connections.discard(task)
+
+    @staticmethod
+    async def _write_acks(writer, acks):
+        connected = True
+        while True:
+            slots = await acks.get()
+            if slots is None:
+                return
+            payloads = []
+            for slot in slots:
+                if isinstance(slot, tuple):
+                    seq, batch = slot
+                    error = await batch
+                    if error is None and type(seq) is int:
+                        # The common case, without the JSON encoder
+                        payload = b'{"seq":%d,"ok":true}' % seq
+                    elif error is None:
+                        payload = encode_ack({'seq': seq, 'ok': True})
+                    else:
+                        payload = encode_ack({'seq': seq, 'ok': False, 'error': error})
+                else:
+                    payload = encode_ack(slot)
+                payloads.append(LENGTH.pack(len(payload)))
+                payloads.append(payload)
+            if not connected:
+                continue
+            writer.write(b''.join(payloads))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                connected = False
+
+    def _receive_datagram(self, data):
+        if not self._space.is_set():
+            self.stats['dropped'] += 1
+            GATEWAY_FRAMES.labels('udp', 'dropped').inc()
+            return
+        if self._needs_lookup(data):
+            asyncio.ensure_future(self._receive_after_lookup(data))
+        else:
+            self.receive(data, 'udp')
+
+    async def _receive_after_lookup(self, data):
+        await self._lookup(HEADER.unpack_from(data)[0])
+        self.receive(data, 'udp')
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    def datagram_received(self, data, addr):
+        self.gateway._receive_datagram(data)
@@ -2,5 +2,6 @@
 Sensor handler framework for processing different sensor types.
 """
 from .base import BaseSensorHandler
+from .registry import HANDLER_REGISTRY, get_handler, get_handler_class
 
-__all__ = ['BaseSensorHandler']
+__all__ = ['BaseSensorHandler', 'HANDLER_REGISTRY', 'get_handler', 'get_handler_class']
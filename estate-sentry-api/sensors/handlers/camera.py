@@ -26,6 +26,7 @@ class CameraHandler(BaseSensorHandler):
         """Process camera sensor reading."""
         return {
             'image_url': data.get('image_url'),
+            'thumbnail_url': data.get('thumbnail_url'),
             'motion_detected': data.get('motion_detected', False),
             'timestamp': data.get('timestamp'),
             'metadata': data.get('metadata', {}),
@@ -47,6 +48,7 @@ class CameraHandler(BaseSensorHandler):
                 'metadata': {
                     'reading_id': reading.id,
                     'image_url': reading.value.get('image_url'),
+                    'thumbnail_url': reading.value.get('thumbnail_url'),
                     'timestamp': str(reading.timestamp),
                 }
             })
@@ -0,0 +1,22 @@
+"""
+Mapping of sensor types to their handler classes.
+"""
+from .camera import CameraHandler
+from .contact import ContactHandler
+
+HANDLER_REGISTRY = {
+    'DOOR_CONTACT': ContactHandler,
+    'WINDOW_CONTACT': ContactHandler,
+    'CAMERA': CameraHandler,
+}
+
+
+def get_handler_class(sensor_type):
+    """Return the handler class for a sensor type, or None if unsupported."""
+    return HANDLER_REGISTRY.get(sensor_type)
+
+
+def get_handler(sensor):
+    """Return a handler instance for a sensor, or None if its type has no handler."""
+    handler_class = get_handler_class(sensor.sensor_type)
+    return handler_class(sensor) if handler_class else None
@@ -0,0 +1,193 @@
+"""
+Sensor liveness: coalesced last_seen updates and offline detection.
+
+Every reading or heartbeat marks its sensor as seen, but `last_seen` is only
+written when the stored value is older than SENSOR_LAST_SEEN_WRITE_INTERVAL,
+so chatty sensors cost one UPDATE per interval rather than one per reading.
+
+OfflineDetector keeps each sensor's next expected check-in in a min-heap.
+It learns about new check-ins with an indexed `last_seen > cursor` query and
+only loads the sensors whose deadline has passed, so the work per tick is
+proportional to the sensors that changed, not to the whole fleet.
+"""
+import heapq
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from alerts.models import Alert
+from estate_sentry.response_cache import invalidate_user
+from monitoring.metrics import ALERTS_CREATED
+from .models import Sensor
+
+# Re-read check-ins this far behind the cursor, to catch rows committed late.
+POLL_OVERLAP = timedelta(seconds=5)
+
+
+class LastSeenTracker:
+    """Coalesces last_seen writes per sensor within this process."""
+
+    def __init__(self):
+        self._written = {}
+        self._lock = threading.Lock()
+
+    def touch(self, sensor, now=None):
+        """
+        Record that a sensor checked in.
+
+        Returns:
+            True if last_seen was written to the database
+        """
+        now = now or timezone.now()
+        interval = timedelta(seconds=settings.SENSOR_LAST_SEEN_WRITE_INTERVAL)
+        recovering = sensor.status == 'ERROR'
+
+        with self._lock:
+            written = self._written.get(sensor.pk) or sensor.last_seen
+            if not recovering and written is not None and now - written < interval:
+                return False
+            self._written[sensor.pk] = now
+
+        updates = {'last_seen': now}
+        if recovering:
+            updates['status'] = 'ACTIVE'
+        # Also coalesce across processes: skip if another process wrote recently
+        Sensor.objects.filter(
+            Q(last_seen__isnull=True) | Q(last_seen__lte=now - interval) | Q(status='ERROR'),
+            pk=sensor.pk,
+        ).update(**updates)
+        sensor.last_seen = now
+        if recovering:
+            sensor.status = 'ACTIVE'
+        invalidate_user(sensor.owner_id)
+        return True
+
+    def forget(self):
+        with self._lock:
+            self._written.clear()
+
+
+last_seen_tracker = LastSeenTracker()
+
+
+def heartbeat_deadline(sensor_interval, last_seen):
+    """Time after which a sensor last seen at `last_seen` counts as offline."""
+    interval = sensor_interval or settings.SENSOR_HEARTBEAT_INTERVAL
+    # last_seen may lag the real check-in by up to one coalescing interval
+    return last_seen + timedelta(seconds=interval + settings.SENSOR_LAST_SEEN_WRITE_INTERVAL)
+
+
+class OfflineDetector:
+    """
+    Marks sensors offline when their expected heartbeat deadline passes.
+
+    The heap holds (deadline, sensor_id) entries; `_deadlines` holds each
+    sensor's current deadline, so entries superseded by a newer check-in are
+    skipped when they reach the top instead of being removed from the heap.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+        self._cursor = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, sensor_id, deadline):
+        if self._deadlines.get(sensor_id) == deadline:
+            return
+        self._deadlines[sensor_id] = deadline
+        heapq.heappush(self._heap, (deadline, sensor_id))
+
+    def load(self, now=None):
+        """Schedule every active sensor that has checked in at least once."""
+        now = now or timezone.now()
+        self._heap = []
+        self._deadlines = {}
+        rows = Sensor.objects.filter(status='ACTIVE', last_seen__isnull=False).values_list(
+            'id', 'heartbeat_interval', 'last_seen'
+        )
+        for sensor_id, interval, last_seen in rows.iterator(chunk_size=2000):
+            self.schedule(sensor_id, heartbeat_deadline(interval, last_seen))
+        self._cursor = now
+
+    def poll(self, now=None):
+        """Reschedule sensors that checked in since the last poll."""
+        now = now or timezone.now()
+        if self._cursor is None:
+            return self.load(now)
+
+        rows = Sensor.objects.filter(
+            last_seen__gt=self._cursor - POLL_OVERLAP, status='ACTIVE'
+        ).values_list('id', 'heartbeat_interval', 'last_seen')
+        for sensor_id, interval, last_seen in rows:
+            self.schedule(sensor_id, heartbeat_deadline(interval, last_seen))
+        self._cursor = now
+
+    def next_deadline(self):
+        """Earliest pending deadline, or None when nothing is scheduled."""
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def expire(self, now=None):
+        """
+        Mark sensors whose deadline passed as offline.
+
+        Returns:
+            List of sensors that were marked offline
+        """
+        now = now or timezone.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, sensor_id = heapq.heappop(self._heap)
+            if self._deadlines.get(sensor_id) == deadline:
+                del self._deadlines[sensor_id]
+                due.append(sensor_id)
+
+        offline = []
+        for sensor in Sensor.objects.filter(id__in=due).select_related('owner'):
+            # Re-check: the sensor may have checked in since the last poll
+            if sensor.status != 'ACTIVE' or sensor.last_seen is None:
+                continue
+            deadline = heartbeat_deadline(sensor.heartbeat_interval, sensor.last_seen)
+            if deadline > now:
+                self.schedule(sensor.id, deadline)
+                continue
+            if self._mark_offline(sensor, now):
+                offline.append(sensor)
+        return offline
+
+    def tick(self, now=None):
+        """Poll for check-ins, then expire overdue sensors."""
+        now = now or timezone.now()
+        self.poll(now)
+        return self.expire(now)
+
+    @staticmethod
+    def _mark_offline(sensor, now):
+        updated = Sensor.objects.filter(pk=sensor.pk, status='ACTIVE', last_seen=sensor.last_seen).update(
+            status='ERROR'
+        )
+        if not updated:
+            return False
+        sensor.status = 'ERROR'
+
+        silent_minutes = int((now - sensor.last_seen).total_seconds() // 60)
+        Alert.objects.create(
+            alert_type='SYSTEM',
+            severity='HIGH',
+            title=f"{sensor.name} Offline",
+            description=f"The {sensor.location} {sensor.get_sensor_type_display().lower()} "
+                        f"has not checked in for {silent_minutes} minutes.",
+            user=sensor.owner,
+            sensor=sensor,
+            metadata={'reason': 'offline', 'last_seen': sensor.last_seen.isoformat()},
+        )
+        invalidate_user(sensor.owner_id)
+        ALERTS_CREATED.labels('SYSTEM', 'HIGH').inc()
+        return True
@@ -0,0 +1,406 @@
+"""
+Reading ingestion pipeline: storage, threat detection and alert creation.
+"""
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Case, JSONField, Q, Value, When
+from django.utils import timezone
+
+from alerts.models import Alert
+from estate_sentry.response_cache import invalidate_user
+from estate_sentry.sharding import current_shard, shard_for_owner, sharding_enabled, use_shard
+from monitoring.metrics import (
+    ALERTS_CREATED, DETECTIONS_SUPPRESSED, HANDLER_DURATION, READINGS_DEDUPLICATED, READINGS_INGESTED
+)
+from monitoring.profiling import current_profile
+from .arming import arming_index
+from .dedupe import recent_readings
+from .handlers import get_handler
+from .heartbeat import last_seen_tracker
+from .models import Sensor, SensorReading
+from .writer import ingest_writer
+
+INSERT_COLUMNS = ('sensor_id', 'timestamp', 'value', 'reading_type', 'processed', 'idempotency_key')
+
+
+def call_handler(handler, method, *args):
+    """Call a handler method, recording its latency for profiling and metrics."""
+    # Timed inline rather than with span() and Histogram.time(): this runs
+    # once or twice per reading, and the context managers cost more than
+    # most handlers
+    started = time.perf_counter()
+    try:
+        return getattr(handler, method)(*args)
+    finally:
+        elapsed = time.perf_counter() - started
+        HANDLER_DURATION.labels(handler.__class__.__name__, method).observe(elapsed)
+        profile = current_profile()
+        if profile is not None:
+            profile.add('handler', elapsed)
+
+
+class InvalidReading(ValueError):
+    """A reading value was rejected by its sensor's handler."""
+
+
+def clean_reading_value(sensor, value, handler=None):
+    """
+    Validate and normalize a reading value with the sensor's handler.
+
+    Returns:
+        The value to store (unchanged for sensor types without a handler)
+
+    Raises:
+        InvalidReading: if the handler rejects the value
+    """
+    handler = handler or get_handler(sensor)
+    if handler is None:
+        return value
+
+    is_valid, error_message = call_handler(handler, 'validate_reading', value)
+    if not is_valid:
+        raise InvalidReading(error_message)
+    return call_handler(handler, 'process_reading', value)
+
+
+def record_reading(sensor, **fields):
+    """Store a validated reading for a sensor and make it the sensor's last reading."""
+    reading = SensorReading.objects.create(sensor=sensor, **fields)
+    if update_last_readings([reading]):
+        sensor.last_reading_id = reading.pk
+        sensor.last_reading_at = reading.timestamp
+        sensor.last_reading_value = reading.value
+    last_seen_tracker.touch(sensor, reading.timestamp)
+    invalidate_user(sensor.owner_id, using=reading._state.db)
+    READINGS_INGESTED.labels(sensor.sensor_type).inc()
+    return reading
+
+
+def process_reading_for_threats(reading):
+    """
+    Run threat detection on a stored reading and create any alerts.
+
+    Returns:
+        List of created Alert instances
+    """
+    handler = get_handler(reading.sensor)
+    alerts = detect_alerts(handler, reading) if handler else []
+
+    # Create alerts if any threats detected
+    for alert in alerts:
+        alert.save()
+        ALERTS_CREATED.labels(alert.alert_type, alert.severity).inc()
+    if alerts:
+        invalidate_user(reading.sensor.owner_id, using=reading._state.db)
+
+    # Mark reading as processed
+    reading.processed = True
+    reading.save()
+
+    return alerts
+
+
+def detect_alerts(handler, reading):
+    """
+    Run a handler's threat detection on a stored reading; returns unsaved Alerts.
+
+    Detection is skipped for sensors whose zone is disarmed at the reading's
+    timestamp (see sensors/arming.py).
+    """
+    mode = arming_index.suppressing_mode(reading.sensor, reading.timestamp)
+    if mode is not None:
+        DETECTIONS_SUPPRESSED.labels(reading.sensor.sensor_type, mode).inc()
+        return []
+    return [
+        Alert(user_id=reading.sensor.owner_id, sensor=reading.sensor, **alert_data)
+        for alert_data in call_handler(handler, 'detect_threats', reading)
+    ]
+
+
+def ingest_reading(sensor, fields):
+    """
+    Store a validated reading and run threat detection on it.
+
+    A reading with an idempotency_key that was already stored for the
+    sensor is not stored or processed again; the original is returned.
+    """
+    key = fields.get('idempotency_key')
+    if not key:
+        reading = record_reading(sensor, **fields)
+        process_reading_for_threats(reading)
+        return reading
+
+    reading = recent_readings.get(sensor.pk, key)
+    if reading is not None:
+        READINGS_DEDUPLICATED.labels('cache').inc()
+        return reading
+
+    using = router.db_for_write(SensorReading)
+    try:
+        with transaction.atomic(using=using):
+            reading = record_reading(sensor, **fields)
+    except IntegrityError:
+        # Stored earlier by another process, or before this one restarted
+        reading = SensorReading.objects.filter(sensor=sensor, idempotency_key=key).first()
+        if reading is None:
+            raise
+        READINGS_DEDUPLICATED.labels('database').inc()
+    else:
+        process_reading_for_threats(reading)
+    # Only cache committed readings (the ingest writer batches commits)
+    transaction.on_commit(lambda: recent_readings.remember(sensor.pk, key, reading), using=using)
+    return reading
+
+
+def ingest_readings(items):
+    """
+    Store many validated readings and run threat detection on them, with a
+    handful of bulk queries instead of several queries per reading.
+
+    Readings whose idempotency_key is already stored (or repeated within
+    the batch) are skipped, as in ingest_reading. If a concurrent writer
+    stores one of the keys first, the batch falls back to ingest_reading
+    per item.
+
+    Args:
+        items: List of (sensor, fields) pairs, fields as for ingest_reading
+
+    Returns:
+        One stored SensorReading per item (the original one for duplicates)
+    """
+    if sharding_enabled() and current_shard() is None:
+        return ingest_sharded_readings(items)
+
+    keys = defaultdict(set)
+    for sensor, fields in items:
+        if fields.get('idempotency_key'):
+            keys[sensor.pk].add(fields['idempotency_key'])
+    stored = {}
+    if keys:
+        ids = find_idempotency_keys(keys)
+        if ids:
+            readings = SensorReading.objects.in_bulk(ids.values())
+            stored = {pair: readings[pk] for pair, pk in ids.items()}
+
+    results, new = [], []
+    now = timezone.now()
+    # Assigning the sensor through the descriptor consults the router per row
+    sensor_field = SensorReading._meta.get_field('sensor')
+    for sensor, fields in items:
+        key = fields.get('idempotency_key')
+        if key and (sensor.pk, key) in stored:
+            READINGS_DEDUPLICATED.labels('database').inc()
+            results.append(stored[(sensor.pk, key)])
+            continue
+        # Stored as processed: detection runs in the same transaction
+        reading = SensorReading(sensor_id=sensor.pk, timestamp=now, processed=True, **fields)
+        sensor_field.set_cached_value(reading, sensor)
+        if key:
+            stored[(sensor.pk, key)] = reading
+        new.append(reading)
+        results.append(reading)
+
+    alias = router.db_for_write(SensorReading)
+    try:
+        with transaction.atomic(using=alias):
+            insert_readings(new)
+            update_last_readings(new)
+            handlers, alerts = {}, []
+            for reading in new:
+                if reading.sensor_id not in handlers:
+                    handlers[reading.sensor_id] = get_handler(reading.sensor)
+                if handlers[reading.sensor_id]:
+                    alerts.extend(detect_alerts(handlers[reading.sensor_id], reading))
+            Alert.objects.bulk_create(alerts)
+    except IntegrityError:
+        return [ingest_reading(sensor, fields) for sensor, fields in items]
+
+    sensors = {reading.sensor_id: reading.sensor for reading in new}
+    for sensor in sensors.values():
+        last_seen_tracker.touch(sensor, now)
+    invalidate_user(*{sensor.owner_id for sensor in sensors.values()}, using=alias)
+    for sensor_type, count in Counter(sensor.sensor_type for sensor in (r.sensor for r in new)).items():
+        READINGS_INGESTED.labels(sensor_type).inc(count)
+    for alert in alerts:
+        ALERTS_CREATED.labels(alert.alert_type, alert.severity).inc()
+    return results
+
+
+def ingest_sharded_readings(items):
+    """ingest_readings for a batch from several owners: each shard's items in turn."""
+    shards, groups = {}, defaultdict(list)
+    for index, (sensor, _) in enumerate(items):
+        if sensor.owner_id not in shards:
+            shards[sensor.owner_id] = shard_for_owner(sensor.owner_id, for_write=True)
+        groups[shards[sensor.owner_id]].append(index)
+
+    results = [None] * len(items)
+    for alias, indexes in groups.items():
+        with use_shard(alias):
+            for index, reading in zip(indexes, ingest_readings([items[index] for index in indexes])):
+                results[index] = reading
+    return results
+
+
+def insert_readings(readings):
+    """
+    Insert readings with multi-row INSERT ... RETURNING statements and set
+    their primary keys.
+
+    Skips the per-row model machinery of bulk_create, which costs more than
+    the insert itself for small rows. `timestamp` must already be set.
+    """
+    connection = connections[router.db_for_write(SensorReading)]
+    if not connection.features.can_return_rows_from_bulk_insert:
+        SensorReading.objects.bulk_create(readings)
+        return
+
+    ops = connection.ops
+    columns = ', '.join(ops.quote_name(column) for column in INSERT_COLUMNS)
+    table = ops.quote_name(SensorReading._meta.db_table)
+    row_placeholder = '(' + ', '.join(['%s'] * len(INSERT_COLUMNS)) + ')'
+    rows_per_statement = min(1000, (connection.features.max_query_params or 65535) // len(INSERT_COLUMNS))
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(readings), rows_per_statement):
+            chunk = readings[start:start + rows_per_statement]
+            params, timestamps = [], {}
+            for reading in chunk:
+                if reading.timestamp not in timestamps:
+                    timestamps[reading.timestamp] = ops.adapt_datetimefield_value(reading.timestamp)
+                params.extend((
+                    reading.sensor_id,
+                    timestamps[reading.timestamp],
+                    ops.adapt_json_value(reading.value, None),
+                    reading.reading_type,
+                    reading.processed,
+                    reading.idempotency_key,
+                ))
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([row_placeholder] * len(chunk))} RETURNING id",
+                params,
+            )
+            for reading, (pk,) in zip(chunk, cursor.fetchall()):
+                reading.pk = pk
+                reading._state.adding = False
+
+
+def update_last_readings(readings):
+    """
+    Point each sensor's last_reading fields at the newest of the given
+    readings, unless the sensor already has a newer one.
+
+    Readings are ordered by (timestamp, id), as in the reading history. The
+    guard is part of the UPDATE, so a reading that commits after a newer one
+    (another writer, a retried batch) never moves the pointer back. Call it
+    in the transaction that stores the readings, where there is one. One
+    statement covers all sensors, up to the query parameter limit.
+
+    Returns:
+        Number of sensors updated
+    """
+    newest = {}
+    for reading in readings:
+        current = newest.get(reading.sensor_id)
+        if current is None or (reading.timestamp, reading.pk) > (current.timestamp, current.pk):
+            newest[reading.sensor_id] = reading
+    latest = list(newest.values())
+
+    connection = connections[router.db_for_write(Sensor)]
+    # Eleven parameters per sensor across the guard and CASE expressions
+    per_statement = max(1, (connection.features.max_query_params or 65535) // 11)
+    updated = 0
+    for start in range(0, len(latest), per_statement):
+        chunk = latest[start:start + per_statement]
+        older = Q()
+        for reading in chunk:
+            older |= Q(pk=reading.sensor_id) & (
+                Q(last_reading_at__isnull=True)
+                | Q(last_reading_at__lt=reading.timestamp)
+                | Q(last_reading_at=reading.timestamp, last_reading_id__lt=reading.pk)
+            )
+        if len(chunk) == 1:
+            values = {
+                'last_reading_id': chunk[0].pk,
+                'last_reading_at': chunk[0].timestamp,
+                'last_reading_value': Value(chunk[0].value, output_field=JSONField()),
+            }
+        else:
+            values = {
+                field: Case(*[
+                    When(pk=reading.sensor_id, then=Value(get(reading), output_field=output_field))
+                    for reading in chunk
+                ], output_field=output_field)
+                for field, get, output_field in [
+                    ('last_reading_id', lambda reading: reading.pk, Sensor._meta.get_field('last_reading')),
+                    ('last_reading_at', lambda reading: reading.timestamp, Sensor._meta.get_field('last_reading_at')),
+                    ('last_reading_value', lambda reading: reading.value, JSONField()),
+                ]
+            }
+        updated += Sensor.objects.filter(older).update(**values)
+    return updated
+
+
+def find_idempotency_keys(keys):
+    """
+    Look up stored idempotency keys.
+
+    Builds one (sensor_id = ? AND idempotency_key IN (...)) branch per
+    sensor, so the unique index is probed once per key rather than once
+    per sensor and key combination, and reads only the index.
+
+    Args:
+        keys: Dict of sensor id to a collection of idempotency keys
+
+    Returns:
+        Dict of (sensor id, idempotency key) to reading id
+    """
+    connection = connections[router.db_for_read(SensorReading)]
+    ops = connection.ops
+    select = (
+        f"SELECT {ops.quote_name('id')}, {ops.quote_name('sensor_id')}, {ops.quote_name('idempotency_key')} "
+        f"FROM {ops.quote_name(SensorReading._meta.db_table)} WHERE "
+    )
+    max_params = connection.features.max_query_params or 65535
+
+    # Group sensors into statements that stay under the parameter limit
+    statements, params = [[]], 0
+    for sensor_id, sensor_keys in keys.items():
+        if statements[-1] and params + len(sensor_keys) + 1 > max_params:
+            statements.append([])
+            params = 0
+        statements[-1].append((sensor_id, list(sensor_keys)))
+        params += len(sensor_keys) + 1
+
+    found = {}
+    with connection.cursor() as cursor:
+        for statement in statements:
+            branches = [
+                f"({ops.quote_name('sensor_id')} = %s AND "
+                f"{ops.quote_name('idempotency_key')} IN ({', '.join(['%s'] * len(sensor_keys))}))"
+                for _, sensor_keys in statement
+            ]
+            cursor.execute(
+                select + ' OR '.join(branches),
+                [param for sensor_id, sensor_keys in statement for param in (sensor_id, *sensor_keys)],
+            )
+            for pk, sensor_id, key in cursor.fetchall():
+                found[(sensor_id, key)] = pk
+    return found
+
+
+def submit_reading(sensor, **fields):
+    """
+    Ingest a validated reading, through the single writer thread when
+    SQLITE_WRITER_ENABLED is set.
+
+    Returns:
+        The stored, processed SensorReading
+    """
+    if settings.SQLITE_WRITER_ENABLED:
+        future = ingest_writer.submit(ingest_reading, sensor, fields)
+        return future.result(timeout=settings.SQLITE_WRITER_TIMEOUT)
+    return ingest_reading(sensor, fields)
@@ -0,0 +1,56 @@
+"""
+Mark sensors offline when they miss their heartbeat.
+
+Examples:
+    python manage.py detect_offline_sensors
+    python manage.py detect_offline_sensors --once
+    python manage.py detect_offline_sensors --shard shard1
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from estate_sentry.sharding import shard_aliases, use_shard
+from sensors.heartbeat import OfflineDetector
+
+
+class Command(BaseCommand):
+    help = 'Raise SYSTEM alerts and set status ERROR for sensors that stop checking in.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single check and exit')
+        parser.add_argument(
+            '--poll', type=float, default=5.0,
+            help='Maximum seconds between polls for new check-ins'
+        )
+        parser.add_argument(
+            '--shard', default='default',
+            help='Database shard whose sensors to watch; run one detector per shard'
+        )
+
+    def handle(self, *args, **options):
+        if options['shard'] not in shard_aliases():
+            raise CommandError(f"Unknown shard {options['shard']!r}")
+        with use_shard(options['shard']):
+            self.watch(options)
+
+    def watch(self, options):
+        detector = OfflineDetector()
+        detector.load()
+        self.stdout.write(f"Tracking {len(detector)} sensors")
+
+        while True:
+            close_old_connections()
+            for sensor in detector.tick():
+                self.stdout.write(self.style.WARNING(f"Offline: {sensor} (last seen {sensor.last_seen})"))
+            if options['once']:
+                return
+
+            # Sleep until the next deadline, but poll for check-ins regularly
+            delay = options['poll']
+            deadline = detector.next_deadline()
+            if deadline is not None:
+                delay = min(delay, max((deadline - timezone.now()).total_seconds(), 0))
+            time.sleep(delay)
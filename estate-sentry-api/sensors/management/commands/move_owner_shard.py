@@ -0,0 +1,43 @@
+"""
+Move a user's sensors, readings, camera frames and alerts to another
+database shard, for rebalancing (see estate_sentry/sharding.py).
+
+Examples:
+    python manage.py move_owner_shard alice shard2
+    python manage.py move_owner_shard alice shard2 --wait 0 --chunk-size 5000
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from estate_sentry.response_cache import invalidate_user
+from estate_sentry.sharding import check_move, move_owner, shard_for_owner, sharding_enabled
+
+
+class Command(BaseCommand):
+    help = "Move an owner's data to another shard; their writes are refused with 503 while it runs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('shard', help='Target alias from DATABASE_SHARDS')
+        parser.add_argument(
+            '--wait', type=float, default=5.0,
+            help='Seconds to let in-flight writes finish after refusing new ones'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows copied per INSERT')
+
+    def handle(self, *args, **options):
+        if not sharding_enabled():
+            raise CommandError('Sharding is not enabled: set DATABASE_SHARDS')
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user {options['username']!r}")
+        try:
+            check_move(shard_for_owner(user.pk), options['shard'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        result = move_owner(user.pk, options['shard'], chunk_size=options['chunk_size'], wait=options['wait'])
+        invalidate_user(user.pk)
+        self.stdout.write(f"Moved {user.username} from {result['source']} to {options['shard']}")
+        for label, count in result['moved'].items():
+            self.stdout.write(f"  {label:<22} {count:>10}")
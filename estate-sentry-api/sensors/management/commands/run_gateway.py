@@ -0,0 +1,69 @@
+"""
+Run the TCP/UDP sensor gateway.
+
+Examples:
+    python manage.py run_gateway
+    python manage.py run_gateway --tcp-port 7700 --no-udp --report 10
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors.gateway import SensorGateway
+
+
+class Command(BaseCommand):
+    help = 'Accept signed sensor readings over raw TCP and UDP and store them in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default=settings.GATEWAY_HOST)
+        parser.add_argument('--tcp-port', type=int, default=settings.GATEWAY_TCP_PORT)
+        parser.add_argument('--udp-port', type=int, default=settings.GATEWAY_UDP_PORT)
+        parser.add_argument('--no-tcp', action='store_true', help='Do not listen on TCP')
+        parser.add_argument('--no-udp', action='store_true', help='Do not listen on UDP')
+        parser.add_argument('--batch-ms', type=int, default=settings.GATEWAY_BATCH_MS)
+        parser.add_argument('--max-batch', type=int, default=settings.GATEWAY_MAX_BATCH)
+        parser.add_argument(
+            '--report', type=float, default=60.0, help='Seconds between throughput reports'
+        )
+
+    def handle(self, *args, **options):
+        if options['no_tcp'] and options['no_udp']:
+            raise CommandError('Nothing to listen on: both --no-tcp and --no-udp given')
+
+        gateway = SensorGateway(
+            host=options['host'],
+            tcp_port=None if options['no_tcp'] else options['tcp_port'],
+            udp_port=None if options['no_udp'] else options['udp_port'],
+            batch_ms=options['batch_ms'],
+            max_batch=options['max_batch'],
+        )
+        try:
+            asyncio.run(self._serve(gateway, options['report']))
+        except KeyboardInterrupt:
+            pass
+
+    async def _serve(self, gateway, report):
+        await gateway.start()
+        if gateway.tcp_address:
+            self.stdout.write(f"Listening on tcp://{gateway.tcp_address[0]}:{gateway.tcp_address[1]}")
+        if gateway.udp_address:
+            self.stdout.write(f"Listening on udp://{gateway.udp_address[0]}:{gateway.udp_address[1]}")
+
+        try:
+            last, last_at = dict(gateway.stats), time.perf_counter()
+            while True:
+                await asyncio.sleep(report)
+                now = time.perf_counter()
+                elapsed = now - last_at
+                stats = dict(gateway.stats)
+                self.stdout.write(
+                    f"{(stats['stored'] - last['stored']) / elapsed:.0f} readings/sec stored, "
+                    f"{stats['rejected'] - last['rejected']} rejected, "
+                    f"{stats['dropped'] - last['dropped']} dropped in {elapsed:.0f}s"
+                )
+                last, last_at = stats, now
+        finally:
+            await gateway.stop()
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CameraFrame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(db_index=True, help_text='SHA-256 of the frame bytes (also its storage key)', max_length=64)),
+                ('perceptual_hash', models.CharField(help_text='64-bit difference hash used for near-duplicate detection', max_length=16)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.PositiveIntegerField(help_text='Frame size in bytes')),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('upload_count', models.PositiveIntegerField(default=1, help_text='Number of times this exact frame was uploaded and kept')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_uploaded_at', models.DateTimeField()),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='frames', to='sensors.sensor')),
+            ],
+            options={
+                'verbose_name': 'Camera Frame',
+                'verbose_name_plural': 'Camera Frames',
+                'db_table': 'camera_frames',
+                'ordering': ['-last_uploaded_at'],
+                'indexes': [models.Index(fields=['sensor', '-last_uploaded_at'], name='camera_fram_sensor__b660df_idx')],
+                'constraints': [models.UniqueConstraint(fields=('sensor', 'content_hash'), name='camera_frame_unique_per_sensor')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0002_camera_frame'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensor',
+            name='heartbeat_interval',
+            field=models.PositiveIntegerField(blank=True, help_text='Expected seconds between check-ins (defaults to SENSOR_HEARTBEAT_INTERVAL)', null=True),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Last reading or heartbeat (updated at most every SENSOR_LAST_SEEN_WRITE_INTERVAL seconds)', null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-19 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0003_sensor_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorreading',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Client-chosen key or device sequence number; retries with the same key are stored once', max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='sensorreading',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', False)), fields=('sensor', 'idempotency_key'), name='sensor_reading_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-19 16:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_last_readings(apps, schema_editor):
+    Sensor = apps.get_model('sensors', 'Sensor')
+    SensorReading = apps.get_model('sensors', 'SensorReading')
+    newest = SensorReading.objects.filter(sensor=OuterRef('pk')).order_by('-timestamp', '-id')
+    Sensor.objects.update(
+        last_reading=Subquery(newest.values('pk')[:1]),
+        last_reading_at=Subquery(newest.values('timestamp')[:1]),
+        last_reading_value=Subquery(newest.values('value')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0004_reading_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensor',
+            name='last_reading',
+            field=models.ForeignKey(blank=True, help_text='Newest reading, by timestamp then id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sensors.sensorreading'),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='last_reading_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='last_reading_value',
+            field=models.JSONField(blank=True, help_text='Normalized value of the newest reading', null=True),
+        ),
+        migrations.RunPython(copy_last_readings, migrations.RunPython.noop),
+    ]
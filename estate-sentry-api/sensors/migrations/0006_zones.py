@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0005_sensor_last_reading'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('mode', models.CharField(choices=[('ARMED', 'Armed (Away)'), ('STAY', 'Armed (Stay)'), ('DISARMED', 'Disarmed')], default='ARMED', help_text='Mode outside scheduled periods', max_length=20)),
+                ('schedule', models.JSONField(blank=True, default=list, help_text='Scheduled modes: [{"days": [0-6, Monday is 0], "start": "HH:MM", "end": "HH:MM", "mode": ...}]')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Zone',
+                'verbose_name_plural': 'Zones',
+                'db_table': 'zones',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='zone',
+            field=models.ForeignKey(blank=True, help_text='Arming zone; sensors outside a zone are always armed', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sensors', to='sensors.zone'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_owner_shards'),
+        ('sensors', '0006_zones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArmingVersion',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='arming_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Arming Version',
+                'verbose_name_plural': 'Arming Versions',
+                'db_table': 'arming_versions',
+            },
+        ),
+    ]
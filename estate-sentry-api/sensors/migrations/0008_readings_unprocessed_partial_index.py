@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0007_arming_versions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='sensorreading',
+            name='sensor_read_process_92d7a6_idx',
+        ),
+        migrations.AddIndex(
+            model_name='sensorreading',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['processed'], name='readings_unprocessed'),
+        ),
+    ]
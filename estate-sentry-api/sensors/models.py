@@ -2,6 +2,74 @@ from django.db import models
 from django.conf import settings
 
 
+class Zone(models.Model):
+    """
+    A group of an owner's sensors that is armed and disarmed together.
+    Detection for intrusion sensors in a disarmed zone is skipped (see
+    sensors/arming.py).
+    """
+
+    MODE_CHOICES = [
+        ('ARMED', 'Armed (Away)'),
+        ('STAY', 'Armed (Stay)'),
+        ('DISARMED', 'Disarmed'),
+    ]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='zones'
+    )
+    name = models.CharField(max_length=255)
+    mode = models.CharField(
+        max_length=20,
+        choices=MODE_CHOICES,
+        default='ARMED',
+        help_text='Mode outside scheduled periods'
+    )
+    schedule = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Scheduled modes: [{"days": [0-6, Monday is 0], "start": "HH:MM", "end": "HH:MM", "mode": ...}]'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'zones'
+        verbose_name = 'Zone'
+        verbose_name_plural = 'Zones'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.get_mode_display()})"
+
+
+class ArmingVersion(models.Model):
+    """
+    Counter bumped by every change to an owner's zones or sensor zone
+    assignments; processes compare it with their in-memory arming index
+    (see sensors/arming.py).
+    """
+
+    owner = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='arming_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'arming_versions'
+        verbose_name = 'Arming Version'
+        verbose_name_plural = 'Arming Versions'
+
+    def __str__(self):
+        return f"{self.owner_id} @ {self.version}"
+
+
 class Sensor(models.Model):
     """
     Represents a physical or virtual sensor device.
@@ -59,6 +127,44 @@ class Sensor(models.Model):
         related_name='sensors'
     )
 
+    zone = models.ForeignKey(
+        Zone,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sensors',
+        help_text='Arming zone; sensors outside a zone are always armed'
+    )
+
+    # Liveness tracking
+    last_seen = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text='Last reading or heartbeat (updated at most every SENSOR_LAST_SEEN_WRITE_INTERVAL seconds)'
+    )
+    heartbeat_interval = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Expected seconds between check-ins (defaults to SENSOR_HEARTBEAT_INTERVAL)'
+    )
+
+    # Current state, copied from the newest reading at ingestion (sensors/ingest.py)
+    last_reading = models.ForeignKey(
+        'SensorReading',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text='Newest reading, by timestamp then id'
+    )
+    last_reading_at = models.DateTimeField(null=True, blank=True)
+    last_reading_value = models.JSONField(
+        null=True,
+        blank=True,
+        help_text='Normalized value of the newest reading'
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -103,15 +209,86 @@ class SensorReading(models.Model):
         help_text='Whether this reading has been processed for threat detection'
     )
 
+    idempotency_key = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        help_text='Client-chosen key or device sequence number; retries with the same key are stored once'
+    )
+
     class Meta:
         db_table = 'sensor_readings'
         verbose_name = 'Sensor Reading'
         verbose_name_plural = 'Sensor Readings'
         ordering = ['-timestamp']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sensor', 'idempotency_key'],
+                condition=models.Q(idempotency_key__isnull=False),
+                name='sensor_reading_idempotency_key',
+            ),
+        ]
         indexes = [
             models.Index(fields=['sensor', '-timestamp']),
-            models.Index(fields=['processed']),
+            # Nearly all readings are processed, so only the backlog is indexed
+            models.Index(fields=['processed'], condition=models.Q(processed=False), name='readings_unprocessed'),
         ]
 
     def __str__(self):
         return f"{self.sensor.name} - {self.timestamp}"
+
+
+class CameraFrame(models.Model):
+    """
+    An image uploaded by a camera sensor.
+    Frame bytes are stored once under MEDIA_ROOT, addressed by their SHA-256
+    hash; each camera gets one row per distinct frame it has uploaded.
+    """
+
+    sensor = models.ForeignKey(
+        Sensor,
+        on_delete=models.CASCADE,
+        related_name='frames'
+    )
+
+    content_hash = models.CharField(
+        max_length=64,
+        db_index=True,
+        help_text='SHA-256 of the frame bytes (also its storage key)'
+    )
+
+    perceptual_hash = models.CharField(
+        max_length=16,
+        help_text='64-bit difference hash used for near-duplicate detection'
+    )
+
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveIntegerField(help_text='Frame size in bytes')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+
+    upload_count = models.PositiveIntegerField(
+        default=1,
+        help_text='Number of times this exact frame was uploaded and kept'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_uploaded_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'camera_frames'
+        verbose_name = 'Camera Frame'
+        verbose_name_plural = 'Camera Frames'
+        ordering = ['-last_uploaded_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sensor', 'content_hash'],
+                name='camera_frame_unique_per_sensor'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['sensor', '-last_uploaded_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.sensor.name} - {self.content_hash[:12]}"
@@ -0,0 +1,168 @@
+"""
+On-demand resized renditions of stored camera frames.
+
+Renditions are generated on first request and cached on disk under
+MEDIA_ROOT/renditions. The cache is bounded by total size and evicts the
+least recently used files first. Processes sharing the directory evict
+each other's files, so readers use open(), which regenerates a file that
+disappears before it is opened; an open file stays readable after it is
+evicted.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from .frames import frame_path
+
+RENDITIONS_DIR = 'renditions'
+
+# Rendition name -> longest edge in pixels
+RENDITION_SIZES = {
+    'thumb': 160,
+    'medium': 640,
+}
+
+
+class RenditionCache:
+    """
+    Size-bounded LRU cache of rendition files.
+
+    The index is built lazily from the files on disk (ordered by access
+    time) so the cache survives restarts, then kept in memory. Access times
+    are also written back to the files so other processes sharing the
+    directory evict in roughly the same order.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = None
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @property
+    def root(self):
+        return Path(settings.MEDIA_ROOT) / RENDITIONS_DIR
+
+    def path_for(self, content_hash, rendition):
+        return self.root / rendition / content_hash[:2] / f"{content_hash}.jpg"
+
+    def _load(self):
+        entries = []
+        if self.root.exists():
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    path = Path(dirpath) / filename
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_atime, path, stat.st_size))
+        entries.sort(key=lambda entry: entry[0])
+        self._entries = OrderedDict((path, size) for _, path, size in entries)
+        self._total = sum(self._entries.values())
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            self._load()
+
+    def get(self, content_hash, rendition):
+        """
+        Return the path to a rendition, generating it if necessary.
+
+        Returns:
+            Path to the rendition file, or None if the source frame is missing
+        """
+        path = self.path_for(content_hash, rendition)
+
+        with self._lock:
+            self._ensure_loaded()
+            if path in self._entries:
+                try:
+                    os.utime(path, ns=(time.time_ns(), path.stat().st_mtime_ns))
+                    self._entries.move_to_end(path)
+                    return path
+                except FileNotFoundError:
+                    # Evicted by another process
+                    self._total -= self._entries.pop(path)
+
+        source = frame_path(content_hash)
+        if not source.exists():
+            return None
+
+        size = self._render(source, path, RENDITION_SIZES[rendition])
+
+        with self._lock:
+            self._ensure_loaded()
+            self._total -= self._entries.pop(path, 0)
+            self._entries[path] = size
+            self._total += size
+            self._evict(keep=path)
+
+        return path
+
+    def open(self, content_hash, rendition, attempts=3):
+        """
+        Open a rendition for reading, generating it if necessary.
+
+        Returns:
+            Binary file object, or None if the source frame is missing
+        """
+        for attempt in range(attempts):
+            path = self.get(content_hash, rendition)
+            if path is None:
+                return None
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                # Evicted between get() and open(); generate it again
+                if attempt == attempts - 1:
+                    raise
+                with self._lock:
+                    if self._entries is not None:
+                        self._total -= self._entries.pop(path, 0)
+
+    def _render(self, source, target, max_edge):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(source) as image:
+            image.draft('RGB', (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            image.thumbnail((max_edge, max_edge))
+
+            fd, tmp_name = tempfile.mkstemp(dir=target.parent)
+            with os.fdopen(fd, 'wb') as tmp:
+                image.save(tmp, format='JPEG', quality=80, optimize=True)
+        os.replace(tmp_name, target)
+        return target.stat().st_size
+
+    def _evict(self, keep=None):
+        while self._total > self.max_bytes and self._entries:
+            path, size = next(iter(self._entries.items()))
+            if path == keep and len(self._entries) == 1:
+                break
+            del self._entries[path]
+            self._total -= size
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            self._ensure_loaded()
+            return self._total
+
+    def reset(self):
+        """Forget the in-memory index (it is rebuilt from disk on next use)."""
+        with self._lock:
+            self._entries = None
+            self._total = 0
+
+
+rendition_cache = RenditionCache(max_bytes=settings.CAMERA_RENDITION_CACHE_BYTES)
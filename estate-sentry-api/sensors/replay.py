@@ -0,0 +1,228 @@
+"""
+Replay stored readings through the sensor handlers.
+
+Re-runs threat detection over a time range after handler logic changes,
+and backtests new rules: a dry run reports the alerts that would have
+fired without writing anything, apply mode creates them and marks the
+readings processed. A handler class can be swapped in per sensor type
+without registering it.
+
+Work is split by sensor. Sensors with readings in the range are assigned
+to REPLAY_WORKERS shards, each to the least loaded shard by reading
+count, largest first, and every shard runs in its own process with its
+own database connection. A sensor's readings are streamed in timestamp
+order with iterator(), which uses a server-side cursor on PostgreSQL, and
+fetched REPLAY_CHUNK_SIZE rows at a time.
+
+Apply mode only replays readings that are not processed yet, so running
+it again creates no duplicate alerts. On SQLite it needs WAL mode
+(SQLITE_PRODUCTION_MODE) to run more than one worker. A sensor's alerts and processed
+flags are written in one transaction after its readings have been read:
+SQLite does not isolate an open cursor from writes to the table it reads.
+"""
+import heapq
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+from alerts.models import Alert
+from estate_sentry.response_cache import invalidate_user
+from estate_sentry.sharding import current_shard, use_shard
+from monitoring.metrics import ALERTS_CREATED
+from .handlers import get_handler_class
+from .ingest import detect_alerts
+from .models import Sensor, SensorReading
+
+# Alerts listed in a replay's results; the rest are only counted
+SAMPLE_ALERTS = 20
+
+
+def replay_queryset(start=None, end=None, sensor_ids=None, apply=False):
+    """Readings a replay covers: start <= timestamp < end, unprocessed only when applying."""
+    readings = SensorReading.objects.all()
+    if start is not None:
+        readings = readings.filter(timestamp__gte=start)
+    if end is not None:
+        readings = readings.filter(timestamp__lt=end)
+    if sensor_ids is not None:
+        readings = readings.filter(sensor_id__in=sensor_ids)
+    if apply:
+        readings = readings.filter(processed=False)
+    return readings
+
+
+def shard_sensors(counts, workers):
+    """
+    Split sensors into at most `workers` shards with similar reading counts.
+
+    Args:
+        counts: Dict of sensor id to its number of readings to replay
+
+    Returns:
+        List of non-empty lists of sensor ids
+    """
+    shards = [[] for _ in range(max(1, min(workers, len(counts))))]
+    loads = [(0, index) for index in range(len(shards))]
+    for sensor_id, count in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+        load, index = heapq.heappop(loads)
+        shards[index].append(sensor_id)
+        heapq.heappush(loads, (load + count, index))
+    return [shard for shard in shards if shard]
+
+
+def replay_readings(start=None, end=None, sensor_ids=None, apply=False, handlers=None, workers=None,
+                    chunk_size=None):
+    """
+    Replay stored readings through the handlers, sharded by sensor across
+    worker processes.
+
+    Args:
+        start: Replay readings at or after this datetime (default: all)
+        end: Replay readings before this datetime (default: all)
+        sensor_ids: Limit the replay to these sensors
+        apply: Create the alerts and mark readings processed instead of a dry run
+        handlers: Dict of sensor type to handler class dotted path, used
+            instead of the registry's handler for that type
+        workers: Worker processes (default REPLAY_WORKERS); 1 replays in
+            this process
+        chunk_size: Rows fetched per round trip (default REPLAY_CHUNK_SIZE)
+
+    Returns:
+        Dict with the mode, counts of sensors, readings and alerts, alerts
+        by type and severity, a sample of the alerts, and readings/sec
+    """
+    handlers = dict(handlers or {})
+    for path in handlers.values():
+        import_string(path)  # Fail before starting workers
+    workers = workers or settings.REPLAY_WORKERS
+    if apply and not concurrent_writers_supported():
+        workers = 1
+    chunk_size = chunk_size or settings.REPLAY_CHUNK_SIZE
+
+    started = time.perf_counter()
+    readings = replay_queryset(start, end, sensor_ids, apply)
+    counts = dict(readings.order_by().values_list('sensor').annotate(count=Count('pk')))
+    shards = shard_sensors(counts, workers)
+    # Workers do not inherit the caller's context, so they get its shard explicitly
+    alias = current_shard()
+    jobs = [(shard, start, end, apply, handlers, chunk_size, alias) for shard in shards]
+
+    if len(jobs) <= 1:
+        results = [replay_shard(*job) for job in jobs]
+    else:
+        # Workers must open their own connections, not share the parent's
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=len(jobs), initializer=setup_worker) as pool:
+            results = list(pool.map(replay_shard, *zip(*jobs)))
+    elapsed = time.perf_counter() - started
+
+    alerts, owners, sample, replayed = Counter(), set(), [], 0
+    for result in results:
+        replayed += result['readings']
+        alerts.update(result['alerts'])
+        owners.update(result['owners'])
+        sample.extend(result['sample'])
+
+    if apply:
+        for (alert_type, severity), count in alerts.items():
+            ALERTS_CREATED.labels(alert_type, severity).inc(count)
+        invalidate_user(*owners)
+
+    by_type, by_severity = Counter(), Counter()
+    for (alert_type, severity), count in alerts.items():
+        by_type[alert_type] += count
+        by_severity[severity] += count
+
+    return {
+        'mode': 'apply' if apply else 'dry_run',
+        'sensors': len(counts),
+        'workers': len(jobs),
+        'readings': replayed,
+        'alerts': sum(alerts.values()),
+        'by_type': dict(by_type),
+        'by_severity': dict(by_severity),
+        'sample': sorted(sample, key=lambda alert: alert['timestamp'])[:SAMPLE_ALERTS],
+        'elapsed': round(elapsed, 3),
+        'readings_per_sec': round(replayed / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def concurrent_writers_supported():
+    """
+    Whether several processes can apply at once. SQLite outside WAL mode
+    locks readers out while a write commits, so parallel workers' long reads
+    and writes fail with 'database is locked'.
+    """
+    connection = connections[router.db_for_write(SensorReading)]
+    if connection.vendor != 'sqlite':
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0].lower() == 'wal'
+
+
+def setup_worker():
+    # Forked workers inherit a configured Django; spawned ones start bare
+    if not apps.ready:
+        django.setup()
+
+
+def replay_shard(sensor_ids, start, end, apply, handlers, chunk_size, alias=None):
+    """
+    Replay one shard's sensors (runs in a worker process), on database
+    shard `alias` if given.
+
+    Returns:
+        Dict with 'readings', 'alerts' (a Counter of (alert_type, severity)),
+        'owners' of sensors that got alerts and a 'sample' of the alerts
+    """
+    if alias is not None:
+        with use_shard(alias):
+            return replay_shard(sensor_ids, start, end, apply, handlers, chunk_size)
+    handler_classes = {sensor_type: import_string(path) for sensor_type, path in handlers.items()}
+    sensor_field = SensorReading._meta.get_field('sensor')
+    alerts, owners, sample, replayed = Counter(), set(), [], 0
+
+    for sensor in Sensor.objects.filter(pk__in=sensor_ids):
+        handler_class = handler_classes.get(sensor.sensor_type) or get_handler_class(sensor.sensor_type)
+        handler = handler_class(sensor) if handler_class else None
+        readings = replay_queryset(start, end, [sensor.pk], apply)
+        created, last_pk = [], None
+
+        for reading in readings.order_by('timestamp', 'id').iterator(chunk_size=chunk_size):
+            sensor_field.set_cached_value(reading, sensor)
+            replayed += 1
+            last_pk = reading.pk if last_pk is None else max(last_pk, reading.pk)
+            if handler is None:
+                continue
+            for alert in detect_alerts(handler, reading):
+                alerts[(alert.alert_type, alert.severity)] += 1
+                if len(sample) < SAMPLE_ALERTS:
+                    sample.append({
+                        'sensor': sensor.pk,
+                        'sensor_name': sensor.name,
+                        'reading': reading.pk,
+                        'timestamp': reading.timestamp.isoformat(),
+                        'alert_type': alert.alert_type,
+                        'severity': alert.severity,
+                        'title': alert.title,
+                    })
+                if apply:
+                    created.append(alert)
+
+        if apply and last_pk is not None:
+            with transaction.atomic(using=router.db_for_write(Alert)):
+                Alert.objects.bulk_create(created, batch_size=chunk_size)
+                # Readings stored during the replay have higher ids
+                readings.filter(pk__lte=last_pk).update(processed=True)
+            if created:
+                owners.add(sensor.owner_id)
+
+    return {'readings': replayed, 'alerts': alerts, 'owners': owners, 'sample': sample}
@@ -1,5 +1,40 @@
 from rest_framework import serializers
-from .models import Sensor, SensorReading
+from estate_sentry.fast_serializers import RowSerializer, iso_datetime
+from django.utils import timezone
+from .arming import compile_schedule, mode_at
+from .ingest import InvalidReading, clean_reading_value, submit_reading
+from .models import Sensor, SensorReading, CameraFrame, Zone
+
+
+class ZoneSerializer(serializers.ModelSerializer):
+    """Serializer for Zone model."""
+
+    mode_display = serializers.CharField(source='get_mode_display', read_only=True)
+    current_mode = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Zone
+        fields = [
+            'id', 'name', 'mode', 'mode_display', 'schedule', 'current_mode',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def get_current_mode(self, obj):
+        """The mode in effect now, after the schedule."""
+        return mode_at(obj.mode, compile_schedule(obj.schedule), timezone.now())
+
+    def validate_schedule(self, value):
+        try:
+            compile_schedule(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+    def create(self, validated_data):
+        """Set the owner to the current user."""
+        validated_data['owner'] = self.context['request'].user
+        return super().create(validated_data)
 
 
 class SensorSerializer(serializers.ModelSerializer):
@@ -14,9 +49,19 @@ class SensorSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'sensor_type', 'sensor_type_display', 'location',
             'status', 'status_display', 'handler_class', 'connection_config',
-            'metadata', 'owner', 'owner_username', 'created_at', 'updated_at'
+            'metadata', 'owner', 'owner_username', 'zone', 'last_seen', 'heartbeat_interval',
+            'last_reading', 'last_reading_at', 'last_reading_value',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'owner', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'owner', 'last_seen', 'last_reading', 'last_reading_at', 'last_reading_value',
+            'created_at', 'updated_at'
+        ]
+
+    def validate_zone(self, value):
+        if value is not None and value.owner_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('Zone not found')
+        return value
 
     def create(self, validated_data):
         """Set the owner to the current user."""
@@ -33,16 +78,32 @@ class SensorReadingSerializer(serializers.ModelSerializer):
         model = SensorReading
         fields = [
             'id', 'sensor', 'sensor_name', 'timestamp', 'value',
-            'reading_type', 'processed'
+            'reading_type', 'processed', 'idempotency_key'
         ]
         read_only_fields = ['id', 'timestamp', 'processed']
 
 
+class SensorReadingRows(RowSerializer):
+    """Read-only SensorReadingSerializer output built from values() rows."""
+
+    columns = (
+        ('id', 'id', None),
+        ('sensor', 'sensor', None),
+        ('sensor_name', 'sensor__name', None),
+        ('timestamp', 'timestamp', iso_datetime),
+        ('value', 'value', None),
+        ('reading_type', 'reading_type', None),
+        ('processed', 'processed', None),
+        ('idempotency_key', 'idempotency_key', None),
+    )
+
+
 class SensorReadingCreateSerializer(serializers.Serializer):
     """Serializer for creating sensor readings with validation."""
 
     value = serializers.JSONField()
     reading_type = serializers.CharField(required=False, allow_blank=True)
+    idempotency_key = serializers.CharField(required=False, max_length=100)
 
     def validate(self, data):
         """Validate the reading data using the sensor's handler."""
@@ -51,35 +112,62 @@ class SensorReadingCreateSerializer(serializers.Serializer):
         if not sensor:
             raise serializers.ValidationError("Sensor context is required")
 
-        # Get the appropriate handler for this sensor type
-        from .handlers.contact import ContactHandler
-        from .handlers.camera import CameraHandler
+        # Retrying clients may send the key as a header instead
+        request = self.context.get('request')
+        if 'idempotency_key' not in data and request is not None:
+            header = request.headers.get('Idempotency-Key', '').strip()
+            if header:
+                if len(header) > 100:
+                    raise serializers.ValidationError(
+                        {'idempotency_key': 'Ensure this field has no more than 100 characters.'}
+                    )
+                data['idempotency_key'] = header
+
+        # Validate and normalize the value with the sensor type's handler
+        try:
+            data['value'] = clean_reading_value(sensor, data['value'])
+        except InvalidReading as exc:
+            raise serializers.ValidationError({'value': str(exc)})
+
+        return data
 
-        handler_map = {
-            'DOOR_CONTACT': ContactHandler,
-            'WINDOW_CONTACT': ContactHandler,
-            'CAMERA': CameraHandler,
-        }
+    def create(self, validated_data):
+        """Create a sensor reading and run threat detection on it."""
+        return submit_reading(self.context['sensor'], **validated_data)
 
-        handler_class = handler_map.get(sensor.sensor_type)
 
-        if handler_class:
-            handler = handler_class(sensor)
-            is_valid, error_message = handler.validate_reading(data['value'])
+class ReplayRequestSerializer(serializers.Serializer):
+    """Serializer for replaying a user's stored readings through the handlers."""
 
-            if not is_valid:
-                raise serializers.ValidationError({'value': error_message})
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    sensors = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    apply = serializers.BooleanField(default=False)
 
-            # Process the reading data
-            data['value'] = handler.process_reading(data['value'])
+    def validate_sensors(self, value):
+        """Only the user's own sensors can be replayed."""
+        owned = set(
+            Sensor.objects.filter(owner=self.context['request'].user, pk__in=value).values_list('pk', flat=True)
+        )
+        unknown = sorted(set(value) - owned)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown sensors: {', '.join(map(str, unknown))}")
+        return sorted(owned)
 
+    def validate(self, data):
+        if 'start' in data and 'end' in data and data['start'] >= data['end']:
+            raise serializers.ValidationError({'end': 'Must be after start.'})
         return data
 
-    def create(self, validated_data):
-        """Create a sensor reading."""
-        sensor = self.context['sensor']
-        reading = SensorReading.objects.create(
-            sensor=sensor,
-            **validated_data
-        )
-        return reading
+
+class CameraFrameSerializer(serializers.ModelSerializer):
+    """Serializer for CameraFrame model."""
+
+    class Meta:
+        model = CameraFrame
+        fields = [
+            'id', 'sensor', 'content_hash', 'perceptual_hash', 'content_type',
+            'size', 'width', 'height', 'upload_count', 'created_at',
+            'last_uploaded_at'
+        ]
+        read_only_fields = fields
@@ -1,3 +1,1348 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, router
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from authentication.models import OwnerShard, User
+from estate_sentry.async_http import HTTPResponse
+from estate_sentry.formats import cbor2, msgpack
+from estate_sentry.response_cache import LOCAL_CACHE_ALIAS, data_version
+from estate_sentry.sharding import (
+    SHARD_ID_BLOCK, OwnerDirectory, OwnerMoving, check_move, hash_shard, move_owner, owner_directory,
+    shard_for_owner, use_owner_shard, use_shard
+)
+from .arming import arming_index, bump_arming_version, compile_schedule, mode_at
+from .dedupe import RecentReadings, recent_readings
+from .gateway import FORMAT_MSGPACK, LENGTH, SensorGateway, encode_frame
+from .handlers import BaseSensorHandler
+from .heartbeat import OfflineDetector, last_seen_tracker
+from .ingest import ingest_readings, record_reading, update_last_readings
+from .frames import near_duplicate_filter, frame_path, difference_hash, hamming_distance
+from .renditions import RenditionCache, rendition_cache
+from .replay import replay_readings, shard_sensors
+from .models import Sensor, SensorReading, CameraFrame, Zone
+from .writer import IngestWriter
+from alerts.feed import AlertFeed, load_alerts
+from alerts.models import Alert
+from notifications.escalation import EscalationScheduler
+from notifications.models import EscalationDeadline
+from webhooks.delivery import FEED_NAME as WEBHOOK_FEED, WebhookWorker
+from webhooks.models import WebhookSubscription
+
+
+def make_image(shade=0, size=(64, 48), fmt='PNG'):
+    """Return encoded image bytes with a horizontal gradient."""
+    image = Image.new('L', size)
+    image.putdata([min(x * 3 + shade, 255) for y in range(size[1]) for x in range(size[0])])
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+class CameraFrameUploadTestCase(TestCase):
+    """Test cases for content-addressed camera frame uploads."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        near_duplicate_filter.forget()
+
+        self.user = User.objects.create_user(username='camowner', password='testpass')
+        self.camera = Sensor.objects.create(
+            name='Driveway Camera', sensor_type='CAMERA', location='Driveway', owner=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = f'/api/sensors/{self.camera.id}/frames/'
+
+    def upload(self, body, content_type='image/png'):
+        return self.client.post(self.url, data=body, content_type=content_type)
+
+    def test_upload_stores_frame_and_creates_reading(self):
+        """Test a new frame is stored by hash and analysed as a reading."""
+        response = self.upload(make_image())
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['stored'])
+        frame = CameraFrame.objects.get(sensor=self.camera)
+        self.assertTrue(frame_path(frame.content_hash).exists())
+        reading = SensorReading.objects.get(sensor=self.camera)
+        self.assertIn(frame.content_hash, reading.value['image_url'])
+        self.assertTrue(reading.processed)
+
+    def test_near_duplicate_frame_is_dropped(self):
+        """Test a near-identical frame inside the keep interval is not stored."""
+        self.upload(make_image())
+        response = self.upload(make_image(shade=2))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['stored'])
+        self.assertEqual(CameraFrame.objects.count(), 1)
+        self.assertEqual(SensorReading.objects.count(), 1)
+
+    def test_exact_duplicates_share_one_file(self):
+        """Test re-uploading identical bytes reuses the stored frame."""
+        near_duplicate_filter.keep_interval = 0
+        self.addCleanup(setattr, near_duplicate_filter, 'keep_interval', 60)
+        body = make_image()
+
+        self.upload(body)
+        response = self.upload(body)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        frame = CameraFrame.objects.get(sensor=self.camera)
+        self.assertEqual(frame.upload_count, 2)
+        self.assertEqual(SensorReading.objects.count(), 2)
+
+    def test_different_frame_is_kept(self):
+        """Test a visually different frame is stored alongside the first."""
+        self.upload(make_image())
+        inverted = Image.open(io.BytesIO(make_image())).transpose(Image.FLIP_LEFT_RIGHT)
+        buffer = io.BytesIO()
+        inverted.save(buffer, format='PNG')
+
+        response = self.upload(buffer.getvalue())
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(CameraFrame.objects.count(), 2)
+
+    def test_rejects_non_image_and_non_camera(self):
+        """Test uploads are limited to image bodies for camera sensors."""
+        response = self.upload(b'not an image', content_type='text/plain')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        response = self.upload(b'not an image')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        door = Sensor.objects.create(
+            name='Front Door', sensor_type='DOOR_CONTACT', location='Hall', owner=self.user
+        )
+        response = self.client.post(
+            f'/api/sensors/{door.id}/frames/', data=make_image(), content_type='image/png'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_difference_hash_survives_reencoding(self):
+        """Test the perceptual hash is stable across image formats."""
+        png = tempfile.NamedTemporaryFile(suffix='.png', dir=self.media_root, delete=False)
+        png.write(make_image())
+        png.close()
+        jpeg = tempfile.NamedTemporaryFile(suffix='.jpg', dir=self.media_root, delete=False)
+        jpeg.write(make_image(fmt='JPEG'))
+        jpeg.close()
+
+        png_hash, width, height = difference_hash(png.name)
+        jpeg_hash, _, _ = difference_hash(jpeg.name)
+
+        self.assertEqual((width, height), (64, 48))
+        self.assertLessEqual(hamming_distance(png_hash, jpeg_hash), 5)
+
+
+class CameraFrameMediaTestCase(TestCase):
+    """Test cases for serving camera frames and renditions."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        near_duplicate_filter.forget()
+        rendition_cache.reset()
+        self.addCleanup(rendition_cache.reset)
+
+        self.user = User.objects.create_user(username='viewer', password='testpass')
+        camera = Sensor.objects.create(
+            name='Porch Camera', sensor_type='CAMERA', location='Porch', owner=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.body = make_image(size=(800, 600))
+        response = self.client.post(
+            f'/api/sensors/{camera.id}/frames/', data=self.body, content_type='image/png'
+        )
+        self.content_hash = response.data['frame']['content_hash']
+        self.url = f'/api/media/frames/{self.content_hash}/'
+
+    def test_serves_original_with_validators(self):
+        """Test the original frame is served with ETag and range support."""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn(self.content_hash, response['ETag'])
+
+    def test_thumbnail_generated_once_and_cached(self):
+        """Test thumbnails are rendered on first request and reused."""
+        response = self.client.get(self.url, {'size': 'thumb'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        thumb = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(max(thumb.size), 160)
+
+        path = rendition_cache.path_for(self.content_hash, 'thumb')
+        mtime = path.stat().st_mtime_ns
+        self.client.get(self.url, {'size': 'thumb'})
+        self.assertEqual(path.stat().st_mtime_ns, mtime)
+
+    def test_evicted_rendition_is_regenerated(self):
+        """Test a rendition removed by another process is rendered again instead of failing."""
+        self.client.get(self.url, {'size': 'thumb'}).close()
+        path = rendition_cache.path_for(self.content_hash, 'thumb')
+        path.unlink()
+        response = self.client.get(self.url, {'size': 'thumb'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(response.streaming_content))
+
+        # Evicted between get() and open()
+        get = rendition_cache.get
+        calls = []
+
+        def get_then_evict(*args):
+            calls.append(args)
+            path = get(*args)
+            if len(calls) == 1:
+                path.unlink()
+            return path
+
+        with mock.patch.object(rendition_cache, 'get', side_effect=get_then_evict):
+            response = self.client.get(self.url, {'size': 'medium'}, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(len(b''.join(response.streaming_content)), 10)
+        self.assertEqual(len(calls), 2)
+
+    def test_conditional_request_returns_not_modified(self):
+        """Test If-None-Match with the current ETag returns 304."""
+        etag = self.client.get(self.url, {'size': 'medium'})['ETag']
+
+        response = self.client.get(self.url, {'size': 'medium'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range_requests(self):
+        """Test single byte ranges, suffix ranges and unsatisfiable ranges."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.body[:10])
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(self.body)}')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.body[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.body)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_other_users_cannot_fetch_frame(self):
+        """Test frames are only visible to owners of the uploading camera."""
+        other = User.objects.create_user(username='stranger', password='testpass')
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(self.url, {'size': 'thumb'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cache_evicts_least_recently_used(self):
+        """Test the rendition cache stays within its byte budget."""
+        cache = RenditionCache(max_bytes=1)
+        path = cache.get(self.content_hash, 'thumb')
+        self.assertTrue(path.exists())
+
+        medium = cache.get(self.content_hash, 'medium')
+
+        self.assertFalse(path.exists())
+        self.assertTrue(medium.exists())
+        self.assertEqual(cache.total_bytes, medium.stat().st_size)
+
+
+class RecordingWriter(IngestWriter):
+    """IngestWriter that records the size of every committed batch."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def _commit(self, batch):
+        self.batches.append(len(batch))
+        super()._commit(batch)
+
+
+class IngestWriterTestCase(TransactionTestCase):
+    """Test cases for the SQLite single-writer group commit."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writeruser', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Back Door', sensor_type='DOOR_CONTACT', location='Garden', owner=self.user
+        )
+
+    def test_units_are_group_committed(self):
+        """Test queued units share one transaction on the writer thread."""
+        writer = RecordingWriter(batch_ms=200, max_batch=100)
+
+        def create(index):
+            self.assertEqual(threading.current_thread().name, 'ingest-writer')
+            self.assertTrue(connection.in_atomic_block)
+            return SensorReading.objects.create(sensor=self.sensor, value={'state': 'closed', 'n': index}).id
+
+        futures = [writer.submit(create, index) for index in range(10)]
+        ids = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(len(set(ids)), 10)
+        self.assertEqual(SensorReading.objects.count(), 10)
+        self.assertLess(len(writer.batches), 10)
+
+    def test_failing_unit_is_isolated(self):
+        """Test a failing unit does not roll back the rest of its batch."""
+        writer = RecordingWriter(batch_ms=200, max_batch=100)
+
+        def create():
+            return SensorReading.objects.create(sensor=self.sensor, value={'state': 'closed'})
+
+        def fail():
+            SensorReading.objects.create(sensor=self.sensor, value={'state': 'open'})
+            raise ValueError('bad unit')
+
+        good = writer.submit(create)
+        bad = writer.submit(fail)
+        with self.assertRaises(ValueError):
+            bad.result(timeout=5)
+        self.assertIsNotNone(good.result(timeout=5).id)
+        self.assertEqual(list(SensorReading.objects.values_list('value', flat=True)), [{'state': 'closed'}])
+
+    @override_settings(SQLITE_WRITER_ENABLED=True)
+    def test_reading_post_goes_through_writer(self):
+        """Test the readings endpoint stores, processes and alerts via the writer."""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(
+            f'/api/sensors/{self.sensor.id}/readings/', {'value': {'state': 'open'}}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['processed'])
+        self.assertTrue(SensorReading.objects.get(id=response.data['id']).processed)
+        self.assertEqual(Alert.objects.filter(sensor=self.sensor, alert_type='DOOR_OPEN').count(), 1)
+
+
+GATEWAY_KEY = 'test-gateway-key-0123456789'
+
+
+class SensorGatewayTestCase(TransactionTestCase):
+    """Test cases for the TCP/UDP sensor gateway."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='gatewayuser', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Cellar Door', sensor_type='DOOR_CONTACT', location='Cellar', owner=self.user,
+            connection_config={'gateway_key': GATEWAY_KEY}
+        )
+        self.keyless = Sensor.objects.create(
+            name='Attic Window', sensor_type='WINDOW_CONTACT', location='Attic', owner=self.user
+        )
+
+    def run_gateway(self, scenario):
+        async def main():
+            gateway = SensorGateway(host='127.0.0.1', tcp_port=0, udp_port=0, batch_ms=10, max_batch=50)
+            await gateway.start()
+            try:
+                return await scenario(gateway)
+            finally:
+                await gateway.stop()
+        return asyncio.run(main())
+
+    @staticmethod
+    async def exchange(gateway, frames):
+        reader, writer = await asyncio.open_connection(*gateway.tcp_address)
+        for frame in frames:
+            writer.write(LENGTH.pack(len(frame)) + frame)
+        await writer.drain()
+        acks = []
+        for _ in frames:
+            (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+            acks.append(json.loads(await reader.readexactly(length)))
+        writer.close()
+        return acks
+
+    def test_tcp_readings_are_acknowledged_after_storage(self):
+        """Test TCP frames are validated, stored in batches, alerted on and acknowledged in order."""
+        frames = [
+            encode_frame(self.sensor.id, GATEWAY_KEY, {'seq': seq, 'value': {'state': 'closed'}})
+            for seq in range(1, 61)
+        ]
+        frames.append(encode_frame(
+            self.sensor.id, GATEWAY_KEY, {'seq': 61, 'value': {'state': 'open'}, 'reading_type': 'contact_state'}
+        ))
+        if msgpack is not None:
+            frames.append(encode_frame(
+                self.sensor.id, GATEWAY_KEY, {'seq': 62, 'value': {'state': 'closed'}}, FORMAT_MSGPACK
+            ))
+        # A resent frame is acknowledged but stored once
+        frames.append(frames[0])
+
+        acks = self.run_gateway(lambda gateway: self.exchange(gateway, frames))
+
+        self.assertTrue(all(ack['ok'] for ack in acks))
+        self.assertEqual([ack['seq'] for ack in acks[:61]], list(range(1, 62)))
+        readings = SensorReading.objects.filter(sensor=self.sensor)
+        self.assertEqual(readings.count(), len(frames) - 1)
+        self.assertFalse(readings.filter(processed=False).exists())
+        self.assertEqual(readings.get(idempotency_key='61').reading_type, 'contact_state')
+        alert = Alert.objects.get(sensor=self.sensor)
+        self.assertEqual(alert.metadata['reading_id'], readings.get(idempotency_key='61').id)
+        self.sensor.refresh_from_db()
+        self.assertIsNotNone(self.sensor.last_seen)
+
+    def test_tcp_rejections(self):
+        """Test unsigned, unknown-sensor and invalid frames are rejected with a reason."""
+        frames = [
+            encode_frame(self.sensor.id, 'not-the-right-key-at-all', {'seq': 1, 'value': {'state': 'open'}}),
+            encode_frame(self.keyless.id, GATEWAY_KEY, {'seq': 2, 'value': {'state': 'open'}}),
+            encode_frame(self.sensor.id, GATEWAY_KEY, {'seq': 3, 'value': {'state': 'ajar'}}),
+            encode_frame(self.sensor.id, GATEWAY_KEY, {'seq': 4}),
+            b'short',
+            encode_frame(self.sensor.id, GATEWAY_KEY, {'seq': 5, 'value': {'state': 'closed'}}),
+            encode_frame(self.sensor.id, GATEWAY_KEY, {'value': {'state': 'open'}}),
+            encode_frame(self.sensor.id, GATEWAY_KEY, {'ts': time.time() - 3600, 'value': {'state': 'open'}}),
+            encode_frame(self.sensor.id, GATEWAY_KEY, {'ts': time.time(), 'value': {'state': 'open'}}),
+        ]
+        # A replayed timestamped frame is acknowledged but stored once
+        frames.append(frames[-1])
+        acks = self.run_gateway(lambda gateway: self.exchange(gateway, frames))
+
+        self.assertEqual(
+            [(ack['seq'], ack['ok'], ack.get('error')) for ack in acks],
+            [
+                (None, False, 'Bad signature'),
+                (None, False, 'Unknown sensor'),
+                (3, False, "State must be 'open' or 'closed'"),
+                (None, False, "Body must be a map with a 'value'"),
+                (None, False, 'Frame too short'),
+                (5, True, None),
+                (None, False, "Body must carry 'seq' or 'ts'"),
+                (None, False, 'Stale frame'),
+                (None, True, None),
+                (None, True, None),
+            ],
+        )
+        self.assertEqual(SensorReading.objects.count(), 2)
+
+    @override_settings(GATEWAY_UNKNOWN_SENSORS=2)
+    def test_unknown_sensors_are_remembered_briefly(self):
+        """Test unknown sensor ids are kept in a bounded LRU instead of the device map."""
+        unknown_ids = [10 ** 12 + offset for offset in range(3)]
+        frames = [
+            encode_frame(sensor_id, GATEWAY_KEY, {'seq': 1, 'value': {'state': 'open'}}) for sensor_id in unknown_ids
+        ]
+
+        async def scenario(gateway):
+            acks = await self.exchange(gateway, frames + frames[-1:])
+            return acks, dict(gateway._unknown), set(gateway._devices)
+
+        with mock.patch.object(SensorGateway, '_load_device', side_effect=SensorGateway._load_device) as load:
+            acks, unknown, devices = self.run_gateway(scenario)
+        # The repeated frame was answered from the LRU
+        self.assertEqual(load.call_count, 3)
+        self.assertEqual({ack['error'] for ack in acks}, {'Unknown sensor'})
+        self.assertEqual(list(unknown), unknown_ids[1:])
+        self.assertNotIn(unknown_ids[0], devices)
+
+    def test_udp_readings(self):
+        """Test UDP datagrams are stored without acknowledgements."""
+        async def scenario(gateway):
+            loop = asyncio.get_running_loop()
+            transport, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=gateway.udp_address
+            )
+            for seq in range(20):
+                transport.sendto(encode_frame(self.sensor.id, GATEWAY_KEY, {'seq': seq, 'value': {'state': 'closed'}}))
+            transport.close()
+            for _ in range(200):
+                if gateway.stats['stored'] == 20:
+                    break
+                await asyncio.sleep(0.01)
+            return gateway.stats
+
+        stats = self.run_gateway(scenario)
+        self.assertEqual(stats['stored'], 20)
+        self.assertEqual(SensorReading.objects.filter(sensor=self.sensor).count(), 20)
+
+
+class IdempotentReadingTestCase(TestCase):
+    """Test cases for de-duplicating retried reading submissions."""
+
+    def setUp(self):
+        recent_readings.forget()
+        self.addCleanup(recent_readings.forget)
+        self.user = User.objects.create_user(username='retryuser', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Back Door', sensor_type='DOOR_CONTACT', location='Kitchen', owner=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = f'/api/sensors/{self.sensor.id}/readings/'
+
+    def test_retry_returns_original_reading(self):
+        """Test a retried submission is stored and alerted on only once."""
+        payload = {'value': {'state': 'open'}, 'idempotency_key': 'seq-41'}
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(self.url, payload, format='json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        # Answered from the recent-key cache: the only query is the sensor lookup
+        with self.assertNumQueries(1):
+            retry = self.client.post(self.url, payload, format='json')
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(SensorReading.objects.filter(sensor=self.sensor).count(), 1)
+        self.assertEqual(Alert.objects.filter(sensor=self.sensor).count(), 1)
+
+    def test_retry_after_cache_miss_uses_constraint(self):
+        """Test the unique constraint catches duplicates this process has not cached."""
+        self.client.post(
+            self.url, {'value': {'state': 'open'}}, format='json', HTTP_IDEMPOTENCY_KEY='b7c1'
+        )
+        recent_readings.forget()
+        retry = self.client.post(
+            self.url, {'value': {'state': 'open'}, 'idempotency_key': 'b7c1'}, format='json'
+        )
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data['idempotency_key'], 'b7c1')
+        self.assertEqual(SensorReading.objects.filter(sensor=self.sensor).count(), 1)
+        self.assertEqual(Alert.objects.filter(sensor=self.sensor).count(), 1)
+
+        other = Sensor.objects.create(
+            name='Side Door', sensor_type='DOOR_CONTACT', location='Hall', owner=self.user
+        )
+        self.client.post(
+            f'/api/sensors/{other.id}/readings/', {'value': {'state': 'open'}, 'idempotency_key': 'b7c1'},
+            format='json'
+        )
+        self.client.post(self.url, {'value': {'state': 'closed'}}, format='json')
+        self.client.post(self.url, {'value': {'state': 'closed'}}, format='json')
+        self.assertEqual(SensorReading.objects.count(), 4)
+
+    def test_batch_ingest_skips_duplicates(self):
+        """Test bulk ingestion stores each key once, within and across batches."""
+        first = ingest_readings([(self.sensor, {'value': {'state': 'open'}, 'idempotency_key': '1'})])
+        readings = ingest_readings([
+            (self.sensor, {'value': {'state': 'open'}, 'idempotency_key': '1'}),
+            (self.sensor, {'value': {'state': 'closed'}, 'idempotency_key': '2'}),
+            (self.sensor, {'value': {'state': 'closed'}, 'idempotency_key': '2'}),
+            (self.sensor, {'value': {'state': 'closed'}}),
+        ])
+        self.assertEqual(readings[0].id, first[0].id)
+        self.assertIs(readings[1], readings[2])
+        self.assertEqual(SensorReading.objects.filter(sensor=self.sensor).count(), 3)
+        self.assertEqual(Alert.objects.filter(sensor=self.sensor).count(), 1)
+
+    def test_recent_readings_are_bounded(self):
+        """Test the cache evicts least recently used keys and sensors."""
+        cache = RecentReadings(max_sensors=2, keys_per_sensor=2)
+        cache.remember(1, 'a', 'reading-a')
+        cache.remember(1, 'b', 'reading-b')
+        cache.get(1, 'a')
+        cache.remember(1, 'c', 'reading-c')
+        self.assertEqual(cache.get(1, 'a'), 'reading-a')
+        self.assertIsNone(cache.get(1, 'b'))
+
+        cache.remember(2, 'a', 'other')
+        cache.remember(3, 'a', 'third')
+        self.assertIsNone(cache.get(1, 'a'))
+        self.assertEqual(cache.get(3, 'a'), 'third')
+
+
+class BinaryFormatTestCase(TestCase):
+    """Test cases for MessagePack and CBOR request and response bodies."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='binaryuser', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Patio Door', sensor_type='DOOR_CONTACT', location='Patio', owner=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @skipUnless('MessagePack' in settings.BINARY_API_FORMATS, 'msgpack is not installed')
+    def test_msgpack_reading_round_trip(self):
+        """Test a MessagePack reading is accepted and answered in MessagePack."""
+        response = self.client.post(
+            f'/api/sensors/{self.sensor.id}/readings/',
+            msgpack.packb({'value': {'state': 'open', 'battery_level': 80}}),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        reading = msgpack.unpackb(response.content)
+        self.assertEqual(reading['value']['state'], 'open')
+        self.assertEqual(reading['value']['sensor_battery'], 80)
+        self.assertTrue(reading['processed'])
+        self.assertEqual(Alert.objects.filter(sensor=self.sensor).count(), 1)
+
+        malformed = self.client.post(
+            f'/api/sensors/{self.sensor.id}/readings/', b'\xc1', content_type='application/msgpack'
+        )
+        self.assertEqual(malformed.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless('CBOR' in settings.BINARY_API_FORMATS, 'cbor2 is not installed')
+    def test_cbor_reading_history(self):
+        """Test reading history is served as CBOR matching the JSON response."""
+        self.client.post(
+            f'/api/sensors/{self.sensor.id}/readings/',
+            cbor2.dumps({'value': {'state': 'closed'}, 'reading_type': 'contact_state'}),
+            content_type='application/cbor',
+        )
+        url = f'/api/sensors/{self.sensor.id}/reading_history/'
+        response = self.client.get(url, HTTP_ACCEPT='application/cbor')
+        self.assertEqual(response['Content-Type'], 'application/cbor')
+        self.assertEqual(cbor2.loads(response.content), self.client.get(url).json())
+        self.assertEqual(self.client.get(url, {'format': 'cbor'}).content, response.content)
+
+
+@override_settings(SENSOR_HEARTBEAT_INTERVAL=300, SENSOR_LAST_SEEN_WRITE_INTERVAL=30)
+class SensorHeartbeatTestCase(TestCase):
+    """Test cases for last_seen tracking and offline detection."""
+
+    def setUp(self):
+        last_seen_tracker.forget()
+        self.user = User.objects.create_user(username='heartbeatuser', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Garage Door', sensor_type='DOOR_CONTACT', location='Garage', owner=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_last_seen_writes_are_coalesced(self):
+        """Test last_seen is written at most once per write interval."""
+        now = timezone.now()
+        self.assertTrue(last_seen_tracker.touch(self.sensor, now))
+        self.assertFalse(last_seen_tracker.touch(self.sensor, now + timedelta(seconds=10)))
+        self.sensor.refresh_from_db()
+        self.assertEqual(self.sensor.last_seen, now)
+
+        self.assertTrue(last_seen_tracker.touch(self.sensor, now + timedelta(seconds=31)))
+        self.sensor.refresh_from_db()
+        self.assertEqual(self.sensor.last_seen, now + timedelta(seconds=31))
+
+    def test_readings_and_heartbeats_update_last_seen(self):
+        """Test submitting a reading or heartbeat marks the sensor as seen."""
+        response = self.client.post(
+            f'/api/sensors/{self.sensor.id}/readings/', {'value': {'state': 'closed'}}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.sensor.refresh_from_db()
+        self.assertIsNotNone(self.sensor.last_seen)
+
+        last_seen_tracker.forget()
+        Sensor.objects.filter(pk=self.sensor.pk).update(last_seen=timezone.now() - timedelta(hours=1))
+        response = self.client.post(f'/api/sensors/{self.sensor.id}/heartbeat/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.sensor.refresh_from_db()
+        self.assertGreater(self.sensor.last_seen, timezone.now() - timedelta(minutes=1))
+
+    def test_offline_detection_and_recovery(self):
+        """Test overdue sensors are flagged offline and recover on check-in."""
+        now = timezone.now()
+        quiet = Sensor.objects.create(
+            name='Hall Window', sensor_type='WINDOW_CONTACT', location='Hall', owner=self.user,
+            last_seen=now - timedelta(seconds=200), heartbeat_interval=600
+        )
+        Sensor.objects.filter(pk=self.sensor.pk).update(last_seen=now - timedelta(hours=1))
+
+        detector = OfflineDetector()
+        detector.load(now)
+        self.assertEqual(len(detector), 2)
+
+        offline = detector.expire(now)
+        self.assertEqual([sensor.id for sensor in offline], [self.sensor.id])
+        self.sensor.refresh_from_db()
+        self.assertEqual(self.sensor.status, 'ERROR')
+        alert = Alert.objects.get(sensor=self.sensor)
+        self.assertEqual((alert.alert_type, alert.severity), ('SYSTEM', 'HIGH'))
+        quiet.refresh_from_db()
+        self.assertEqual(quiet.status, 'ACTIVE')
+
+        # Nothing else is due: no sensors are loaded from the database
+        with self.assertNumQueries(0):
+            self.assertEqual(detector.expire(now), [])
+
+        # A check-in brings the sensor back and reschedules it
+        later = now + timedelta(seconds=10)
+        last_seen_tracker.touch(self.sensor, later)
+        self.sensor.refresh_from_db()
+        self.assertEqual(self.sensor.status, 'ACTIVE')
+        detector.poll(later)
+        self.assertEqual(detector.next_deadline(), later + timedelta(seconds=330))
+        self.assertEqual(detector.expire(later + timedelta(seconds=329)), [])
+
+
+@override_settings(RESPONSE_CACHE_SECONDS=300)
+class DashboardTestCase(TestCase):
+    """Test cases for the dashboard summary endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        caches[LOCAL_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(username='dashuser', password='testpass')
+        self.door = Sensor.objects.create(
+            name='Front Door', sensor_type='DOOR_CONTACT', location='Entry', owner=self.user
+        )
+        self.window = Sensor.objects.create(
+            name='Kitchen Window', sensor_type='WINDOW_CONTACT', location='Kitchen', owner=self.user,
+            status='ERROR'
+        )
+        for state in ['open', 'closed']:
+            record_reading(self.door, value={'state': state}, reading_type='door')
+        for severity, acknowledged in [('HIGH', False), ('HIGH', True), ('LOW', False)]:
+            Alert.objects.create(
+                alert_type='DOOR_OPEN', severity=severity, user=self.user, sensor=self.door,
+                title='Door opened', description='Front door opened', acknowledged=acknowledged
+            )
+        Alert.objects.create(
+            alert_type='SYSTEM', severity='CRITICAL', user=self.user, title='Offline', description='No sensor'
+        )
+
+        other = User.objects.create_user(username='otherdash', password='testpass')
+        other_sensor = Sensor.objects.create(name='Garage', sensor_type='MOTION', location='Garage', owner=other)
+        other_sensor.readings.create(value={'motion': True})
+        Alert.objects.create(
+            alert_type='MOTION', severity='HIGH', user=other, sensor=other_sensor, title='Motion', description='Motion'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_summary(self):
+        """Test sensors carry their latest reading and alert count, with the user's alert totals."""
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        sensors = {sensor['id']: sensor for sensor in response.data['sensors']}
+        self.assertEqual(set(sensors), {self.door.id, self.window.id})
+        door = sensors[self.door.id]
+        self.assertEqual(door['sensor_type_display'], 'Door Contact')
+        self.assertEqual(door['unacknowledged_alerts'], 2)
+        self.assertEqual(door['last_reading_value'], {'state': 'closed'})
+        window = sensors[self.window.id]
+        self.assertEqual(window['status_display'], 'Error')
+        self.assertEqual(window['unacknowledged_alerts'], 0)
+        self.assertIsNone(window['last_reading'])
+
+        alerts = response.data['alerts']
+        self.assertEqual(alerts['total'], 4)
+        self.assertEqual(alerts['unacknowledged'], 3)
+        self.assertEqual(alerts['by_severity'], {'LOW': 1, 'HIGH': 2, 'CRITICAL': 1})
+        self.assertEqual([alert['title'] for alert in alerts['recent']][0], 'Offline')
+        self.assertIsNone(alerts['recent'][0]['sensor_name'])
+
+    def test_query_count_does_not_grow_with_sensors(self):
+        """Test the summary takes the same number of queries for any number of sensors."""
+        with self.assertNumQueries(3):
+            self.client.get('/api/dashboard/')
+
+        for number in range(10):
+            sensor = Sensor.objects.create(
+                name=f'Motion {number}', sensor_type='MOTION', location='Hall', owner=self.user
+            )
+            sensor.readings.create(value={'motion': False})
+        cache.clear()
+        caches[LOCAL_CACHE_ALIAS].clear()
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.client.get('/api/dashboard/').data['sensors']), 12)
+
+    def test_cached_until_new_reading(self):
+        """Test the summary is served from cache until a write invalidates it."""
+        self.client.get('/api/dashboard/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/dashboard/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/sensors/{self.window.id}/readings/', {'value': {'state': 'open'}}, format='json')
+        sensors = {sensor['id']: sensor for sensor in self.client.get('/api/dashboard/').data['sensors']}
+        self.assertEqual(sensors[self.window.id]['last_reading_value']['state'], 'open')
+
+
+class LastReadingTestCase(TestCase):
+    """Test cases for the latest reading copied onto sensors."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lastuser', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Hall Motion', sensor_type='MOTION', location='Hall', owner=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_submitted_reading_becomes_last_reading(self):
+        """Test a submitted reading is copied onto its sensor and exposed by the sensor API."""
+        response = self.client.post(
+            f'/api/sensors/{self.sensor.id}/readings/', {'value': {'motion_detected': False}}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        data = self.client.get(f'/api/sensors/{self.sensor.id}/').data
+        self.assertEqual(data['last_reading'], response.data['id'])
+        self.assertEqual(data['last_reading_at'], response.data['timestamp'])
+        self.assertEqual(data['last_reading_value'], response.data['value'])
+
+    def test_older_reading_does_not_replace_newer(self):
+        """Test a reading that arrives after a newer one leaves the pointer alone."""
+        now = timezone.now()
+        newer = SensorReading.objects.create(sensor=self.sensor, value={'n': 2})
+        older = SensorReading.objects.create(sensor=self.sensor, value={'n': 1})
+        SensorReading.objects.filter(pk=older.pk).update(timestamp=now - timedelta(seconds=30))
+        older.refresh_from_db()
+
+        self.assertEqual(update_last_readings([newer]), 1)
+        self.assertEqual(update_last_readings([older]), 0)
+        self.sensor.refresh_from_db()
+        self.assertEqual(self.sensor.last_reading_id, newer.pk)
+        self.assertEqual(self.sensor.last_reading_value, {'n': 2})
+
+        # Same timestamp: the higher id is newer, as in the reading history
+        tied = SensorReading.objects.create(sensor=self.sensor, value={'n': 3}, timestamp=newer.timestamp)
+        SensorReading.objects.filter(pk=tied.pk).update(timestamp=newer.timestamp)
+        tied.refresh_from_db()
+        self.assertEqual(update_last_readings([tied]), 1)
+        self.sensor.refresh_from_db()
+        self.assertEqual(self.sensor.last_reading_id, tied.pk)
+
+    def test_batch_updates_every_sensor(self):
+        """Test batched ingestion points every sensor at its newest reading, across statements."""
+        sensors = [self.sensor] + [
+            Sensor.objects.create(name=f'Door {number}', sensor_type='DOOR_CONTACT', location='Hall', owner=self.user)
+            for number in range(4)
+        ]
+        items = [(sensor, {'value': {'state': state}}) for state in ['open', 'closed'] for sensor in sensors[1:]]
+        items.append((self.sensor, {'value': {'motion_detected': False}}))
+
+        # Two sensors per UPDATE
+        with mock.patch.object(connection.features, 'max_query_params', 22):
+            readings = ingest_readings(items)
+
+        newest = {reading.sensor_id: reading for reading in readings}
+        for sensor in Sensor.objects.filter(pk__in=[sensor.pk for sensor in sensors]):
+            self.assertEqual(sensor.last_reading_id, newest[sensor.pk].pk)
+            self.assertEqual(sensor.last_reading_value, newest[sensor.pk].value)
+
+
+class MotionRuleHandler(BaseSensorHandler):
+    """Candidate rule for replay tests: alert on every detected motion."""
+
+    def validate_reading(self, data):
+        return True, None
+
+    def process_reading(self, data):
+        return data
+
+    def detect_threats(self, reading):
+        if not reading.value.get('motion_detected'):
+            return []
+        return [{
+            'alert_type': 'MOTION', 'severity': 'LOW', 'title': f"{self.sensor.name} Motion",
+            'description': 'Motion detected.', 'metadata': {'reading_id': reading.id},
+        }]
+
+
+@override_settings(REPLAY_WORKERS=1)
+class ReplayTestCase(TestCase):
+    """Test cases for replaying stored readings through the handlers."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='replayuser', password='testpass')
+        self.door = Sensor.objects.create(
+            name='Front Door', sensor_type='DOOR_CONTACT', location='Entry', owner=self.user
+        )
+        self.motion = Sensor.objects.create(name='Hall', sensor_type='MOTION', location='Hall', owner=self.user)
+        for state in ['open', 'closed', 'open']:
+            self.door.readings.create(value={'state': state})
+        for detected in [True, False]:
+            self.motion.readings.create(value={'motion_detected': detected})
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_dry_run_reports_without_writing(self):
+        """Test a dry run counts the alerts that would fire and changes nothing."""
+        results = replay_readings()
+
+        self.assertEqual(results['mode'], 'dry_run')
+        self.assertEqual(results['readings'], 5)
+        self.assertEqual(results['alerts'], 2)
+        self.assertEqual(results['by_type'], {'DOOR_OPEN': 2})
+        self.assertEqual(len(results['sample']), 2)
+        self.assertGreater(results['readings_per_sec'], 0)
+        self.assertFalse(Alert.objects.exists())
+        self.assertFalse(SensorReading.objects.filter(processed=True).exists())
+
+    def test_apply_creates_alerts_once(self):
+        """Test apply mode creates alerts, marks readings processed and skips them next time."""
+        results = replay_readings(apply=True)
+
+        self.assertEqual(results['alerts'], 2)
+        self.assertEqual(Alert.objects.filter(sensor=self.door, alert_type='DOOR_OPEN').count(), 2)
+        self.assertFalse(SensorReading.objects.filter(processed=False).exists())
+        self.assertEqual(replay_readings(apply=True)['readings'], 0)
+        self.assertEqual(Alert.objects.count(), 2)
+
+    def test_backtest_with_candidate_handler(self):
+        """Test a handler class can be tried for a sensor type without registering it."""
+        results = replay_readings(
+            sensor_ids=[self.motion.pk], handlers={'MOTION': 'sensors.tests.MotionRuleHandler'}
+        )
+        self.assertEqual(results['readings'], 2)
+        self.assertEqual(results['by_type'], {'MOTION': 1})
+        self.assertEqual(results['sample'][0]['title'], 'Hall Motion')
+
+    def test_time_range(self):
+        """Test only readings with start <= timestamp < end are replayed."""
+        first = self.door.readings.order_by('timestamp', 'id').first()
+        SensorReading.objects.filter(pk=first.pk).update(timestamp=timezone.now() - timedelta(days=2))
+        results = replay_readings(end=timezone.now() - timedelta(days=1))
+        self.assertEqual(results['readings'], 1)
+        self.assertEqual(results['alerts'], 1)
+
+    def test_shards_balance_reading_counts(self):
+        """Test sensors are spread over shards so each gets a similar number of readings."""
+        shards = shard_sensors({1: 100, 2: 60, 3: 50, 4: 10}, workers=2)
+        counts = {1: 100, 2: 60, 3: 50, 4: 10}
+        self.assertEqual(sorted(sum(counts[sensor] for sensor in shard) for shard in shards), [110, 110])
+        self.assertEqual(shard_sensors({1: 5}, workers=4), [[1]])
+        self.assertEqual(shard_sensors({}, workers=4), [])
+
+    def test_api_replays_own_sensors(self):
+        """Test the replay API covers only the user's sensors and rejects others."""
+        other = User.objects.create_user(username='otherreplay', password='testpass')
+        other_door = Sensor.objects.create(name='Gate', sensor_type='DOOR_CONTACT', location='Gate', owner=other)
+        other_door.readings.create(value={'state': 'open'})
+
+        response = self.client.post('/api/sensors/replay/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['readings'], 5)
+        self.assertEqual(response.data['alerts'], 2)
+
+        response = self.client.post('/api/sensors/replay/', {'sensors': [other_door.pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(
+            '/api/sensors/replay/', {'sensors': [self.door.pk], 'apply': True}, format='json'
+        )
+        self.assertEqual(response.data['mode'], 'apply')
+        self.assertEqual(Alert.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(Alert.objects.filter(user=other).exists())
+
+    @override_settings(REPLAY_API_MAX_READINGS=4)
+    def test_api_refuses_large_replays(self):
+        """Test the replay API points large ranges to the management command."""
+        response = self.client.post('/api/sensors/replay/', {'apply': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('replay_readings', response.data['detail'])
+        self.assertFalse(Alert.objects.exists())
+
+        response = self.client.post('/api/sensors/replay/', {'sensors': [self.door.pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(REPLAY_WORKERS=4)
+    def test_api_replays_in_process(self):
+        """Test the replay API never starts worker processes in the server."""
+        with mock.patch('sensors.replay.ProcessPoolExecutor') as pool:
+            response = self.client.post('/api/sensors/replay/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['sensors'], 2)
+        self.assertEqual(response.data['workers'], 1)
+        pool.assert_not_called()
+
+
+@override_settings(REPLAY_WORKERS=3)
+class ParallelReplayTestCase(TransactionTestCase):
+    """Test sharded replays merge every worker's results."""
+
+    def test_shards_are_merged(self):
+        """Test readings and alerts from every shard are counted once."""
+        user = User.objects.create_user(username='parallelreplay', password='testpass')
+        for number in range(5):
+            sensor = Sensor.objects.create(
+                name=f'Door {number}', sensor_type='DOOR_CONTACT', location='Hall', owner=user
+            )
+            for state in ['open', 'closed'] * (number + 1):
+                sensor.readings.create(value={'state': state})
+
+        # Threads stand in for processes: the test database is in memory
+        with mock.patch('sensors.replay.ProcessPoolExecutor', ThreadPoolExecutor):
+            results = replay_readings(chunk_size=2)
+
+        self.assertEqual(results['workers'], 3)
+        self.assertEqual(results['sensors'], 5)
+        self.assertEqual(results['readings'], 30)
+        self.assertEqual(results['alerts'], 15)
+
+
+@override_settings(DATABASE_SHARDS=['default'])
+class ZoneArmingTestCase(TestCase):
+    """Test cases for zone arming modes and detection suppression."""
+
+    def setUp(self):
+        cache.clear()
+        arming_index.forget()
+        # Ids are reused after each test's rollback
+        self.addCleanup(arming_index.forget)
+        self.user = User.objects.create_user(username='zoneowner', password='testpass')
+        self.zone = Zone.objects.create(name='Ground Floor', owner=self.user)
+        self.door = Sensor.objects.create(
+            name='Front Door', sensor_type='DOOR_CONTACT', location='Entry', owner=self.user, zone=self.zone
+        )
+        self.camera = Sensor.objects.create(
+            name='Hall Camera', sensor_type='CAMERA', location='Hall', owner=self.user, zone=self.zone
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def set_mode(self, mode):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/zones/{self.zone.id}/', {'mode': mode}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def submit(self, sensor, value):
+        response = self.client.post(f'/api/sensors/{sensor.id}/readings/', {'value': value}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['processed'])
+
+    def test_modes_suppress_detection(self):
+        """Test disarmed zones skip intrusion detection, stay mode only interior sensors."""
+        self.set_mode('DISARMED')
+        self.submit(self.door, {'state': 'open'})
+        self.submit(self.camera, {'motion_detected': True})
+        self.assertFalse(Alert.objects.exists())
+
+        self.set_mode('STAY')
+        self.submit(self.door, {'state': 'open'})
+        self.submit(self.camera, {'motion_detected': True})
+        self.assertEqual(list(Alert.objects.values_list('alert_type', flat=True)), ['DOOR_OPEN'])
+
+        self.set_mode('ARMED')
+        self.submit(self.camera, {'motion_detected': True})
+        self.assertEqual(Alert.objects.filter(alert_type='MOTION').count(), 1)
+
+    def test_unzoned_sensors_always_alert(self):
+        """Test sensors outside a zone keep alerting whatever the zones' modes."""
+        self.set_mode('DISARMED')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/sensors/{self.door.id}/', {'zone': None}, format='json')
+        self.submit(self.door, {'state': 'open'})
+        self.assertEqual(Alert.objects.count(), 1)
+
+    def test_suppressed_lookup_runs_no_queries(self):
+        """Test a warm index answers from memory, and reloads after another process's change."""
+        self.set_mode('DISARMED')
+        self.assertEqual(arming_index.suppressing_mode(self.door), 'DISARMED')
+        with self.assertNumQueries(0):
+            self.assertEqual(arming_index.suppressing_mode(self.door), 'DISARMED')
+
+        # Another process re-arms the zone: the local copy is used until the next version check,
+        # which reads the version from the database, not the (per-process) cache
+        Zone.objects.filter(pk=self.zone.pk).update(mode='ARMED')
+        bump_arming_version(self.user.pk)
+        cache.clear()
+        with self.settings(ARMING_INDEX_CHECK_SECONDS=3600):
+            self.assertEqual(arming_index.suppressing_mode(self.door), 'DISARMED')
+        with self.settings(ARMING_INDEX_CHECK_SECONDS=0):
+            self.assertIsNone(arming_index.suppressing_mode(self.door))
+
+    def test_schedule(self):
+        """Test scheduled modes apply in their periods, including ones past midnight."""
+        schedule = compile_schedule([
+            {'days': [0, 1, 2, 3, 4], 'start': '09:00', 'end': '17:00', 'mode': 'ARMED'},
+            {'days': [4], 'start': '23:00', 'end': '06:00', 'mode': 'STAY'},
+        ])
+        monday = timezone.make_aware(datetime(2026, 10, 19, 10, 0))
+        self.assertEqual(mode_at('DISARMED', schedule, monday), 'ARMED')
+        self.assertEqual(mode_at('DISARMED', schedule, monday.replace(hour=17)), 'DISARMED')
+        # Friday 23:00 to Saturday 06:00
+        self.assertEqual(mode_at('DISARMED', schedule, monday.replace(day=24, hour=2)), 'STAY')
+        self.assertEqual(mode_at('DISARMED', schedule, monday.replace(day=25, hour=2)), 'DISARMED')
+
+        for invalid in [
+            {'days': [7], 'start': '09:00', 'end': '17:00', 'mode': 'ARMED'},
+            {'days': [0], 'start': '9am', 'end': '17:00', 'mode': 'ARMED'},
+            {'days': [0], 'start': '09:00', 'end': '09:00', 'mode': 'ARMED'},
+            {'days': [0], 'start': '09:00', 'end': '17:00', 'mode': 'PANIC'},
+        ]:
+            response = self.client.patch(f'/api/zones/{self.zone.id}/', {'schedule': [invalid]}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_zones_are_per_owner(self):
+        """Test users cannot see other users' zones or put sensors in them."""
+        other = User.objects.create_user(username='zoneother', password='testpass')
+        client = APIClient()
+        client.force_authenticate(user=other)
+        self.assertEqual(client.get(f'/api/zones/{self.zone.id}/').status_code, status.HTTP_404_NOT_FOUND)
+        sensor = Sensor.objects.create(name='Shed', sensor_type='DOOR_CONTACT', location='Shed', owner=other)
+        response = client.patch(f'/api/sensors/{sensor.id}/', {'zone': self.zone.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(RESPONSE_CACHE_SECONDS=0, DATABASE_SHARDS=['default'])
+class OwnerShardRoutingTestCase(TestCase):
+    """Test cases for owner shard placement and routing (shards are only named, not queried)."""
+
+    shards = ['default', 'shard1']
+
+    def setUp(self):
+        cache.clear()
+        owner_directory.forget()
+        self.user = User.objects.create_user(username='shardowner', password='testpass')
+
+    def test_hash_placement_is_stable(self):
+        """Test new owners are spread over the shards by a stable hash."""
+        with self.settings(DATABASE_SHARDS=self.shards):
+            placements = [hash_shard(owner_id) for owner_id in range(100)]
+            self.assertEqual(placements, [hash_shard(owner_id) for owner_id in range(100)])
+        self.assertEqual(set(placements), set(self.shards))
+
+    def test_owners_with_data_stay_on_default(self):
+        """Test an owner with data from before sharding is assigned to 'default'."""
+        Sensor.objects.create(name='Porch', sensor_type='MOTION', location='Porch', owner=self.user)
+        with self.settings(DATABASE_SHARDS=self.shards):
+            self.assertEqual(shard_for_owner(self.user.pk), 'default')
+        self.assertEqual(OwnerShard.objects.get(user=self.user).alias, 'default')
+
+    def test_router_follows_context_and_instances(self):
+        """Test sharded models follow the current shard or their instance; users stay on 'default'."""
+        sensor = Sensor(pk=1, owner_id=self.user.pk)
+        sensor._state.db = 'shard1'
+        with self.settings(DATABASE_SHARDS=self.shards):
+            self.assertEqual(router.db_for_read(Sensor), 'default')
+            self.assertEqual(router.db_for_read(SensorReading, instance=sensor), 'shard1')
+            self.assertEqual(router.db_for_read(User, instance=sensor), 'default')
+            with use_shard('shard1'):
+                self.assertEqual(router.db_for_write(Alert), 'shard1')
+                self.assertEqual(router.db_for_read(User), 'default')
+            self.assertTrue(router.allow_relation(sensor, self.user))
+
+    def test_moving_owner_cannot_write(self):
+        """Test writes get 503 while the owner is moving, and reads still work."""
+        OwnerShard.objects.create(user=self.user, alias='default', moving=True)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with self.settings(DATABASE_SHARDS=self.shards):
+            self.assertEqual(client.get('/api/sensors/').status_code, status.HTTP_200_OK)
+            response = client.post(
+                '/api/sensors/', {'name': 'Gate', 'sensor_type': 'MOTION', 'location': 'Gate'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_sqlite_moves_only_to_later_shards(self):
+        """Test moves that would push SQLite ids into another shard's block are refused."""
+        with self.settings(DATABASE_SHARDS=self.shards):
+            check_move('default', 'shard1')
+            for source, target in [('shard1', 'default'), ('shard1', 'shard1'), ('default', 'shard9')]:
+                with self.assertRaises(ValueError):
+                    check_move(source, target)
+
+
+@skipUnless(len(settings.DATABASE_SHARDS) > 1, 'Set DATABASE_SHARDS to run against shard databases')
+@override_settings(RESPONSE_CACHE_SECONDS=0, SHARD_DIRECTORY_CHECK_SECONDS=0)
+class ShardedOwnerTestCase(TestCase):
+    """Test cases for owners' data on shard databases."""
+
+    databases = set(settings.DATABASE_SHARDS)
+
+    def setUp(self):
+        cache.clear()
+        owner_directory.forget()
+        last_seen_tracker.forget()
+        self.shard = settings.DATABASE_SHARDS[-1]
+
+    def make_owner(self, alias):
+        """Create users until one hashes to `alias`."""
+        while True:
+            user = User.objects.create_user(username=f'owner{User.objects.count()}', password='testpass')
+            if hash_shard(user.pk) == alias:
+                return user
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def test_api_writes_and_reads_owner_shard(self):
+        """Test sensors, readings and alerts created through the API live on the owner's shard."""
+        user = self.make_owner(self.shard)
+        client = self.client_for(user)
+        response = client.post(
+            '/api/sensors/', {'name': 'Back Door', 'sensor_type': 'DOOR_CONTACT', 'location': 'Back'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        sensor_id = response.data['id']
+        self.assertGreater(sensor_id, settings.DATABASE_SHARDS.index(self.shard) * SHARD_ID_BLOCK)
+
+        response = client.post(f'/api/sensors/{sensor_id}/readings/', {'value': {'state': 'open'}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertFalse(Sensor.objects.using('default').filter(pk=sensor_id).exists())
+        self.assertEqual(SensorReading.objects.using(self.shard).filter(sensor_id=sensor_id).count(), 1)
+        self.assertEqual(Alert.objects.using(self.shard).filter(user=user, alert_type='DOOR_OPEN').count(), 1)
+        self.assertEqual([sensor['id'] for sensor in client.get('/api/sensors/').data['results']], [sensor_id])
+        self.assertEqual(len(client.get('/api/alerts/').data['results']), 1)
+        self.assertEqual(client.get('/api/dashboard/').data['sensors'][0]['last_reading'], response.data['id'])
+
+    def test_batches_are_split_by_shard(self):
+        """Test a batch mixing owners stores each reading on its owner's shard, in order."""
+        owners = [self.make_owner('default'), self.make_owner(self.shard)]
+        sensors = []
+        for owner in owners:
+            with use_shard(shard_for_owner(owner.pk)):
+                sensors.append(Sensor.objects.create(
+                    name='Door', sensor_type='DOOR_CONTACT', location='Hall', owner=owner
+                ))
+
+        readings = ingest_readings([(sensor, {'value': {'state': 'closed'}}) for sensor in sensors * 2])
+
+        self.assertEqual([reading.sensor_id for reading in readings], [sensor.pk for sensor in sensors * 2])
+        for sensor, alias in zip(sensors, ['default', self.shard]):
+            self.assertEqual(SensorReading.objects.using(alias).filter(sensor=sensor).count(), 2)
+
+    def test_move_owner(self):
+        """Test move_owner_shard moves an owner's rows with their ids and the API follows."""
+        user = self.make_owner('default')
+        client = self.client_for(user)
+        sensor_id = client.post(
+            '/api/sensors/', {'name': 'Garage', 'sensor_type': 'DOOR_CONTACT', 'location': 'Garage'}, format='json'
+        ).data['id']
+        reading_id = client.post(
+            f'/api/sensors/{sensor_id}/readings/', {'value': {'state': 'open'}}, format='json'
+        ).data['id']
+
+        call_command('move_owner_shard', user.username, self.shard, wait=0, stdout=io.StringIO())
+
+        self.assertEqual(shard_for_owner(user.pk), self.shard)
+        self.assertFalse(Sensor.objects.using('default').filter(owner=user).exists())
+        self.assertFalse(Alert.objects.using('default').filter(user=user).exists())
+        moved = Sensor.objects.using(self.shard).get(pk=sensor_id)
+        self.assertEqual(moved.last_reading_id, reading_id)
+        self.assertEqual(Alert.objects.using(self.shard).filter(user=user).count(), 1)
+        response = client.get(f'/api/sensors/{sensor_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['last_reading'], reading_id)
+
+    def test_response_cache_invalidated_when_shard_commits(self):
+        """Test readings on a shard bump the owner's data version when the shard's transaction commits."""
+        owner = self.make_owner(self.shard)
+        with use_owner_shard(owner.pk):
+            sensor = Sensor.objects.create(name='Door', sensor_type='DOOR_CONTACT', location='Hall', owner=owner)
+
+        writes = [
+            lambda: record_reading(sensor, value={'state': 'closed'}),
+            lambda: ingest_readings([(sensor, {'value': {'state': 'closed'}})]),
+        ]
+        for write in writes:
+            version = data_version(owner.pk)
+            with self.captureOnCommitCallbacks(using=self.shard, execute=True):
+                with use_owner_shard(owner.pk):
+                    write()
+                self.assertEqual(data_version(owner.pk), version)
+            self.assertNotEqual(data_version(owner.pk), version)
+
+    @override_settings(SHARD_DIRECTORY_CHECK_SECONDS=0.2)
+    def test_move_waits_for_other_processes(self):
+        """Test another process's writes during a move are moved along or refused, never lost."""
+        user = self.make_owner('default')
+        with use_owner_shard(user.pk):
+            sensor = Sensor.objects.create(name='Door', sensor_type='DOOR_CONTACT', location='Hall', owner=user)
+        # The other process's copy of the directory, read before the move starts
+        other = OwnerDirectory()
+        other.entry(user.pk)
+        sleep = time.sleep
+        written = []
+
+        def write_from_other_process():
+            with mock.patch('estate_sentry.sharding.owner_directory', other):
+                return ingest_readings([(sensor, {'value': {'state': 'open'}})])
+
+        def wait(seconds):
+            self.assertGreaterEqual(seconds, 0.2)
+            # Still on its old copy: written to the source, before the rows are copied
+            written.extend(write_from_other_process())
+            sleep(seconds)
+            with self.assertRaises(OwnerMoving):
+                write_from_other_process()
+
+        with mock.patch('estate_sentry.sharding.time.sleep', wait):
+            move_owner(user.pk, self.shard, wait=0)
+
+        self.assertEqual(len(written), 1)
+        self.assertEqual(
+            list(SensorReading.objects.using(self.shard).filter(sensor_id=sensor.pk).values_list('id', flat=True)),
+            [written[0].pk]
+        )
+        self.assertFalse(SensorReading.objects.using('default').filter(sensor_id=sensor.pk).exists())
+        with self.settings(SHARD_DIRECTORY_CHECK_SECONDS=0):
+            self.assertEqual(other.entry(user.pk), (self.shard, False))
+
+    @override_settings(ALERT_FEED_SETTLE_SECONDS=0)
+    def test_alert_feed_reads_every_shard(self):
+        """Test feed consumers see alerts from every shard and find them again by id."""
+        alerts = []
+        for owner in [self.make_owner('default'), self.make_owner(self.shard)]:
+            WebhookSubscription.objects.create(user=owner, url='https://example.com/hooks')
+            with use_shard(shard_for_owner(owner.pk)):
+                sensor = Sensor.objects.create(name='Door', sensor_type='DOOR_CONTACT', location='Hall', owner=owner)
+                alerts.append(Alert.objects.create(
+                    alert_type='DOOR_OPEN', severity='HIGH', user=owner, sensor=sensor, title='Door Opened'
+                ))
+
+        sent = []
+
+        class Client:
+            async def request(self, method, url, body=None, headers=None):
+                sent.append(json.loads(body)['alert']['id'])
+                return HTTPResponse(200, {}, b'')
+
+            async def close(self):
+                pass
+
+        worker = WebhookWorker(client=Client())
+        self.addCleanup(worker.close)
+        self.assertEqual(worker.run_once(), (2, 2))
+        self.assertEqual(worker.run_once(), (0, 0))
+        self.assertCountEqual(sent, [alert.pk for alert in alerts])
+        self.assertEqual(AlertFeed(WEBHOOK_FEED).position(self.shard), alerts[1].pk)
+        self.assertEqual(set(load_alerts([alert.pk for alert in alerts])), {alert.pk for alert in alerts})
+
+    @override_settings(ALERT_FEED_SETTLE_SECONDS=0, ESCALATION_SEVERITIES=['HIGH'], ESCALATION_DELAYS=[300])
+    def test_escalation_on_shard(self):
+        """Test alerts on a shard are escalated where they live."""
+        owner = self.make_owner(self.shard)
+        with use_owner_shard(owner.pk):
+            sensor = Sensor.objects.create(name='Door', sensor_type='DOOR_CONTACT', location='Hall', owner=owner)
+            alert = Alert.objects.create(
+                alert_type='DOOR_OPEN', severity='HIGH', user=owner, sensor=sensor, title='Door Opened'
+            )
+
+        scheduler = EscalationScheduler(channels={})
+        now = timezone.now()
+        self.assertEqual(scheduler.run_once(now), (1, 0))
+        self.assertEqual(scheduler.run_once(now + timedelta(seconds=301)), (0, 1))
+        self.assertEqual(Alert.objects.using(self.shard).get(pk=alert.pk).severity, 'CRITICAL')
+        self.assertFalse(EscalationDeadline.objects.exists())
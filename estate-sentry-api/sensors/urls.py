@@ -1,13 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SensorViewSet, SensorReadingViewSet
+from .views import SensorViewSet, SensorReadingViewSet, DashboardViewSet, CameraFrameMediaView, ZoneViewSet
 
 app_name = 'sensors'
 
 router = DefaultRouter()
 router.register(r'sensors', SensorViewSet, basename='sensor')
 router.register(r'readings', SensorReadingViewSet, basename='reading')
+router.register(r'dashboard', DashboardViewSet, basename='dashboard')
+router.register(r'zones', ZoneViewSet, basename='zone')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('media/frames/<str:content_hash>/', CameraFrameMediaView.as_view(), name='frame-media'),
 ]
@@ -1,19 +1,43 @@
+import os
+import re
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Sensor, SensorReading
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from estate_sentry.db_routers import ReplicaReadMixin
+from estate_sentry.fast_serializers import FastListMixin
+from estate_sentry.response_cache import cached_response, invalidate_user
+from estate_sentry.sharding import OwnerShardMixin
+from .arming import invalidate_arming
+from .dashboard import dashboard_summary
+from .frames import store_frame, frame_path, FrameTooLarge, InvalidFrame, FRAME_CHUNK_SIZE
+from .heartbeat import last_seen_tracker
+from .models import Sensor, SensorReading, CameraFrame, Zone
+from .replay import replay_queryset, replay_readings
+from .renditions import rendition_cache, RENDITION_SIZES
 from .serializers import (
     SensorSerializer,
     SensorReadingSerializer,
-    SensorReadingCreateSerializer
+    SensorReadingCreateSerializer,
+    SensorReadingRows,
+    ReplayRequestSerializer,
+    CameraFrameSerializer,
+    ZoneSerializer
 )
 
 
-class SensorViewSet(viewsets.ModelViewSet):
+class SensorViewSet(OwnerShardMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing sensors.
     """
+    replica_actions = ('reading_history',)
     serializer_class = SensorSerializer
     permission_classes = [IsAuthenticated]
 
@@ -21,6 +45,29 @@ class SensorViewSet(viewsets.ModelViewSet):
         """Return sensors owned by the current user."""
         return Sensor.objects.filter(owner=self.request.user)
 
+    @cached_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate_user(self.request.user.pk)
+        invalidate_arming(self.request.user.pk)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_user(self.request.user.pk)
+        invalidate_arming(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_user(self.request.user.pk)
+        invalidate_arming(self.request.user.pk)
+
     @action(detail=True, methods=['post'])
     def readings(self, request, pk=None):
         """
@@ -34,17 +81,127 @@ class SensorViewSet(viewsets.ModelViewSet):
             context={'sensor': sensor, 'request': request}
         )
         serializer.is_valid(raise_exception=True)
+        # Stores the reading and processes it for threat detection
         reading = serializer.save()
 
-        # Process the reading for threat detection
-        self._process_reading_for_threats(reading)
-
         return Response(
             SensorReadingSerializer(reading).data,
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=True, methods=['post'])
+    def frames(self, request, pk=None):
+        """
+        Upload a raw camera frame as the request body.
+        POST /api/sensors/{id}/frames/
+
+        Exact duplicates are stored once; near-duplicates of the camera's
+        last kept frame are dropped without creating a reading.
+        """
+        sensor = self.get_object()
+
+        if sensor.sensor_type != 'CAMERA':
+            return Response(
+                {'error': 'Frames can only be uploaded for camera sensors'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        content_type = request.content_type.split(';')[0].strip()
+        if not content_type.startswith('image/'):
+            return Response(
+                {'error': 'Request body must be an image'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+
+        try:
+            frame, kept, distance = store_frame(sensor, request.stream, content_type)
+        except FrameTooLarge as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except InvalidFrame:
+            return Response({'error': 'Unreadable image'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not kept:
+            return Response({
+                'stored': False,
+                'reason': 'near_duplicate',
+                'distance': distance,
+                'frame': CameraFrameSerializer(frame).data if frame else None,
+            }, status=status.HTTP_200_OK)
+
+        image_url = request.build_absolute_uri(
+            reverse('sensors:frame-media', args=[frame.content_hash])
+        )
+        serializer = SensorReadingCreateSerializer(
+            data={
+                'value': {
+                    'image_url': image_url,
+                    'thumbnail_url': f"{image_url}?size=thumb",
+                    'motion_detected': request.query_params.get('motion_detected', '').lower() in ['true', '1', 'yes'],
+                    'metadata': {'frame_id': frame.id, 'content_hash': frame.content_hash},
+                },
+                'reading_type': 'image',
+            },
+            context={'sensor': sensor, 'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        reading = serializer.save()
+
+        return Response({
+            'stored': True,
+            'distance': distance,
+            'frame': CameraFrameSerializer(frame).data,
+            'reading': SensorReadingSerializer(reading).data,
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def heartbeat(self, request, pk=None):
+        """
+        Report that a sensor is alive without submitting a reading.
+        POST /api/sensors/{id}/heartbeat/
+        """
+        sensor = self.get_object()
+        last_seen_tracker.touch(sensor)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post'])
+    def replay(self, request):
+        """
+        Re-run threat detection over the user's stored readings.
+        POST /api/sensors/replay/
+
+        A dry run by default: reports the alerts that would fire. With
+        "apply": true, creates them and marks the readings processed.
+        Replays run within the request and the server process, without
+        worker processes, so they are refused above REPLAY_API_MAX_READINGS
+        readings.
+        """
+        serializer = ReplayRequestSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        sensor_ids = options.get('sensors')
+        if sensor_ids is None:
+            sensor_ids = list(self.get_queryset().values_list('pk', flat=True))
+
+        limit = settings.REPLAY_API_MAX_READINGS
+        readings = replay_queryset(options.get('start'), options.get('end'), sensor_ids, options['apply'])
+        if readings[:limit + 1].count() > limit:
+            return Response(
+                {'detail': f'More than {limit} readings to replay. Narrow start, end or sensors, '
+                           'or run `python manage.py replay_readings` on the server.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = replay_readings(
+            start=options.get('start'),
+            end=options.get('end'),
+            sensor_ids=sensor_ids,
+            apply=options['apply'],
+            workers=1,
+        )
+        return Response(results, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['get'])
+    @cached_response
     def reading_history(self, request, pk=None):
         """
         Get sensor reading history.
@@ -53,49 +210,192 @@ class SensorViewSet(viewsets.ModelViewSet):
         sensor = self.get_object()
         readings = sensor.readings.all()[:100]  # Last 100 readings
 
+        if settings.FAST_READ_SERIALIZATION:
+            return Response(SensorReadingRows.serialize(SensorReadingRows.values(readings)))
         serializer = SensorReadingSerializer(readings, many=True)
         return Response(serializer.data)
 
-    def _process_reading_for_threats(self, reading):
+
+class DashboardViewSet(OwnerShardMixin, ReplicaReadMixin, viewsets.ViewSet):
+    """
+    ViewSet for the home screen summary.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @cached_response
+    def list(self, request):
         """
-        Process a sensor reading to detect threats and create alerts.
+        Get sensors with their latest reading and alert counts, plus alert
+        totals and recent alerts, in one response.
+        GET /api/dashboard/
         """
-        from .handlers.contact import ContactHandler
-        from .handlers.camera import CameraHandler
-        from alerts.models import Alert
+        return Response(dashboard_summary(request.user))
 
-        handler_map = {
-            'DOOR_CONTACT': ContactHandler,
-            'WINDOW_CONTACT': ContactHandler,
-            'CAMERA': CameraHandler,
-        }
 
-        handler_class = handler_map.get(reading.sensor.sensor_type)
+class ZoneViewSet(OwnerShardMixin, viewsets.ModelViewSet):
+    """
+    ViewSet for managing arming zones.
+    Set a zone's mode with PATCH /api/zones/{id}/ {"mode": "ARMED" | "STAY" | "DISARMED"}.
+    """
+    serializer_class = ZoneSerializer
+    permission_classes = [IsAuthenticated]
 
-        if handler_class:
-            handler = handler_class(reading.sensor)
-            alerts_data = handler.detect_threats(reading)
+    def get_queryset(self):
+        """Return zones owned by the current user."""
+        return Zone.objects.filter(owner=self.request.user)
 
-            # Create alerts if any threats detected
-            for alert_data in alerts_data:
-                Alert.objects.create(
-                    user=reading.sensor.owner,
-                    sensor=reading.sensor,
-                    **alert_data
-                )
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate_arming(self.request.user.pk)
 
-        # Mark reading as processed
-        reading.processed = True
-        reading.save()
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_arming(self.request.user.pk)
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalidate_arming(self.request.user.pk)
+        invalidate_user(self.request.user.pk)
 
-class SensorReadingViewSet(viewsets.ReadOnlyModelViewSet):
+
+class SensorReadingViewSet(OwnerShardMixin, ReplicaReadMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing sensor readings.
     """
     serializer_class = SensorReadingSerializer
+    row_serializer_class = SensorReadingRows
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """Return readings for sensors owned by the current user."""
         return SensorReading.objects.filter(sensor__owner=self.request.user)
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class CameraFrameMediaView(OwnerShardMixin, APIView):
+    """
+    Serve a stored camera frame or one of its resized renditions.
+    GET /api/media/frames/{content_hash}/?size=thumb|medium|original
+
+    Only owners of a camera that uploaded the frame may fetch it. Responses
+    carry a strong ETag derived from the content hash and support
+    conditional and single-range requests, so clients and plain HTTP caches
+    can revalidate or resume without a CDN.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, content_hash):
+        frame = (
+            CameraFrame.objects.filter(content_hash=content_hash, sensor__owner=request.user)
+            .only('content_hash', 'content_type', 'created_at')
+            .first()
+        )
+        if frame is None:
+            raise Http404
+
+        # Files are opened up front: a rendition evicted afterwards stays readable
+        rendition = request.query_params.get('size', 'original')
+        if rendition == 'original':
+            content_type = frame.content_type
+            try:
+                handle = open(frame_path(content_hash), 'rb')
+            except FileNotFoundError:
+                raise Http404
+        elif rendition in RENDITION_SIZES:
+            handle = rendition_cache.open(content_hash, rendition)
+            content_type = 'image/jpeg'
+            if handle is None:
+                raise Http404
+        else:
+            return Response(
+                {'error': f"Unknown size '{rendition}'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        etag = quote_etag(f"{content_hash}-{rendition}")
+        last_modified = int(frame.created_at.timestamp())
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            handle.close()
+            return self._with_cache_headers(not_modified, etag, last_modified)
+
+        size = os.fstat(handle.fileno()).st_size
+        byte_range = self._parse_range(request, etag, size)
+
+        if byte_range is False:
+            handle.close()
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f"bytes */{size}"
+        elif byte_range is None:
+            response = FileResponse(handle, content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                self._read_range(handle, start, end),
+                status=status.HTTP_206_PARTIAL_CONTENT,
+                content_type=content_type
+            )
+            response['Content-Range'] = f"bytes {start}-{end}/{size}"
+            response['Content-Length'] = str(end - start + 1)
+
+        response['Accept-Ranges'] = 'bytes'
+        return self._with_cache_headers(response, etag, last_modified)
+
+    @staticmethod
+    def _with_cache_headers(response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Frames are content-addressed, so a URL never changes meaning.
+        patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+        return response
+
+    @staticmethod
+    def _parse_range(request, etag, size):
+        """
+        Parse a single-range Range header.
+
+        Returns:
+            (start, end) inclusive byte offsets, None to serve the whole
+            file, or False if the range cannot be satisfied
+        """
+        header = request.META.get('HTTP_RANGE', '').strip()
+        if not header:
+            return None
+
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range and if_range.strip() != etag:
+            return None
+
+        match = RANGE_RE.match(header)
+        if not match or match.group(1) == match.group(2) == '':
+            # Malformed or multi-range requests get the full representation.
+            return None
+
+        first, last = match.groups()
+        if first == '':
+            length = int(last)
+            if length == 0:
+                return False
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size or start > end:
+                return False
+
+        return start, end
+
+    @staticmethod
+    def _read_range(handle, start, end):
+        remaining = end - start + 1
+        with handle:
+            handle.seek(start)
+            while remaining > 0:
+                chunk = handle.read(min(FRAME_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
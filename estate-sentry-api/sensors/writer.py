@@ -0,0 +1,115 @@
+"""
+Single writer thread for SQLite production mode.
+
+SQLite allows one writer at a time, so concurrent ingest requests each
+opening their own write transaction mostly wait on the file lock (and fail
+with "database is locked" under bursts). With SQLITE_WRITER_ENABLED the
+ingest path instead hands its writes to one thread, which drains the queue
+every SQLITE_WRITER_BATCH_MS and commits everything it collected in a single
+transaction. Readers are unaffected thanks to WAL mode.
+"""
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+# Seconds without work after which the writer checks its connection
+IDLE_SECONDS = 1.0
+
+
+class IngestWriter:
+    """
+    Group-commit queue served by a dedicated writer thread.
+
+    Each submitted unit runs in its own savepoint, so a failing unit is
+    rolled back without affecting the rest of its batch. Futures resolve
+    only once the batch transaction has committed.
+    """
+
+    def __init__(self, batch_ms=None, max_batch=None):
+        self.batch_ms = batch_ms
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue `fn(*args, **kwargs)` for the writer thread; returns a Future."""
+        future = Future()
+        # Run in the caller's context, so writes reach the caller's shard
+        context = contextvars.copy_context()
+        self._ensure_started().put((context.run, (fn, *args), kwargs, future))
+        return future
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid != pid or not self._thread.is_alive():
+            with self._lock:
+                if self._pid != pid or not self._thread.is_alive():
+                    self._queue = queue.SimpleQueue()
+                    self._thread = threading.Thread(
+                        target=self._run, args=(self._queue,), name='ingest-writer', daemon=True
+                    )
+                    self._thread.start()
+                    self._pid = pid
+        return self._queue
+
+    def _run(self, work):
+        batch_seconds = (self.batch_ms or settings.SQLITE_WRITER_BATCH_MS) / 1000
+        max_batch = self.max_batch or settings.SQLITE_WRITER_MAX_BATCH
+        while True:
+            try:
+                batch = [work.get(timeout=IDLE_SECONDS)]
+            except queue.Empty:
+                # Only between bursts: drop a connection past CONN_MAX_AGE or broken
+                close_old_connections()
+                batch = [work.get()]
+            deadline = time.monotonic() + batch_seconds
+            while len(batch) < max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(work.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    @staticmethod
+    def _commit(batch):
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for fn, args, kwargs, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, fn(*args, **kwargs), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+        except Exception as exc:
+            # The commit itself failed: nothing in the batch was written.
+            connection.close()
+            for fn, args, kwargs, future in batch:
+                if future.running():
+                    future.set_exception(exc)
+            return
+
+        if any(exc is not None for _, _, exc in outcomes):
+            # A failed unit may have left the connection unusable
+            close_old_connections()
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+ingest_writer = IngestWriter()
@@ -0,0 +1,38 @@
+from django.contrib import admin
+from estate_sentry.admin_tools import LargeTableAdmin
+from .models import WebhookSubscription, WebhookDelivery, WebhookDeadLetter
+
+
+@admin.register(WebhookSubscription)
+class WebhookSubscriptionAdmin(admin.ModelAdmin):
+    """Admin configuration for WebhookSubscription model."""
+
+    list_display = ['user', 'url', 'is_active', 'alert_types', 'severities', 'created_at']
+    list_filter = ['is_active']
+    list_select_related = ['user']
+    search_fields = ['=user__username', 'url']
+    autocomplete_fields = ['user']
+    readonly_fields = ['secret', 'created_at', 'updated_at']
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(LargeTableAdmin):
+    """Admin configuration for WebhookDelivery model."""
+
+    keyset_field = 'created_at'
+    list_display = ['alert', 'subscription', 'status', 'attempts', 'last_status_code', 'next_attempt_at']
+    list_filter = ['status']
+    list_select_related = ['alert', 'subscription']
+    raw_id_fields = ['alert', 'subscription']
+    readonly_fields = ['attempts', 'last_status_code', 'last_error', 'created_at', 'delivered_at']
+
+
+@admin.register(WebhookDeadLetter)
+class WebhookDeadLetterAdmin(LargeTableAdmin):
+    """Admin configuration for WebhookDeadLetter model."""
+
+    keyset_field = 'failed_at'
+    list_display = ['alert', 'subscription', 'attempts', 'last_status_code', 'failed_at']
+    list_select_related = ['alert', 'subscription']
+    raw_id_fields = ['alert', 'subscription']
+    readonly_fields = ['payload', 'attempts', 'last_status_code', 'last_error', 'failed_at']
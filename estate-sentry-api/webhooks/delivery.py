@@ -0,0 +1,231 @@
+"""
+Webhook delivery worker.
+
+Runs in a worker (`manage.py run_webhooks`), never on the request path.
+Each cycle has two steps:
+
+fan out  Read settled alerts from the 'webhooks' alert feed and create one
+         WebhookDelivery per active subscription whose filters match.
+deliver  Claim due deliveries and POST them concurrently from an asyncio
+         event loop, at most WEBHOOK_CONCURRENCY at a time, over pooled
+         keep-alive connections (estate_sentry.async_http). Failures are
+         retried with jittered exponential backoff; deliveries that fail
+         permanently, or WEBHOOK_MAX_ATTEMPTS times, move to the
+         dead-letter table.
+
+Database work stays synchronous between send batches; only the HTTP
+requests run on the event loop, which lives as long as the worker so
+connections are reused across cycles. Delivery is at-least-once:
+receivers should de-duplicate on the X-Estate-Sentry-Delivery header.
+"""
+import asyncio
+import json
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from alerts.feed import AlertFeed, load_alerts
+from alerts.serializers import AlertSerializer
+from estate_sentry.async_http import AsyncHTTPClient, HTTPError
+from monitoring.metrics import WEBHOOK_SEND_DURATION, WEBHOOKS_SENT
+from notifications.dispatcher import retry_delay
+from .destinations import resolve_destination_async
+from .models import WebhookDeadLetter, WebhookDelivery, WebhookSubscription
+from .signing import SIGNATURE_HEADER, sign
+
+FEED_NAME = 'webhooks'
+EVENT = 'alert.created'
+
+# A claimed delivery is retried by another worker if not finished by then.
+CLAIM_SECONDS = 120
+
+# Client errors worth retrying; any other 4xx fails the delivery at once.
+RETRYABLE_CLIENT_ERRORS = {408, 425, 429}
+
+
+def build_payload(delivery):
+    """Return the JSON-ready event body for a delivery."""
+    return {
+        'id': delivery.pk,
+        'event': EVENT,
+        'created_at': delivery.created_at.isoformat(),
+        'alert': AlertSerializer(delivery.alert).data,
+    }
+
+
+def is_retryable(status):
+    """True for network errors (status None), 5xx and throttling responses."""
+    return status is None or status >= 500 or status in RETRYABLE_CLIENT_ERRORS
+
+
+class WebhookWorker:
+    """Fans alerts out to subscriptions and delivers them."""
+
+    def __init__(self, concurrency=None, batch_size=200, client=None):
+        self.concurrency = concurrency or settings.WEBHOOK_CONCURRENCY
+        self.batch_size = batch_size
+        self.client = client or AsyncHTTPClient(
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS_PER_HOST,
+            timeout=settings.WEBHOOK_TIMEOUT,
+            headers={'User-Agent': 'EstateSentry-Webhooks/1.0'},
+            resolve=resolve_destination_async,
+        )
+        self.feed = AlertFeed(FEED_NAME)
+        self.loop = asyncio.new_event_loop()
+
+    def close(self):
+        self.loop.run_until_complete(self.client.close())
+        self.loop.close()
+
+    def run_once(self, now=None):
+        """
+        Run one fan-out + deliver cycle.
+
+        Returns:
+            (alerts fanned out, deliveries attempted)
+        """
+        fanned_out = self.fan_out(now)
+        return fanned_out, self.deliver(now)
+
+    def fan_out(self, now=None):
+        now = now or timezone.now()
+        total = 0
+        while True:
+            consumed = self.feed.consume(lambda alerts: self.enqueue(alerts, now), limit=self.batch_size * 5, now=now)
+            total += consumed
+            if not consumed:
+                return total
+
+    def enqueue(self, alerts, now):
+        """Create deliveries for the subscriptions each alert matches."""
+        subscriptions = defaultdict(list)
+        for subscription in WebhookSubscription.objects.filter(
+            user_id__in={alert.user_id for alert in alerts}, is_active=True
+        ):
+            subscriptions[subscription.user_id].append(subscription)
+
+        deliveries = [
+            WebhookDelivery(subscription=subscription, alert=alert, next_attempt_at=now)
+            for alert in alerts
+            for subscription in subscriptions[alert.user_id]
+            if subscription.matches(alert)
+        ]
+        WebhookDelivery.objects.bulk_create(deliveries, ignore_conflicts=True)
+
+    def _claim(self, now):
+        """Lease due deliveries to this worker so concurrent workers skip them."""
+        with transaction.atomic():
+            due = WebhookDelivery.objects.filter(
+                status='PENDING', next_attempt_at__lte=now, subscription__is_active=True
+            ).order_by('next_attempt_at')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True, of=('self',))
+            deliveries = list(due.select_related('subscription')[:self.batch_size])
+            WebhookDelivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)
+            )
+
+        # Alerts may be on shards, so they are not joined
+        alerts = load_alerts([delivery.alert_id for delivery in deliveries], 'sensor', 'acknowledged_by')
+        orphans = [delivery.pk for delivery in deliveries if delivery.alert_id not in alerts]
+        if orphans:
+            WebhookDelivery.objects.filter(pk__in=orphans).delete()
+        claimed = []
+        for delivery in deliveries:
+            if delivery.alert_id in alerts:
+                delivery.alert = alerts[delivery.alert_id]
+                claimed.append(delivery)
+        return claimed
+
+    def deliver(self, now=None):
+        """
+        Send due deliveries concurrently.
+
+        Returns:
+            Number of deliveries attempted
+        """
+        now = now or timezone.now()
+        deliveries = self._claim(now)
+        if not deliveries:
+            return 0
+
+        payloads = [build_payload(delivery) for delivery in deliveries]
+        results = self.loop.run_until_complete(self._send_all(deliveries, payloads))
+        for delivery, payload, (status, error) in zip(deliveries, payloads, results):
+            self._record(delivery, payload, status, error)
+        return len(deliveries)
+
+    async def _send_all(self, deliveries, payloads):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(delivery, payload):
+            async with semaphore:
+                return await self._send(delivery, payload)
+
+        return await asyncio.gather(*(
+            send(delivery, payload) for delivery, payload in zip(deliveries, payloads)
+        ))
+
+    async def _send(self, delivery, payload):
+        """
+        POST one delivery.
+
+        Returns:
+            (HTTP status or None, error message or '')
+        """
+        body = json.dumps(payload, cls=DjangoJSONEncoder).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Estate-Sentry-Event': EVENT,
+            'X-Estate-Sentry-Delivery': str(delivery.pk),
+            SIGNATURE_HEADER: sign(delivery.subscription.secret, body),
+        }
+        started = time.perf_counter()
+        try:
+            response = await self.client.request('POST', delivery.subscription.url, body=body, headers=headers)
+        except (HTTPError, OSError, asyncio.TimeoutError) as exc:
+            return None, str(exc) or exc.__class__.__name__
+        finally:
+            WEBHOOK_SEND_DURATION.observe(time.perf_counter() - started)
+        if 200 <= response.status < 300:
+            return response.status, ''
+        return response.status, f"Endpoint returned HTTP {response.status}"
+
+    def _record(self, delivery, payload, status, error):
+        now = timezone.now()
+        delivery.attempts += 1
+        delivery.last_status_code = status
+        delivery.last_error = error
+
+        if not error:
+            delivery.status = 'DELIVERED'
+            delivery.delivered_at = now
+            result = 'ok'
+        elif is_retryable(status) and delivery.attempts < settings.WEBHOOK_MAX_ATTEMPTS:
+            delivery.next_attempt_at = now + timedelta(
+                seconds=retry_delay(delivery.attempts, base=settings.WEBHOOK_RETRY_BASE_SECONDS)
+            )
+            result = 'retry'
+        else:
+            with transaction.atomic():
+                WebhookDeadLetter.objects.create(
+                    subscription_id=delivery.subscription_id,
+                    alert_id=delivery.alert_id,
+                    payload=json.loads(json.dumps(payload, cls=DjangoJSONEncoder)),
+                    attempts=delivery.attempts,
+                    last_status_code=status,
+                    last_error=error,
+                )
+                delivery.delete()
+            WEBHOOKS_SENT.labels('dead_letter').inc()
+            return
+
+        delivery.save(update_fields=[
+            'attempts', 'status', 'next_attempt_at', 'last_status_code', 'last_error', 'delivered_at'
+        ])
+        WEBHOOKS_SENT.labels(result).inc()
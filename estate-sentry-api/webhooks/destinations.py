@@ -0,0 +1,64 @@
+"""
+Checks that webhook destinations are public hosts.
+
+Subscribers choose the URL, and delivery results (status code, error) are
+reported back to them, so an unchecked URL would let any user probe and
+read from loopback, private networks or cloud metadata endpoints. URLs are
+checked when a subscription is saved, and the worker checks again before
+each new connection and connects to the address it checked, because DNS
+answers can change in between. WEBHOOK_ALLOW_PRIVATE_NETWORKS turns the
+check off (local development and tests).
+"""
+import asyncio
+import ipaddress
+import socket
+
+from django.conf import settings
+
+
+class BlockedDestination(ValueError):
+    """A webhook host does not resolve, or resolves to a non-public address."""
+
+
+def is_public(address):
+    """Whether an address is globally reachable (not private, shared, loopback, reserved...)."""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6:
+        # IPv4-mapped and 6to4 addresses reach the IPv4 address they embed
+        ip = ip.ipv4_mapped or ip.sixtofour or ip
+    return ip.is_global and not ip.is_multicast
+
+
+def check_addresses(host, infos):
+    """Return the first address from getaddrinfo() results, if they are all public."""
+    addresses = [info[4][0] for info in infos]
+    if not addresses:
+        raise BlockedDestination(f"{host} does not resolve")
+    if not settings.WEBHOOK_ALLOW_PRIVATE_NETWORKS:
+        for address in addresses:
+            if not is_public(address):
+                raise BlockedDestination(f"{host} resolves to a non-public address ({address})")
+    return addresses[0]
+
+
+def resolve_destination(host, port):
+    """
+    Resolve a webhook host to an address that may be connected to.
+
+    Raises:
+        BlockedDestination: if it does not resolve or any address is not public
+    """
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as exc:
+        raise BlockedDestination(f"{host} does not resolve: {exc}") from None
+    return check_addresses(host, infos)
+
+
+async def resolve_destination_async(host, port):
+    """resolve_destination() for the delivery event loop."""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as exc:
+        raise BlockedDestination(f"{host} does not resolve: {exc}") from None
+    return check_addresses(host, infos)
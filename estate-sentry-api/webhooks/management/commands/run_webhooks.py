@@ -0,0 +1,55 @@
+"""
+Run the webhook delivery worker.
+
+Examples:
+    python manage.py run_webhooks
+    python manage.py run_webhooks --once --concurrency 100
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from webhooks.delivery import WebhookWorker
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Fan new alerts out to webhook subscriptions and deliver them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run until nothing is due, then exit')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument('--batch', type=int, default=200, help='Deliveries claimed per batch')
+        parser.add_argument(
+            '--concurrency', type=int, help='Requests in flight, overriding WEBHOOK_CONCURRENCY'
+        )
+
+    def handle(self, *args, **options):
+        worker = WebhookWorker(concurrency=options['concurrency'], batch_size=options['batch'])
+        started = time.perf_counter()
+        total = 0
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    fanned_out, delivered = worker.run_once()
+                except Exception:
+                    if options['once']:
+                        raise
+                    # Keep the worker alive; the failed batch is retried on a later cycle
+                    logger.exception('Webhook cycle failed')
+                    time.sleep(options['poll'])
+                    continue
+                total += delivered
+                if not fanned_out and not delivered:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+        finally:
+            worker.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{total} deliveries attempted in {elapsed:.1f}s")
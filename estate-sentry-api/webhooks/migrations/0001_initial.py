@@ -0,0 +1,92 @@
+# Generated by Django 5.1.15 on 2026-10-19 16:01
+
+import django.db.models.deletion
+import webhooks.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('alerts', '0005_alert_feed_cursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(help_text='Endpoint that receives alert events', max_length=500)),
+                ('secret', models.CharField(default=webhooks.models.generate_secret, help_text='Shared secret for the X-Estate-Sentry-Signature HMAC', max_length=64)),
+                ('alert_types', models.JSONField(blank=True, default=list, help_text='Alert types to send (empty: all)')),
+                ('severities', models.JSONField(blank=True, default=list, help_text='Severities to send (empty: all)')),
+                ('is_active', models.BooleanField(default=True)),
+                ('description', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhooks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Webhook Subscription',
+                'verbose_name_plural': 'Webhook Subscriptions',
+                'db_table': 'webhook_subscriptions',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DELIVERED', 'Delivered')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField()),
+                ('last_status_code', models.PositiveIntegerField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_deliveries', to='alerts.alert')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='webhooks.webhooksubscription')),
+            ],
+            options={
+                'verbose_name': 'Webhook Delivery',
+                'verbose_name_plural': 'Webhook Deliveries',
+                'db_table': 'webhook_deliveries',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(help_text='Event body as last sent')),
+                ('attempts', models.PositiveIntegerField()),
+                ('last_status_code', models.PositiveIntegerField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('failed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('alert', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='webhook_dead_letters', to='alerts.alert')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letters', to='webhooks.webhooksubscription')),
+            ],
+            options={
+                'verbose_name': 'Webhook Dead Letter',
+                'verbose_name_plural': 'Webhook Dead Letters',
+                'db_table': 'webhook_dead_letters',
+                'ordering': ['-failed_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='webhooksubscription',
+            index=models.Index(fields=['user', 'is_active'], name='webhook_sub_user_id_db9615_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookdelivery',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='webhook_del_status_20ffd3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='webhookdelivery',
+            constraint=models.UniqueConstraint(fields=('subscription', 'alert'), name='webhook_delivery_once_per_alert'),
+        ),
+    ]
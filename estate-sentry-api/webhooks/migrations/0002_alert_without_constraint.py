@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0006_alert_feed_cursor_shard'),
+        ('webhooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhookdeadletter',
+            name='alert',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='webhook_dead_letters', to='alerts.alert'),
+        ),
+        migrations.AlterField(
+            model_name='webhookdelivery',
+            name='alert',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='webhook_deliveries', to='alerts.alert'),
+        ),
+    ]
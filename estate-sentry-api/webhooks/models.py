@@ -0,0 +1,132 @@
+import secrets
+
+from django.db import models
+from django.conf import settings
+
+
+def generate_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookSubscription(models.Model):
+    """
+    A user's endpoint that receives their alerts as signed JSON POSTs.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='webhooks'
+    )
+    url = models.URLField(max_length=500, help_text='Endpoint that receives alert events')
+    secret = models.CharField(
+        max_length=64,
+        default=generate_secret,
+        help_text='Shared secret for the X-Estate-Sentry-Signature HMAC'
+    )
+    alert_types = models.JSONField(default=list, blank=True, help_text='Alert types to send (empty: all)')
+    severities = models.JSONField(default=list, blank=True, help_text='Severities to send (empty: all)')
+    is_active = models.BooleanField(default=True)
+    description = models.CharField(max_length=255, blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'webhook_subscriptions'
+        verbose_name = 'Webhook Subscription'
+        verbose_name_plural = 'Webhook Subscriptions'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_active']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} -> {self.url}"
+
+    def matches(self, alert):
+        """Return True if the alert passes this subscription's filters."""
+        return (
+            (not self.alert_types or alert.alert_type in self.alert_types)
+            and (not self.severities or alert.severity in self.severities)
+        )
+
+
+class WebhookDelivery(models.Model):
+    """
+    One alert to one subscription, retried until delivered or dead-lettered.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('DELIVERED', 'Delivered'),
+    ]
+
+    subscription = models.ForeignKey(
+        WebhookSubscription,
+        on_delete=models.CASCADE,
+        related_name='deliveries'
+    )
+    # Alerts may live on a shard database, so no constraint
+    alert = models.ForeignKey(
+        'alerts.Alert', on_delete=models.CASCADE, db_constraint=False, related_name='webhook_deliveries'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_status_code = models.PositiveIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'webhook_deliveries'
+        verbose_name = 'Webhook Delivery'
+        verbose_name_plural = 'Webhook Deliveries'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['subscription', 'alert'], name='webhook_delivery_once_per_alert'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"Alert {self.alert_id} -> {self.subscription.url} ({self.status})"
+
+
+class WebhookDeadLetter(models.Model):
+    """
+    A delivery that failed permanently, kept with its payload for inspection
+    and manual replay.
+    """
+
+    subscription = models.ForeignKey(
+        WebhookSubscription,
+        on_delete=models.CASCADE,
+        related_name='dead_letters'
+    )
+    alert = models.ForeignKey(
+        'alerts.Alert',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='webhook_dead_letters'
+    )
+    payload = models.JSONField(help_text='Event body as last sent')
+    attempts = models.PositiveIntegerField()
+    last_status_code = models.PositiveIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    failed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'webhook_dead_letters'
+        verbose_name = 'Webhook Dead Letter'
+        verbose_name_plural = 'Webhook Dead Letters'
+        ordering = ['-failed_at']
+
+    def __str__(self):
+        return f"Alert {self.alert_id} -> {self.subscription.url} after {self.attempts} attempts"
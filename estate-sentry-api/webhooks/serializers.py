@@ -0,0 +1,71 @@
+from urllib.parse import urlsplit
+
+from rest_framework import serializers
+from alerts.models import Alert
+from .destinations import BlockedDestination, resolve_destination
+from .models import WebhookSubscription, WebhookDelivery, WebhookDeadLetter
+
+ALERT_TYPES = [choice for choice, _ in Alert.ALERT_TYPE_CHOICES]
+SEVERITIES = [choice for choice, _ in Alert.SEVERITY_CHOICES]
+
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    """Serializer for WebhookSubscription model."""
+
+    alert_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=ALERT_TYPES), required=False
+    )
+    severities = serializers.ListField(
+        child=serializers.ChoiceField(choices=SEVERITIES), required=False
+    )
+
+    class Meta:
+        model = WebhookSubscription
+        fields = [
+            'id', 'url', 'secret', 'alert_types', 'severities', 'is_active',
+            'description', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'secret', 'created_at', 'updated_at']
+
+    def create(self, validated_data):
+        """Set the user to the current user."""
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data)
+
+    def validate_url(self, value):
+        """Only plain HTTP(S) endpoints on public addresses can receive webhooks."""
+        parts = urlsplit(value)
+        if parts.scheme not in ('http', 'https'):
+            raise serializers.ValidationError('Webhook URL must use http or https')
+        try:
+            resolve_destination(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        except (BlockedDestination, ValueError) as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+    def validate_alert_types(self, value):
+        return sorted(set(value))
+
+    def validate_severities(self, value):
+        return sorted(set(value))
+
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    """Serializer for WebhookDelivery model."""
+
+    class Meta:
+        model = WebhookDelivery
+        fields = [
+            'id', 'alert', 'status', 'attempts', 'next_attempt_at',
+            'last_status_code', 'last_error', 'created_at', 'delivered_at'
+        ]
+        read_only_fields = fields
+
+
+class WebhookDeadLetterSerializer(serializers.ModelSerializer):
+    """Serializer for WebhookDeadLetter model."""
+
+    class Meta:
+        model = WebhookDeadLetter
+        fields = ['id', 'alert', 'payload', 'attempts', 'last_status_code', 'last_error', 'failed_at']
+        read_only_fields = fields
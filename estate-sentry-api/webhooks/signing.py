@@ -0,0 +1,43 @@
+"""
+Webhook payload signatures.
+
+Every delivery carries
+
+    X-Estate-Sentry-Signature: t=<unix time>,v1=<hex HMAC-SHA256>
+
+where the HMAC is computed with the subscription secret over
+"<unix time>.<raw request body>". Receivers recompute it, compare in
+constant time and reject timestamps outside a small tolerance to stop
+replays. verify_signature() is the reference implementation.
+"""
+import hashlib
+import hmac
+import time
+
+SIGNATURE_HEADER = 'X-Estate-Sentry-Signature'
+DEFAULT_TOLERANCE = 300
+
+
+def compute_signature(secret, timestamp, body):
+    message = f"{timestamp}.".encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def sign(secret, body, timestamp=None):
+    """Return the signature header value for a request body (bytes)."""
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    return f"t={timestamp},v1={compute_signature(secret, timestamp, body)}"
+
+
+def verify_signature(secret, body, header, tolerance=DEFAULT_TOLERANCE, now=None):
+    """Return True if the header is a valid, fresh signature of the body."""
+    try:
+        parts = dict(item.split('=', 1) for item in header.split(','))
+        timestamp = int(parts['t'])
+        signature = parts['v1']
+    except (AttributeError, KeyError, ValueError):
+        return False
+    now = time.time() if now is None else now
+    if abs(now - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(signature, compute_signature(secret, timestamp, body))
@@ -0,0 +1,252 @@
+import json
+import socket
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from alerts.models import Alert
+from authentication.models import User
+from sensors.models import Sensor
+from .delivery import WebhookWorker
+from .models import WebhookSubscription, WebhookDelivery, WebhookDeadLetter
+from .signing import SIGNATURE_HEADER, sign, verify_signature
+
+
+class StandInServer:
+    """Local HTTP endpoint that records requests and answers with queued statuses."""
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.connections = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                server.requests.append((self.path, dict(self.headers), body))
+                server.connections.add(self.client_address)
+                code = server.statuses.pop(0) if server.statuses else 200
+                self.send_response(code)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@override_settings(
+    ALERT_FEED_SETTLE_SECONDS=0,
+    WEBHOOK_MAX_ATTEMPTS=3,
+    WEBHOOK_RETRY_BASE_SECONDS=10,
+    WEBHOOK_TIMEOUT=5,
+    WEBHOOK_ALLOW_PRIVATE_NETWORKS=True,
+)
+class WebhookDeliveryTestCase(TestCase):
+    """Test cases for webhook fan-out, signing, retries and dead letters."""
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.addCleanup(self.server.stop)
+        self.worker = WebhookWorker(concurrency=4)
+        self.addCleanup(self.worker.close)
+
+        self.user = User.objects.create_user(username='hookuser', password='testpass')
+        self.sensor = Sensor.objects.create(
+            name='Front Door', sensor_type='DOOR_CONTACT', location='Entry', owner=self.user
+        )
+        self.subscription = WebhookSubscription.objects.create(
+            user=self.user, url=f"{self.server.url}/hooks/alerts"
+        )
+
+    def alert(self, alert_type='DOOR_OPEN', severity='MEDIUM', user=None):
+        return Alert.objects.create(
+            alert_type=alert_type, severity=severity, user=user or self.user, sensor=self.sensor,
+            title='Door Opened', description='The entry door was opened.'
+        )
+
+    def test_signed_delivery_over_pooled_connection(self):
+        """Test alerts are POSTed signed, concurrently, reusing keep-alive connections."""
+        alerts = [self.alert() for _ in range(6)]
+        self.assertEqual(self.worker.run_once(), (6, 6))
+
+        self.assertEqual(len(self.server.requests), 6)
+        path, headers, body = self.server.requests[0]
+        self.assertEqual(path, '/hooks/alerts')
+        self.assertEqual(headers['X-Estate-Sentry-Event'], 'alert.created')
+        self.assertTrue(verify_signature(self.subscription.secret, body, headers[SIGNATURE_HEADER]))
+        self.assertFalse(verify_signature('wrong-secret', body, headers[SIGNATURE_HEADER]))
+
+        received = {json.loads(body)['alert']['id'] for _, _, body in self.server.requests}
+        self.assertEqual(received, {alert.id for alert in alerts})
+        self.assertLessEqual(len(self.server.connections), 4)
+        self.assertEqual(WebhookDelivery.objects.filter(status='DELIVERED').count(), 6)
+
+        self.alert()
+        self.worker.run_once()
+        self.assertEqual(len(self.server.requests), 7)
+        self.assertLessEqual(len(self.server.connections), 4)
+
+    def test_subscription_filters(self):
+        """Test only alerts matching a subscription's type and severity filters are sent."""
+        self.subscription.alert_types = ['GLASS_BREAK', 'DOOR_OPEN']
+        self.subscription.severities = ['HIGH', 'CRITICAL']
+        self.subscription.save()
+        WebhookSubscription.objects.create(user=self.user, url=self.server.url, is_active=False)
+        other = User.objects.create_user(username='otheruser', password='testpass')
+
+        self.alert(severity='LOW')
+        self.alert(alert_type='MOTION_DETECTED', severity='HIGH')
+        self.alert(severity='CRITICAL', user=other)
+        wanted = self.alert(severity='HIGH')
+
+        self.assertEqual(self.worker.run_once(), (4, 1))
+        self.assertEqual(json.loads(self.server.requests[0][2])['alert']['id'], wanted.id)
+
+    def test_retry_then_dead_letter(self):
+        """Test server errors are retried with backoff and exhausted deliveries are dead-lettered."""
+        self.server.statuses = [500, 503, 502]
+        self.alert()
+        now = timezone.now()
+        self.worker.run_once(now)
+
+        at = now
+        for attempt in range(1, 3):
+            delivery = WebhookDelivery.objects.get()
+            self.assertEqual(delivery.attempts, attempt)
+            self.assertGreaterEqual(delivery.next_attempt_at, timezone.now() + timedelta(seconds=4))
+            self.assertEqual(self.worker.deliver(at), 0)
+            at = delivery.next_attempt_at
+            self.assertEqual(self.worker.deliver(at), 1)
+
+        self.assertFalse(WebhookDelivery.objects.exists())
+        dead_letter = WebhookDeadLetter.objects.get()
+        self.assertEqual(dead_letter.attempts, 3)
+        self.assertEqual(dead_letter.last_status_code, 502)
+        self.assertEqual(dead_letter.payload['event'], 'alert.created')
+
+    def test_client_error_is_not_retried(self):
+        """Test a 4xx response (other than 408/425/429) dead-letters at once."""
+        self.server.statuses = [429, 404]
+        self.alert()
+        now = timezone.now()
+        self.worker.run_once(now)
+        self.assertEqual(WebhookDelivery.objects.get().last_status_code, 429)
+
+        self.worker.deliver(now + timedelta(hours=1))
+        self.assertEqual(WebhookDeadLetter.objects.get().last_status_code, 404)
+
+    def test_unreachable_endpoint_is_retried(self):
+        """Test connection failures count as retryable attempts."""
+        self.subscription.url = 'http://127.0.0.1:1/hooks'
+        self.subscription.save()
+        self.alert()
+        self.worker.run_once()
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, 'PENDING')
+        self.assertIsNone(delivery.last_status_code)
+        self.assertIn('Cannot connect', delivery.last_error)
+
+    def test_private_destination_is_not_connected_to(self):
+        """Test the worker re-checks the destination address before connecting."""
+        self.alert()
+        with override_settings(WEBHOOK_ALLOW_PRIVATE_NETWORKS=False):
+            self.worker.run_once()
+
+        self.assertEqual(self.server.requests, [])
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, 'PENDING')
+        self.assertIn('non-public address', delivery.last_error)
+
+    def test_signature_rejects_stale_timestamp(self):
+        """Test signatures outside the tolerance window are rejected."""
+        header = sign('secret', b'{}', timestamp=1000)
+        self.assertTrue(verify_signature('secret', b'{}', header, now=1100))
+        self.assertFalse(verify_signature('secret', b'{}', header, now=2000))
+        self.assertFalse(verify_signature('secret', b'{}', 'garbage'))
+
+
+real_getaddrinfo = socket.getaddrinfo
+
+
+def fake_getaddrinfo(host, port, *args, **kwargs):
+    """Resolve test names without DNS; IP literals resolve as usual."""
+    addresses = {'example.com': '93.184.215.14', 'internal.example.com': '10.0.0.8'}
+    if host in addresses:
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (addresses[host], port))]
+    return real_getaddrinfo(host, port, *args, flags=socket.AI_NUMERICHOST, **kwargs)
+
+
+@mock.patch('webhooks.destinations.socket.getaddrinfo', fake_getaddrinfo)
+class WebhookAPITestCase(TestCase):
+    """Test cases for the webhook subscription API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='apiuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_subscription(self):
+        """Test creating a subscription returns its generated secret."""
+        response = self.client.post('/api/webhooks/', {
+            'url': 'https://example.com/hooks',
+            'alert_types': ['DOOR_OPEN', 'DOOR_OPEN'],
+            'severities': ['CRITICAL'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['secret']), 64)
+        self.assertEqual(response.data['alert_types'], ['DOOR_OPEN'])
+
+        subscription = WebhookSubscription.objects.get()
+        self.assertEqual(subscription.user, self.user)
+
+        rotated = self.client.post(f'/api/webhooks/{subscription.id}/rotate_secret/')
+        self.assertNotEqual(rotated.data['secret'], response.data['secret'])
+
+    def test_invalid_subscription(self):
+        """Test unknown filter values and non-HTTP URLs are rejected."""
+        response = self.client.post('/api/webhooks/', {
+            'url': 'ftp://example.com/hooks', 'severities': ['LOUD'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('url', response.data)
+        self.assertIn('severities', response.data)
+
+    def test_internal_destinations_are_rejected(self):
+        """Test URLs resolving to loopback, private, shared, link-local or no addresses are rejected."""
+        for url in [
+            'http://127.0.0.1:8000/hooks', 'http://169.254.169.254/latest/meta-data/', 'http://100.64.0.1/hooks',
+            'http://[::ffff:10.0.0.1]/hooks', 'http://[2002:a00:1::1]/hooks', 'https://internal.example.com/hooks',
+            'https://nowhere.invalid/',
+        ]:
+            response = self.client.post('/api/webhooks/', {'url': url}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, url)
+            self.assertIn('url', response.data)
+        self.assertFalse(WebhookSubscription.objects.exists())
+
+    def test_subscriptions_are_private(self):
+        """Test users cannot see other users' subscriptions."""
+        other = User.objects.create_user(username='otheruser', password='testpass')
+        subscription = WebhookSubscription.objects.create(user=other, url='https://example.com/hooks')
+
+        self.assertEqual(self.client.get('/api/webhooks/').data['count'], 0)
+        response = self.client.get(f'/api/webhooks/{subscription.id}/dead_letters/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,12 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import WebhookSubscriptionViewSet
+
+app_name = 'webhooks'
+
+router = DefaultRouter()
+router.register(r'webhooks', WebhookSubscriptionViewSet, basename='webhook')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
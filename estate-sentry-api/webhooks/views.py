@@ -0,0 +1,56 @@
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from .models import WebhookSubscription, generate_secret
+from .serializers import (
+    WebhookSubscriptionSerializer,
+    WebhookDeliverySerializer,
+    WebhookDeadLetterSerializer
+)
+
+# Most recent rows returned by the deliveries and dead_letters actions
+HISTORY_LIMIT = 50
+
+
+class WebhookSubscriptionViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for managing webhook subscriptions.
+    """
+    serializer_class = WebhookSubscriptionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Return webhook subscriptions of the current user."""
+        return WebhookSubscription.objects.filter(user=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def deliveries(self, request, pk=None):
+        """
+        Get recent pending and delivered deliveries.
+        GET /api/webhooks/{id}/deliveries/
+        """
+        subscription = self.get_object()
+        deliveries = subscription.deliveries.order_by('-created_at')[:HISTORY_LIMIT]
+        return Response(WebhookDeliverySerializer(deliveries, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def dead_letters(self, request, pk=None):
+        """
+        Get recent deliveries that failed permanently.
+        GET /api/webhooks/{id}/dead_letters/
+        """
+        subscription = self.get_object()
+        dead_letters = subscription.dead_letters.order_by('-failed_at')[:HISTORY_LIMIT]
+        return Response(WebhookDeadLetterSerializer(dead_letters, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def rotate_secret(self, request, pk=None):
+        """
+        Replace the signing secret; deliveries from now on use the new one.
+        POST /api/webhooks/{id}/rotate_secret/
+        """
+        subscription = self.get_object()
+        subscription.secret = generate_secret()
+        subscription.save(update_fields=['secret', 'updated_at'])
+        return Response(self.get_serializer(subscription).data)